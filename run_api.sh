@@ -23,5 +23,9 @@ fi
 # Source environment variables for app port
 source "${SCRIPT_DIR}/src/env/.env"
 
-# Run the FastAPI application
-uv run fastapi dev src/app.py --port ${APP_PORT:-8001} --reload
\ No newline at end of file
+# Run the FastAPI application, with multiple worker processes in production mode
+if [ "$1" == "--prod" ]; then
+    uv run run_server.py
+else
+    uv run fastapi dev src/app.py --port ${APP_PORT:-8001} --reload
+fi
\ No newline at end of file
@@ -0,0 +1,85 @@
+import argparse
+import logging
+from pathlib import Path
+
+from src.models.app.response import get_yelp_data_response_codec
+from src.settings import settings
+from src.utils.artifacts import ArtifactReader, ArtifactWriter, diff_artifacts, export_parquet
+
+DEFAULT_ARTIFACT_PATH = Path("./data/processed_locations_yelp")
+
+
+def convert(args: argparse.Namespace) -> None:
+    """Converts a monolithic JSON dump of GetYelpDataResponse into a chunked artifact."""
+    response = get_yelp_data_response_codec.decode(args.input.read_bytes())
+    with ArtifactWriter(args.artifact, args.chunk_size) as writer:
+        for business in response.data:
+            writer.append(business)
+        for location_name in response.missing:
+            writer.add_missing(location_name)
+    print(f"Converted {writer.manifest.records} businesses into {len(writer.manifest.chunks)} chunks: {args.artifact}")
+
+
+def verify(args: argparse.Namespace) -> None:
+    reader = ArtifactReader(args.artifact)
+    corrupted = [chunk.name for chunk in reader.select(args.chunks) if not reader.verify(chunk)]
+    print(f"{len(reader.select(args.chunks)) - len(corrupted)} chunks match their hash, corrupted: {corrupted or '-'}")
+    if corrupted:
+        raise SystemExit(1)
+
+
+def diff(args: argparse.Namespace) -> None:
+    result = diff_artifacts(ArtifactReader(args.old), ArtifactReader(args.new))
+    print(f"Unchanged chunks skipped: {result.unchanged_chunks}")
+    for name in ("added", "removed", "changed"):
+        ids = getattr(result, name)
+        print(f"{name}: {len(ids)} {ids}")
+
+
+def load(args: argparse.Namespace) -> None:
+    from run_etl import load_artifact_to_db  # Imports the database and ETL modules
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    load_artifact_to_db(logging.getLogger("run_artifact"), args.artifact, args.chunks)
+
+
+def export(args: argparse.Namespace) -> None:
+    exported = export_parquet(ArtifactReader(args.artifact), args.output, args.chunks)
+    print(f"Exported {exported} businesses to {args.output}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspects, loads and exports chunked ETL artifacts.")
+    subparsers = parser.add_subparsers(required=True)
+
+    def add_command(name: str, handler, help: str) -> argparse.ArgumentParser:
+        subparser = subparsers.add_parser(name, help=help)
+        subparser.set_defaults(handler=handler)
+        return subparser
+
+    subparser = add_command("convert", convert, "Convert a JSON dump of the previous ETL into an artifact")
+    subparser.add_argument("--input", type=Path, default=Path("./data/processed_locations_yelp.json"))
+    subparser.add_argument("--artifact", type=Path, default=DEFAULT_ARTIFACT_PATH)
+    subparser.add_argument("--chunk-size", type=int, default=settings.etl_artifact_chunk_size)
+
+    for name, handler, help in (
+        ("verify", verify, "Check chunks against the hashes of the manifest"),
+        ("load", load, "Load chunks into a new database snapshot"),
+        ("export-parquet", export, "Export chunks to a Parquet file, requires pyarrow"),
+    ):
+        subparser = add_command(name, handler, help)
+        subparser.add_argument("--artifact", type=Path, default=DEFAULT_ARTIFACT_PATH)
+        subparser.add_argument("--chunks", nargs="+", help="Names of the chunks to use, every chunk by default")
+        if name == "export-parquet":
+            subparser.add_argument("--output", type=Path, default=Path("./data/processed_locations_yelp.parquet"))
+
+    subparser = add_command("diff", diff, "Compare the businesses of two artifacts")
+    subparser.add_argument("old", type=Path)
+    subparser.add_argument("new", type=Path)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
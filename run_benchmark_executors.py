@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from src.settings import settings
+from src.utils.executors import ExecutorMode, ExecutorStage, StageExecutors
+from src.utils.metrics import Metrics
+from src.utils.validate_sql import validate_and_limit_sql
+
+# Queries shaped like the ones generated for the sample questions
+QUERIES: list[str] = [
+    "SELECT b.name, l.address, b.phone FROM businesses AS b JOIN locations AS l ON l.business_id = b.id",
+    "SELECT COUNT(*) AS business_count FROM businesses AS b JOIN locations AS l ON l.business_id = b.id "
+    "WHERE l.zip_code = '94608'",
+    "SELECT COUNT(DISTINCT b.id) AS business_count FROM businesses AS b JOIN tags AS t ON t.business_id = b.id "
+    "WHERE t.tag = 'wifi'",
+    "SELECT DISTINCT b.name FROM businesses AS b JOIN tags AS t ON t.business_id = b.id "
+    "WHERE t.tag IN ('full_bar', 'beer_and_wine') ORDER BY b.name",
+    "SELECT b.name, l.address FROM businesses AS b JOIN locations AS l ON l.business_id = b.id "
+    "WHERE b.id IN (SELECT business_id FROM tags WHERE tag = 'wifi') AND l.active = 1 ORDER BY b.source_rating DESC",
+    "WITH parking AS (SELECT business_id FROM tags WHERE tag LIKE '%parking%') SELECT b.name, "
+    "CASE WHEN p.business_id IS NULL THEN 'no' ELSE 'yes' END AS has_parking FROM businesses AS b "
+    "LEFT JOIN parking AS p ON p.business_id = b.id WHERE lower(b.name) = lower('Fournée Bakery')",
+]
+
+
+async def _measure_loop_lag(interval: float, lags: list[float], stop: asyncio.Event) -> None:
+    """Records how late the event loop wakes up from sleeps, i.e. how long it was blocked."""
+    while not stop.is_set():
+        start_time = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - start_time - interval))
+
+
+async def benchmark(mode: ExecutorMode, args: argparse.Namespace) -> dict[str, float]:
+    """Validates queries concurrently on an executor mode, measuring throughput and event loop lag."""
+    executors = StageExecutors(settings.model_copy(update={"sql_validation_executor": mode.value}), Metrics())
+    logger = logging.getLogger("benchmark")
+    await executors.warm_up()
+
+    remaining = iter(range(args.validations))
+
+    async def _client() -> None:
+        for index in remaining:
+            query = QUERIES[index % len(QUERIES)]
+            await executors.run(ExecutorStage.SQL_VALIDATION, validate_and_limit_sql, query, "sqlite", logger)
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    lag_monitor = asyncio.create_task(_measure_loop_lag(args.lag_interval_ms / 1000, lags, stop))
+    start_time = time.perf_counter()
+    await asyncio.gather(*(_client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start_time
+    stop.set()
+    await lag_monitor
+    executors.shutdown()
+
+    lags.sort()
+    return {
+        "validations_per_second": args.validations / elapsed,
+        "lag_p50_ms": statistics.median(lags) * 1000 if lags else 0.0,
+        "lag_p99_ms": lags[int(len(lags) * 0.99) - 1] * 1000 if lags else 0.0,
+        "lag_max_ms": lags[-1] * 1000 if lags else 0.0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Compares SQL validation executor modes under validation-heavy load.")
+    parser.add_argument("--validations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32, help="Validations in flight")
+    parser.add_argument("--lag-interval-ms", type=float, default=1.0, help="Sleep interval of the loop lag monitor")
+    parser.add_argument("--modes", nargs="+", default=[mode.value for mode in ExecutorMode])
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'validations/s':>14} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    for mode in map(ExecutorMode, args.modes):
+        result = await benchmark(mode, args)
+        print(
+            f"{mode.value:>8} {result['validations_per_second']:>14.1f} {result['lag_p50_ms']:>11.2f} "
+            f"{result['lag_p99_ms']:>11.2f} {result['lag_max_ms']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+import argparse
+import logging
+import sqlite3
+import statistics
+import time
+from pathlib import Path
+
+from src.utils.synthetic_data import generate_dataset
+from src.utils.validate_sql import validate_and_limit_sql
+
+# Shapes of the queries generated for the sample questions, run as validated, i.e. with the row cap applied
+QUERIES: dict[str, str] = {
+    "list_all": "SELECT b.name, l.address, b.phone FROM businesses AS b JOIN locations AS l ON l.business_id = b.id",
+    "count_by_zip": "SELECT COUNT(*) AS business_count FROM businesses AS b "
+    "JOIN locations AS l ON l.business_id = b.id WHERE l.zip_code = '94501'",
+    "count_by_tag": "SELECT COUNT(DISTINCT b.id) AS business_count FROM businesses AS b "
+    "JOIN tags AS t ON t.business_id = b.id WHERE t.tag = 'wi_fi'",
+    "list_by_tags": "SELECT DISTINCT b.name FROM businesses AS b JOIN tags AS t ON t.business_id = b.id "
+    "WHERE t.tag IN ('alcohol', 'happy_hour') ORDER BY b.name",
+    "top_rated_by_tag": "SELECT b.name, l.address FROM businesses AS b JOIN locations AS l ON l.business_id = b.id "
+    "WHERE b.id IN (SELECT business_id FROM tags WHERE tag = 'wi_fi') AND l.active = 1 ORDER BY b.source_rating DESC",
+    "count_by_city": "SELECT l.city, COUNT(*) AS business_count FROM locations AS l GROUP BY l.city "
+    "ORDER BY business_count DESC",
+    "name_lookup": "SELECT b.name, b.phone, l.address FROM businesses AS b JOIN locations AS l ON l.business_id = b.id "
+    "WHERE b.name = 'Golden Bay Bakery'",
+    "name_lookup_lower": "WITH parking AS (SELECT business_id FROM tags WHERE tag LIKE '%parking%') SELECT b.name, "
+    "CASE WHEN p.business_id IS NULL THEN 'no' ELSE 'yes' END AS has_parking FROM businesses AS b "
+    "LEFT JOIN parking AS p ON p.business_id = b.id WHERE lower(b.name) = lower('Golden Bay Bakery')",
+    "name_like": "SELECT b.name, l.address FROM businesses AS b JOIN locations AS l ON l.business_id = b.id "
+    "WHERE b.name LIKE '%Bakery%'",
+}
+
+SIZE_SUFFIXES: dict[str, int] = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(size: str) -> int:
+    """Parses a dataset size such as 10k or 1m."""
+    multiplier = SIZE_SUFFIXES.get(size[-1].lower())
+    return int(float(size[:-1]) * multiplier) if multiplier else int(size)
+
+
+def full_scans(connection: sqlite3.Connection, query: str) -> list[str]:
+    """Returns the steps of the query plan reading a whole table without an index."""
+    plan = connection.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    return [
+        detail
+        for _, _, _, detail in plan
+        if detail.startswith("SCAN ") and "INDEX" not in detail and "CONSTANT ROW" not in detail
+    ]
+
+
+def benchmark(path: Path, repeats: int, logger: logging.Logger) -> dict[str, dict]:
+    """Runs each query of the corpus against a dataset, measuring its latency and inspecting its plan."""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    results: dict[str, dict] = {}
+    try:
+        for shape, query in QUERIES.items():
+            validated = validate_and_limit_sql(query, "sqlite", logger)
+            assert validated.is_valid and validated.validated_query, f"{shape}: {validated.message}"
+            latencies: list[float] = []
+            rows: list = []
+            connection.execute(validated.validated_query).fetchall()  # Warms up the page cache
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                rows = connection.execute(validated.validated_query).fetchall()
+                latencies.append(time.perf_counter() - start_time)
+            results[shape] = {
+                "median_ms": statistics.median(latencies) * 1000,
+                "max_ms": max(latencies) * 1000,
+                "rows": len(rows),
+                "full_scans": full_scans(connection, validated.validated_query),
+            }
+    finally:
+        connection.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks representative generated SQL on synthetic datasets.")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "1m"], help="Numbers of businesses, e.g. 10k 1m 10m")
+    parser.add_argument("--data-dir", type=Path, default=Path("data/synthetic"), help="Where datasets are generated")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs of each query, after a first warm-up run")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(message)s")
+    logger = logging.getLogger("benchmark_queries")
+    logger.setLevel(logging.INFO)
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+
+    by_size: dict[str, dict[str, dict]] = {}
+    for size in args.sizes:
+        path = args.data_dir / f"businesses-{size.lower()}-seed{args.seed}.db"
+        if not path.exists():
+            logger.info(f"Generating {size} businesses into {path} ...")
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.unlink(missing_ok=True)
+            generate_dataset(tmp_path, parse_size(size), args.seed, logger=logger)
+            tmp_path.rename(path)
+        by_size[size] = benchmark(path, args.repeats, logging.getLogger("validate_sql"))
+
+    print(f"{'shape':>18} {'size':>6} {'median ms':>10} {'max ms':>10} {'rows':>5}  full scans")
+    for shape in QUERIES:
+        for size, results in by_size.items():
+            result = results[shape]
+            print(
+                f"{shape:>18} {size:>6} {result['median_ms']:>10.2f} {result['max_ms']:>10.2f} {result['rows']:>5}  "
+                f"{', '.join(result['full_scans']) or '-'}"
+            )
+
+    smallest, largest = args.sizes[0], args.sizes[-1]
+    if smallest != largest:
+        # A whole table scan shows up as latency growing in line with the dataset, instead of staying flat
+        growth = parse_size(largest) / parse_size(smallest)
+        print(f"\nShapes scanning whole tables, with latency growing linearly from {smallest} to {largest}:")
+        degraded = [
+            shape
+            for shape in QUERIES
+            if by_size[largest][shape]["full_scans"]
+            and by_size[largest][shape]["median_ms"] > growth / 2 * by_size[smallest][shape]["median_ms"]
+        ]
+        print(
+            "\n".join(f"  {shape}: {', '.join(by_size[largest][shape]['full_scans'])}" for shape in degraded) or "  -"
+        )
+
+
+if __name__ == "__main__":
+    main()
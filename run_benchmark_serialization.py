@@ -0,0 +1,131 @@
+import argparse
+import json
+import time
+from typing import Any, Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from httpx import Response
+
+from src.models.app.business_data import BusinessBase, BusinessLocation, BusinessTags
+from src.models.app.response import (
+    AnswerResponse,
+    GetYelpDataResponse,
+    answer_response_codec,
+    get_yelp_data_response_codec,
+)
+from src.utils.serialization import decode_json
+from src.utils.synthetic_data import SyntheticBusinessGenerator
+from src.utils.yelp import YelpBusinessData
+
+
+def build_payload(businesses: int, seed: int) -> tuple[GetYelpDataResponse, list[Response]]:
+    """Builds a GetYelpDataResponse of synthetic businesses, and the Yelp search response bodies they'd be parsed from."""
+    generator = SyntheticBusinessGenerator(seed)
+    data: list[YelpBusinessData] = []
+    bodies: list[Response] = []
+    for business_id in range(1, businesses + 1):
+        (_, name, url, source, source_id, source_url, rating, phone), location, tags = generator.rows(business_id)
+        _, _, longitude, latitude, address, city, zip_code, country, state, active = location
+        tag_names = {tag for _, tag in tags}
+        data.append(
+            YelpBusinessData(
+                business_data=BusinessBase(
+                    name=name,
+                    url=url,
+                    source=source,
+                    source_id=source_id,
+                    source_url=source_url,
+                    source_rating=rating,
+                    phone=phone,
+                ),
+                location_data=BusinessLocation(
+                    longitude=longitude,
+                    latitude=latitude,
+                    address=address,
+                    city=city,
+                    zip_code=zip_code,
+                    country=country,
+                    state=state,
+                    active=active,
+                ),
+                business_tags=BusinessTags(**{tag: tag in tag_names for tag in BusinessTags.model_fields}),
+            )
+        )
+        yelp_business = {
+            "id": source_id,
+            "name": name,
+            "url": url,
+            "rating": rating,
+            "phone": phone or "",
+            "display_phone": phone or "",
+            "coordinates": {"latitude": latitude, "longitude": longitude},
+            "location": {
+                "display_address": address.split(" ", 3),
+                "city": city,
+                "zip_code": zip_code,
+                "country": country,
+                "state": state,
+            },
+            "attributes": {tag: True for tag in tag_names},
+        }
+        bodies.append(Response(200, content=json.dumps({"businesses": [yelp_business], "total": 1}).encode()))
+    return GetYelpDataResponse(data=data, missing=[]), bodies
+
+
+def measure(func: Callable[[], Any], repeats: int) -> float:
+    """Returns the best time of the function, in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compares stdlib and compiled JSON paths on a Yelp data payload.")
+    parser.add_argument("--businesses", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    payload, bodies = build_payload(args.businesses, args.seed)
+    artifact = json.dumps(payload.model_dump(), indent=2)
+    compact_artifact = get_yelp_data_response_codec.encode(payload)
+    answers = [AnswerResponse(answer=f"The phone is {business.business_data.phone}.") for business in payload.data]
+
+    # Each case runs the previous implementation, then the one of the serialization module
+    cases: dict[str, tuple[Callable[[], Any], Callable[[], Any]]] = {
+        "yelp body decode": (
+            lambda: [(body.json(), body.json()) for body in bodies],
+            lambda: [decode_json(body.content) for body in bodies],
+        ),
+        "artifact write": (
+            lambda: json.dumps(payload.model_dump(), indent=2),
+            lambda: get_yelp_data_response_codec.encode(payload),
+        ),
+        "artifact read": (
+            lambda: [YelpBusinessData.model_validate(business) for business in json.loads(artifact)["data"]],
+            lambda: get_yelp_data_response_codec.decode(compact_artifact),
+        ),
+        "response encode": (
+            lambda: JSONResponse(jsonable_encoder(payload)).body,
+            lambda: get_yelp_data_response_codec.response(payload).body,
+        ),
+        "answer encode x N": (
+            lambda: [JSONResponse(jsonable_encoder(answer)).body for answer in answers],
+            lambda: [answer_response_codec.response(answer).body for answer in answers],
+        ),
+    }
+
+    print(f"{args.businesses} businesses, best of {args.repeats}")
+    print(f"{'case':>18} {'stdlib ms':>10} {'compiled ms':>12} {'speedup':>8}")
+    for name, (baseline, compiled) in cases.items():
+        baseline_ms = measure(baseline, args.repeats)
+        compiled_ms = measure(compiled, args.repeats)
+        print(f"{name:>18} {baseline_ms:>10.1f} {compiled_ms:>12.1f} {baseline_ms / compiled_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
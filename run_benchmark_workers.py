@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+from src.settings import settings
+
+QUESTIONS: list[str] = [
+    "What are the addresses and phone numbers of each business?",
+    "How many businesses are registered zip code 94608?",
+    "How many businesses offer WIFI?",
+    "Which businesses serve alcohol?",
+    "Which businesses offer WIFI and give me their addresses?",
+    "Is there parking at Fournée Bakery?",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics", headers={"x-api-key": settings.api_key}, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server on port {port} did not start within {timeout} seconds")
+
+
+async def _load(port: int, requests: int, concurrency: int) -> list[float]:
+    """Sends requests cycling through the sample questions and returns their latencies in seconds."""
+    latencies: list[float] = []
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(QUESTIONS[index % len(QUESTIONS)])
+
+    async def _client(client: httpx.AsyncClient) -> None:
+        while not queue.empty():
+            question = queue.get_nowait()
+            start_time = time.perf_counter()
+            response = await client.post(
+                f"http://127.0.0.1:{port}/answer", json={"question": question}, headers={"x-api-key": settings.api_key}
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start_time)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await asyncio.gather(*(_client(client) for _ in range(concurrency)))
+    return latencies
+
+
+def _run_client_process(port: int, requests: int, concurrency: int) -> list[float]:
+    return asyncio.run(_load(port, requests, concurrency))
+
+
+def benchmark(workers: int, args: argparse.Namespace) -> dict[str, float]:
+    """Starts run_server.py with a number of workers and measures its throughput on warm caches."""
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "run_server.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, "PROMPT_RELOAD_INTERVAL": "0"},
+    )
+    try:
+        _wait_until_ready(port, args.startup_timeout)
+        _run_client_process(port, len(QUESTIONS), 1)  # Warms the shared caches, so only the app itself is measured
+
+        # Several client processes, as a single Python client saturates before many workers do
+        requests_per_client = args.requests // args.client_processes
+        start_time = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.client_processes) as executor:
+            results = list(
+                executor.map(
+                    _run_client_process,
+                    [port] * args.client_processes,
+                    [requests_per_client] * args.client_processes,
+                    [args.concurrency] * args.client_processes,
+                )
+            )
+        elapsed = time.perf_counter() - start_time
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies = sorted(latency for result in results for latency in result)
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks /answer throughput of run_server.py from 1 to N workers.")
+    parser.add_argument("--max-workers", type=int, default=settings.app_workers)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight per client process")
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    worker_counts = sorted({1, args.max_workers, *(2**i for i in range(1, args.max_workers.bit_length()))})
+    worker_counts = [count for count in worker_counts if count <= args.max_workers]
+
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    baseline: float | None = None
+    for workers in worker_counts:
+        result = benchmark(workers, args)
+        baseline = baseline or result["requests_per_second"]
+        print(
+            f"{workers:>8} {result['requests_per_second']:>10.1f} {result['requests_per_second'] / baseline:>7.2f}x "
+            f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from src.utils.database import db
+from src.utils.synthetic_data import generate_dataset
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generates a database of synthetic businesses, locations and tags.")
+    parser.add_argument("--businesses", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Database file to create, must not exist")
+    parser.add_argument(
+        "--publish", action="store_true", help="Publish the dataset as a new snapshot of the app's database instead"
+    )
+    args = parser.parse_args()
+    if (args.output is None) == (not args.publish):
+        parser.error("exactly one of --output or --publish is required")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    logger = logging.getLogger("generate_dataset")
+    start_time = time.perf_counter()
+    if args.publish:
+        with db.snapshots.build() as path:
+            generate_dataset(path, args.businesses, args.seed, logger=logger)
+        output = db.snapshots.current_path()
+    else:
+        if args.output.exists():
+            parser.error(f"{args.output} already exists")
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        generate_dataset(args.output, args.businesses, args.seed, logger=logger)
+        output = args.output
+    logger.info(f"Generated {args.businesses} businesses in {time.perf_counter() - start_time:.1f}s: {output}")
+
+
+if __name__ == "__main__":
+    main()
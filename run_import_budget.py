@@ -0,0 +1,54 @@
+import argparse
+import subprocess
+import sys
+
+# Heavy modules that must stay out of the app import and are loaded by the startup warm-up instead
+DEFERRED_MODULES: tuple[str, ...] = ("google.genai", "sqlglot", "httpx", "pandas")
+
+
+def measure_import_time_us(module: str) -> int:
+    """Measures the cumulative import time of a module in a fresh interpreter using -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    for line in result.stderr.splitlines():
+        _, _, cumulative, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        if name == module:
+            return int(cumulative)
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def find_loaded_modules(module: str, candidates: tuple[str, ...]) -> list[str]:
+    """Returns which of the candidate modules get loaded when importing a module."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(' '.join(m for m in {candidates!r} if m in sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fails if importing the app exceeds its import time budget.")
+    parser.add_argument("--module", default="src.app")
+    parser.add_argument("--budget-ms", type=float, default=900.0)
+    parser.add_argument("--runs", type=int, default=3, help="Best of N runs is compared against the budget")
+    args = parser.parse_args()
+
+    import_time_ms = min(measure_import_time_us(args.module) for _ in range(args.runs)) / 1000
+    loaded = find_loaded_modules(args.module, DEFERRED_MODULES)
+
+    print(f"Import time of {args.module}: {import_time_ms:.1f} ms (budget: {args.budget_ms:.1f} ms)")
+    failed = False
+    if import_time_ms > args.budget_ms:
+        print(f"FAILED: import time exceeds budget by {import_time_ms - args.budget_ms:.1f} ms")
+        failed = True
+    if loaded:
+        print(f"FAILED: deferred modules imported at app import: {', '.join(loaded)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
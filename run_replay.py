@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+from src.utils.tracing import RequestTrace, TraceRecorder, read_traces
+
+if TYPE_CHECKING:
+    from google.genai import Client as GoogleClient
+
+# Caches by the trace field and value recording a hit
+CACHE_SOURCES: dict[str, tuple[str, str]] = {
+    "answer_cache": ("answer_source", "answer_cache"),
+    "sql_template": ("sql_source", "sql_template"),
+    "result_cache": ("rows_source", "result_cache"),
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile))] if values else 0.0
+
+
+async def replay(traces: list[RequestTrace], output: Path, verbose: bool) -> int:
+    """
+    Replays the questions of the traces through the app in process, answering LLM calls with the recorded responses,
+    and records the replayed requests to the output trace file.
+
+    Returns:
+        int: Number of LLM calls without a recorded response
+    """
+    # Replays run offline against fresh per-process caches, without recording to the app's own trace file
+    os.environ["LLM_OFFLINE"] = "true"
+    os.environ.pop("SHARED_CACHE_PATH", None)
+    os.environ.pop("TRACE_PATH", None)
+    from httpx import ASGITransport, AsyncClient
+
+    from src.app import app
+    from src.settings import settings
+    from src.utils.llm_stub import ReplayGoogleClient
+
+    output.unlink(missing_ok=True)
+    async with app.router.lifespan_context(app):
+        if not verbose:
+            logging.getLogger(settings.app_name).setLevel(logging.WARNING)
+        state = app.state.state
+        replay_client = ReplayGoogleClient()
+        state._google_client = cast("GoogleClient", replay_client)
+        state.traces = TraceRecorder(output)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://replay", timeout=120) as client:
+            for trace in traces:
+                replay_client.load(trace.llm_calls)
+                await client.post(
+                    "/answer",
+                    json={"question": trace.question, "session_id": trace.session_id},
+                    headers={"x-api-key": settings.api_key},
+                )
+    return replay_client.unrecorded_calls
+
+
+def _timings(traces: list[RequestTrace], name: str) -> list[float]:
+    """Returns the durations of a stage of the traces in milliseconds, or of the whole requests for total."""
+    if name == "total":
+        return [trace.duration_ms for trace in traces]
+    return [trace.stage_timings_ms[name] for trace in traces if name in trace.stage_timings_ms]
+
+
+def _hit_rate(traces: list[RequestTrace], cache: str) -> float:
+    field, source = CACHE_SOURCES[cache]
+    return sum(getattr(trace, field) == source for trace in traces) / max(1, len(traces))
+
+
+def report_latencies(replayed: list[RequestTrace], baseline: list[RequestTrace] | None) -> None:
+    stages = sorted({name for trace in replayed for name in trace.stage_timings_ms})
+    print(f"\n{'Latency (ms)':<22}{'p50':>10}{'p95':>10}" + (f"{'p50 delta':>12}{'p95 delta':>12}" if baseline else ""))
+    for name in ["total", *stages]:
+        timings = _timings(replayed, name)
+        line = f"{name:<22}{_percentile(timings, 0.5):>10.2f}{_percentile(timings, 0.95):>10.2f}"
+        if baseline:
+            baseline_timings = _timings(baseline, name)
+            line += f"{_percentile(timings, 0.5) - _percentile(baseline_timings, 0.5):>+12.2f}"
+            line += f"{_percentile(timings, 0.95) - _percentile(baseline_timings, 0.95):>+12.2f}"
+        print(line)
+
+
+def report_cache_hits(replayed: list[RequestTrace], baseline: list[RequestTrace] | None) -> None:
+    print(f"\n{'Cache hit rate':<22}{'replay':>10}" + (f"{'baseline':>10}" if baseline else ""))
+    for cache in CACHE_SOURCES:
+        line = f"{cache:<22}{_hit_rate(replayed, cache):>10.1%}"
+        if baseline:
+            line += f"{_hit_rate(baseline, cache):>10.1%}"
+        print(line)
+
+
+def report_changes(replayed: list[RequestTrace], reference: list[RequestTrace], name: str) -> int:
+    """Prints the questions whose validated SQL, rows or answer changed from the reference traces."""
+    changes = 0
+    print(f"\nChanges from {name}:")
+    for new, old in zip(replayed, reference):
+        if new.question != old.question:
+            raise SystemExit(f"Traces of {name} don't match the replayed corpus: {old.question!r} != {new.question!r}")
+        changed = [field for field in ("sql", "rows", "answer") if getattr(new, field) != getattr(old, field)]
+        if changed:
+            changes += 1
+            print(f"  {new.question!r}: {', '.join(changed)} changed")
+            if "sql" in changed:
+                print(f"    - {old.sql}\n    + {new.sql}")
+    print(f"  {changes} out of {len(replayed)} questions changed")
+    return changes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replays a recorded trace corpus (TRACE_PATH) against the current code with the recorded LLM "
+        "responses, reporting latencies, cache hit rates and changes of validated SQL, rows and answers."
+    )
+    parser.add_argument("--traces", type=Path, required=True, help="Recorded trace file")
+    parser.add_argument("--output", type=Path, default=Path("./data/replay.ndjson"), help="Traces of the replay")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        help="Output of a replay at another commit, to compare latencies, cache hit rates and results with",
+    )
+    parser.add_argument("--fail-on-change", action="store_true", help="Exit with code 1 if any result changed")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's info logs")
+    args = parser.parse_args()
+
+    # Page requests resume server-side cursors, which don't outlive the recording
+    traces = [
+        trace for trace in read_traces(args.traces) if trace.question is not None and trace.sql_source != "cursor"
+    ]
+    baseline = read_traces(args.baseline) if args.baseline else None
+    unrecorded_calls = asyncio.run(replay(traces, args.output, args.verbose))
+    replayed = read_traces(args.output)
+
+    print(f"Replayed {len(replayed)} traces at commit {_git_commit()} to {args.output}")
+    if unrecorded_calls:
+        print(f"{unrecorded_calls} LLM calls had no recorded response and got the fixed offline answer")
+    report_latencies(replayed, baseline)
+    report_cache_hits(replayed, baseline)
+    changes = report_changes(replayed, traces, "recording")
+    if baseline:
+        changes += report_changes(replayed, baseline, "baseline")
+    if changes and args.fail_on_change:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import uvicorn
+
+# Modules imported once in the parent process, so forked workers share their memory pages instead of each importing them
+PRELOADED_MODULES: tuple[str, ...] = ("google.genai", "sqlglot", "httpx")
+
+
+def _run_worker(config: "uvicorn.Config", sock: socket.socket) -> None:
+    """Runs the app in a forked worker process, serving requests accepted on the parent's socket."""
+    import uvicorn
+
+    from src.utils.database import db
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    db.dispose_after_fork()
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Runs the app in production mode with multiple worker processes.")
+    parser.add_argument("--workers", type=int, default=None, help="Defaults to the APP_WORKERS setting")
+    parser.add_argument("--host", default=None, help="Defaults to the APP_HOST setting")
+    parser.add_argument("--port", type=int, default=None, help="Defaults to the APP_PORT setting")
+    args = parser.parse_args()
+
+    # Share the answer and result caches between workers, unless configured otherwise. Settings are read on import.
+    from src.utils.shared_cache import default_shared_cache_path, remove_shared_cache
+
+    owned_cache_path = None
+    if "SHARED_CACHE_PATH" not in os.environ:
+        owned_cache_path = default_shared_cache_path(os.getpid())
+        os.environ["SHARED_CACHE_PATH"] = str(owned_cache_path)
+
+    # Preload the app and heavy modules before forking
+    import uvicorn
+
+    from src.app import app
+    from src.settings import settings
+
+    for module in PRELOADED_MODULES:
+        importlib.import_module(module)
+
+    workers = args.workers or settings.app_workers
+    config = uvicorn.Config(
+        app,
+        host=args.host or settings.app_host,
+        port=args.port or settings.app_port,
+        lifespan="on",
+        log_level="debug" if settings.debug else "info",
+    )
+    sock = config.bind_socket()
+    gc.freeze()  # Keeps the garbage collector from touching, and thereby copying, preloaded objects in the workers
+
+    children: dict[int, int] = {}  # pid -> worker index
+    stopping = False
+
+    def _spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                _run_worker(config, sock)
+            except BaseException:
+                exit_code = 1
+            os._exit(exit_code)
+        children[pid] = index
+
+    def _stop(signum: int, frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    print(f"Starting {workers} workers on {config.host}:{config.port} (parent pid {os.getpid()})")
+    for index in range(workers):
+        _spawn(index)
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            if pid not in children:
+                continue
+            index = children.pop(pid)
+            if stopping:
+                continue
+            print(f"Worker {index} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}, restarting")
+            time.sleep(1)  # Avoids a tight restart loop if workers keep failing on startup
+            _spawn(index)
+    finally:
+        sock.close()
+        if owned_cache_path is not None:
+            remove_shared_cache(owned_cache_path)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
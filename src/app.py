@@ -1,38 +1,78 @@
+import asyncio
+import time
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from fastapi import FastAPI
 
+from src.routers.admin import router as admin_router
 from src.routers.answer import router as answer_router
 from src.routers.get_yelp_data import router as yelp_router
+from src.routers.metrics import router as metrics_router
 from src.settings import settings
 from src.utils.logger import get_queue_logger
+from src.utils.middleware.admission import AdmissionMiddleware
 from src.utils.middleware.auth import AuthMiddleware
 from src.utils.middleware.log import LoggerMiddleware
+from src.utils.middleware.profiling import ProfilingMiddleware
+from src.utils.middleware.tracing import TracingMiddleware
+from src.utils.prompt_registry import prompt_registry
 from src.utils.state import State
+from src.utils.warmup import warm_up
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """
-    Manages client connections during lifespan of app, inits logger and thread pool.
+    Manages client connections during lifespan of app, inits logger, thread pool, prompt registry and loop monitor.
     Opens them upon start up, ensuring single connection for the entire app and implicitly closes connections upon shutdown.
     """
     # Init
+    start_time = time.perf_counter()
     logger, listener = get_queue_logger(settings.app_name)
     app.state.state = State(logger)
+
+    if settings.warm_up_enabled:
+        warm_up_durations = await warm_up(app.state.state)
+        logger.info(f"Warm-up steps completed in seconds: {warm_up_durations}")
+    startup_seconds = time.perf_counter() - start_time
+    app.state.state.metrics.set_gauge("startup_seconds", round(startup_seconds, 4))
+    logger.info(f"Startup completed in {startup_seconds * 1000:.1f} ms")
+
+    if settings.loop_monitor_interval_ms > 0:
+        app.state.state.loop_monitor.start()
+    prompt_watcher: asyncio.Task | None = None
+    if settings.prompt_reload_interval > 0:
+        prompt_watcher = asyncio.create_task(prompt_registry.watch(logger, settings.prompt_reload_interval))
     yield
 
     # Cleanup
+    if prompt_watcher is not None:
+        prompt_watcher.cancel()
+    app.state.state.loop_monitor.stop()
     app.state.state.shutdown()
     listener.stop()
 
 
 app = FastAPI(lifespan=lifespan)
 
+# Middleware added last runs first: requests are authenticated and logged before waiting for admission, and only
+# profiled and traced once admitted
+app.add_middleware(
+    ProfilingMiddleware,
+    sample_rate=settings.profiling_sample_rate,
+    interval_ms=settings.profiling_interval_ms,
+)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(
+    AdmissionMiddleware,
+    default_deadline_ms=settings.admission_default_deadline_ms,
+)
 app.add_middleware(LoggerMiddleware)
-app.add_middleware(AuthMiddleware, api_key=settings.api_key)
+app.add_middleware(AuthMiddleware, api_keys=settings.api_key_configs)
 
 # Mount routers
 app.include_router(yelp_router)
 app.include_router(answer_router)
+app.include_router(metrics_router)
+app.include_router(admin_router)
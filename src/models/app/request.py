@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class BasicBusinessInfo(BaseModel):
@@ -9,7 +9,18 @@ class BasicBusinessInfo(BaseModel):
 
 class GetYelpDataRequest(BaseModel):
     businesses: list[BasicBusinessInfo]
+    load_to_db: bool = False
 
 
 class AnswerRequest(BaseModel):
     question: str
+    session_id: str | None = Field(
+        default=None,
+        min_length=1,
+        max_length=128,
+        description="Id of the conversation, chosen by the client, to answer follow-ups on the previous question.",
+    )
+    cursor: str | None = Field(
+        default=None,
+        description="next_cursor of a previous answer, to answer the next page of its results instead of the question.",
+    )
@@ -1,5 +1,9 @@
+from datetime import datetime
+
 from pydantic import BaseModel, Field
 
+from src.utils.jobs import JobStatus
+from src.utils.serialization import JsonCodec
 from src.utils.yelp import YelpBusinessData
 
 
@@ -8,5 +12,28 @@ class GetYelpDataResponse(BaseModel):
     missing: list[str] = Field(default_factory=list)
 
 
+class YelpJobResponse(BaseModel):
+    job_id: str
+    status: JobStatus
+    total: int
+    fetched: int
+    found: int
+    missing: list[str] = Field(default_factory=list)
+    load_to_db: bool
+    loaded: bool
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
+
+
 class AnswerResponse(BaseModel):
     answer: str
+    total_matches: int | None = None  # Rows matching the question, set if the answer only covers part of them
+    next_cursor: str | None = None  # Cursor of the next page of the results, set if another page follows
+
+
+# Compiled once at import, used to write responses and artifacts straight to JSON bytes
+answer_response_codec = JsonCodec(AnswerResponse)
+get_yelp_data_response_codec = JsonCodec(GetYelpDataResponse)
+yelp_job_response_codec = JsonCodec(YelpJobResponse)
+yelp_business_data_codec = JsonCodec(YelpBusinessData)
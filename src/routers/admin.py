@@ -0,0 +1,31 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from src.utils.state import State, get_state
+
+router = APIRouter(prefix="/admin")
+
+
+def require_profiling_key(request: Request) -> None:
+    """Restricts a route to API keys allowed to profile requests."""
+    if not getattr(request.state, "profiling_allowed", False):  # Set by AuthMiddleware
+        raise HTTPException(status_code=403, detail="Forbidden: API key is not allowed to access profiles")
+
+
+@router.get("/profiles", dependencies=[Depends(require_profiling_key)])
+async def list_profiles(state: State = Depends(get_state)) -> list[dict[str, Any]]:
+    """Lists the stored request profiles, newest first, with their question hash and stage timings."""
+    return await state.run_in_thread_pool(state.profiles.list)
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_profiling_key)])
+async def download_profile(profile_id: str, state: State = Depends(get_state)) -> PlainTextResponse:
+    """Downloads the collapsed stacks of a profile, to render with flamegraph.pl, speedscope or inferno."""
+    folded = await state.run_in_thread_pool(state.profiles.read, profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return PlainTextResponse(
+        folded, headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+    )
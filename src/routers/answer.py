@@ -1,53 +1,451 @@
-from fastapi import APIRouter, Depends
+from dataclasses import replace
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models.app.request import AnswerRequest
-from src.models.app.response import AnswerResponse
-from src.models.app.validation import GeneratedAnswer, GeneratedSQL
-from src.models.database.sqlite import Business, Location, Tag
-from src.utils.database import get_session
+from src.models.app.response import AnswerResponse, answer_response_codec
+from src.models.app.validation import GeneratedAnswer
+from src.utils.database import get_session, get_session_generation
+from src.utils.executors import ExecutorStage
 from src.utils.generate_answer import generate_gemini_model_validated_answer
-from src.utils.prompt_builder import build_answer_generation_prompt, build_sql_generation_prompt
+from src.utils.generate_sql import generate_validated_sql
+from src.utils.model_router import Stage
+from src.utils.pagination import Keyset, Page, PageCursor, build_count_query, build_keyset, build_page_query, split_page
+from src.utils.prompt_builder import build_answer_generation_prompt
+from src.utils.render_answer import render_answer_locally, render_results_list
+from src.utils.schema_pruning import DEFAULT_COLUMNS
+from src.utils.sessions import SessionTurn, build_entity_ids_query, is_follow_up, project_turn, scope_to_entities
+from src.utils.sql_templates import SQLTemplate, build_sql_template, resolve_entities
+from src.utils.stages import stage
 from src.utils.state import State, get_state
-from src.utils.validate_sql import validate_and_limit_sql
+from src.utils.tracing import record
+from src.utils.usage import BudgetState
+from src.utils.validate_sql import MAX_LIMIT, ProjectedColumn
 
 router = APIRouter()
 
 
-@router.post("/answer")
+@router.post("/answer", response_model=AnswerResponse)
 async def answer(
-    request: AnswerRequest, state: State = Depends(get_state), session: AsyncSession = Depends(get_session)
-) -> AnswerResponse:
-    # Generate SQL
-    sql_generation_system_prompt, sql_generation_user_prompt = await build_sql_generation_prompt(
-        request.question, state.db.dialect, [Business, Location, Tag]
+    request: AnswerRequest,
+    http_request: Request,
+    state: State = Depends(get_state),
+    session: AsyncSession = Depends(get_session),
+) -> Response:
+    api_key = getattr(http_request.state, "api_key_name", "none")  # Set by AuthMiddleware
+    generation = get_session_generation(session)  # Generation of the snapshot the session reads from
+    record(question=request.question, session_id=request.session_id, generation=generation)
+    if request.cursor is not None:
+        return await _answer_page(request.cursor, generation, state, session)
+
+    # Follow-ups are resolved against the previous question of the session, read from the same data
+    previous_turn = (
+        state.sessions.get(api_key, request.session_id, generation) if request.session_id is not None else None
     )
-    generated_sql: GeneratedSQL = await generate_gemini_model_validated_answer(
-        state, (sql_generation_system_prompt, sql_generation_user_prompt), GeneratedSQL
+    follow_up = previous_turn if previous_turn is not None and is_follow_up(request.question) else None
+
+    # Reuse the answer to the same question asked against the current data, possibly by another worker. Questions of a
+    # session are answered from their results, which its follow-ups are resolved against
+    if request.session_id is None:
+        with stage("answer_cache"):
+            cached_answer = state.answer_cache.get(request.question, generation)
+        if cached_answer is not None:
+            state.logger.info(f"Cached answer for generation {generation}: {cached_answer}")
+            record(answer_source="answer_cache", answer=cached_answer)
+            return answer_response_codec.response(AnswerResponse(answer=cached_answer))
+
+    # Reuse the SQL of a previous question that only differed by entity, follow-ups depending on their session
+    template_match = None
+    if follow_up is None:
+        with stage("sql_template_match"):
+            template_match = await _match_sql_template(request.question, state, session)
+
+    rows: list[tuple[Any, ...]] | None = None
+    entity_ids: list[Any] | None = None
+    keyset: Keyset | None = None
+    limit_applied = False  # Whether the results may be truncated by the LIMIT added by validation
+    original_limit: int | None = None  # The question's own LIMIT lowered by validation, capping every page
+    follow_up_projection = _project_follow_up(request.question, follow_up, state) if follow_up is not None else None
+    if follow_up is not None and follow_up_projection is not None:
+        # Answer from the previous results, only projected onto the columns the follow-up asks about
+        projection, rows = follow_up_projection
+        sql_query: str = follow_up.sql
+        params: dict[str, Any] = follow_up.params
+        entity_ids, keyset = follow_up.entity_ids, follow_up.keyset  # Same results, about the same businesses
+        state.logger.info(f"Answering follow-up '{request.question}' from the session's previous results")
+        record(sql_source="session", sql=sql_query, rows_source="session", rows=rows)
+    elif template_match is not None:
+        template, params = template_match
+        sql_query = template.query
+        canonical_query: str = template.canonical_query
+        projection = template.projection
+        limit_applied, original_limit = template.limit_applied, template.original_limit
+        state.logger.info(f"Reusing SQL template for user question '{request.question}' with parameters: {params}")
+        record(sql_source="sql_template", sql=sql_query)
+    elif state.usage.budget_state() == BudgetState.EXHAUSTED:
+        # Keys over their daily token budget are only answered from caches and SQL templates
+        state.usage.record_downgrade("cached_only")
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too Many Requests: daily token budget exceeded"},
+            headers={"Retry-After": str(state.usage.retry_after())},
+        )
+    else:
+        # Generate SQL, for follow-ups in the context of the previous question
+        with stage("sql_generation"):
+            validation_result = await generate_validated_sql(
+                request.question, state, (follow_up.question, follow_up.sql) if follow_up is not None else None
+            )
+        record(
+            sql_source="generated",
+            validation_message=validation_result.message,
+            sql=validation_result.validated_query,
+        )
+        if not validation_result.is_valid:
+            record(answer_source="refused")
+            return answer_response_codec.response(AnswerResponse(answer="I'm sorry, I can't answer that question."))
+        assert validation_result.validated_query is not None  # cant be None if valid sql
+        assert validation_result.canonical_query is not None
+        sql_query = validation_result.validated_query
+        canonical_query = validation_result.canonical_query
+        projection = validation_result.projection
+        limit_applied, original_limit = validation_result.limit_applied, validation_result.original_limit
+        params = {}
+
+        if follow_up is not None:
+            # Narrow the follow-up's SQL to the businesses of the previous results
+            assert request.session_id is not None
+            with stage("session_scope"):
+                scoped = await _scope_follow_up(
+                    sql_query, api_key, request.session_id, generation, follow_up, state, session
+                )
+            if scoped is not None:
+                sql_query, canonical_query = scoped
+                record(sql=sql_query)
+        else:
+            with stage("sql_template_build"):
+                sql_template = await state.executors.run(
+                    ExecutorStage.SQL_TEMPLATE,
+                    build_sql_template,
+                    request.question,
+                    validation_result,
+                    state.db.dialect,
+                )
+            if sql_template is not None:
+                state.sql_template_cache.add(sql_template)
+
+    # Run SQL in db, unless the same query was already run against the current data. Results possibly truncated by
+    # the validation LIMIT are paginated, only their first page being answered
+    page: Page | None = None
+    if rows is None:
+        if limit_applied and state.settings.answer_page_size > 0:
+            keyset = await state.executors.run(
+                ExecutorStage.SQL_TEMPLATE,
+                build_keyset,
+                sql_query,
+                state.db.dialect,
+                state.settings.answer_page_size,
+                original_limit,
+            )
+        with stage("db_query"):
+            if keyset is not None:
+                page_query, page_params = await state.executors.run(
+                    ExecutorStage.SQL_TEMPLATE, build_page_query, keyset, None
+                )
+                page_rows, result_cache_miss = await _run_query(
+                    page_query, page_query, {**params, **page_params}, generation, state, session
+                )
+                page = split_page(keyset, page_rows)
+                rows = page.rows
+            else:
+                rows, result_cache_miss = await _run_query(
+                    sql_query, canonical_query, params, generation, state, session
+                )
+        record(rows_source="database" if result_cache_miss else "result_cache", rows=rows)
+
+    # Report the total matches of truncated results, with a cursor to the next page if paginated
+    total_matches: int | None = None
+    next_cursor: str | None = None
+    if page is not None and page.has_more:
+        assert keyset is not None and page.last_keys is not None  # A page with more after it has rows
+        total_matches = await _count_matches(sql_query, params, original_limit, generation, state, session)
+        next_cursor = state.cursors.create(
+            generation,
+            PageCursor(
+                request.question, sql_query, params, projection, keyset, page.last_keys, len(rows), total_matches, 0.0
+            ),
+        )
+    elif page is None and limit_applied and len(rows) >= MAX_LIMIT:
+        total_matches = await _count_matches(sql_query, params, original_limit, generation, state, session)
+
+    # Keep the results for the session's follow-ups. Follow-ups' answers depend on the session, so they aren't cached
+    if request.session_id is not None:
+        state.sessions.set(
+            api_key,
+            request.session_id,
+            generation,
+            request.question,
+            sql_query,
+            params,
+            projection,
+            rows,
+            entity_ids,
+            keyset,
+        )
+    # Answers covering a page of the results aren't cached, as they're returned with their total and cursor
+    cache_answer = follow_up is None and total_matches is None
+    answer = await _answer_rows(request.question, sql_query, projection, rows, generation, state, cache_answer)
+    return _answer_response(answer, 0, len(rows), total_matches, next_cursor)
+
+
+async def _answer_rows(
+    question: str,
+    sql_query: str,
+    projection: tuple[ProjectedColumn, ...],
+    rows: list[tuple[Any, ...]],
+    generation: int,
+    state: State,
+    cache_answer: bool,
+) -> str:
+    """
+    Answers the question from the rows of its query, rendered locally if simple enough or else by the LLM.
+
+    Args:
+        question: The user question
+        sql_query: The query the rows were read with
+        projection: Projected columns of the query
+        rows: Rows to answer from
+        generation: Database generation the rows were read from
+        state: Application state
+        cache_answer: Whether to cache the answer for the question
+
+    Returns:
+        str: The answer
+    """
+
+    # Over budget, answer with the LLM only if the result can't be rendered locally
+    if state.usage.budget_state() != BudgetState.OK:
+        with stage("local_render"):
+            rendered_answer = render_answer_locally(
+                question, projection, rows, max(1, len(rows)), max(1, len(projection))
+            )
+            if rendered_answer is None and state.usage.budget_state() == BudgetState.EXHAUSTED:
+                rendered_answer = render_results_list(projection, rows)
+        if rendered_answer is not None:
+            state.logger.info(f"Rendered answer locally as the API key is over its token budget: {rendered_answer}")
+            state.usage.record_downgrade("local_render")
+            record(answer_source="local_render", answer=rendered_answer)
+            return rendered_answer  # Not cached, as degraded
+
+    # Render simple results locally, skipping the answer generation call
+    if state.settings.local_render_enabled:
+        with stage("local_render"):
+            rendered_answer = render_answer_locally(
+                question,
+                projection,
+                rows,
+                state.settings.local_render_max_rows,
+                state.settings.local_render_max_columns,
+            )
+        if rendered_answer is not None:
+            state.logger.info(f"Rendered answer locally: {rendered_answer}")
+            record(answer_source="local_render", answer=rendered_answer)
+            if cache_answer:
+                state.answer_cache.set(question, generation, rendered_answer)
+            return rendered_answer
+
+    # Generate answer
+    with stage("answer_generation"):
+        answer_generation_system_prompt, answer_generation_user_prompt = await build_answer_generation_prompt(
+            question, sql_query, rows
+        )
+        generated_answer = await generate_gemini_model_validated_answer(
+            state,
+            (answer_generation_system_prompt, answer_generation_user_prompt),
+            GeneratedAnswer,
+            Stage.ANSWER_GENERATION,
+        )
+    state.logger.info(f"Generated answer: {generated_answer}")
+    record(answer_source="llm", answer=generated_answer.answer)
+    if cache_answer:
+        state.answer_cache.set(question, generation, generated_answer.answer)
+    return generated_answer.answer
+
+
+async def _answer_page(token: str, generation: int, state: State, session: AsyncSession) -> Response:
+    """
+    Answers a page request, reading the page after the cursor with the question's validated SQL, without generating
+    SQL again.
+
+    Raises:
+        HTTPException: 410 if the cursor expired, is unknown or its data generation was replaced
+    """
+    cursor = state.cursors.get(token, generation)
+    if cursor is None:
+        raise HTTPException(status_code=410, detail="Cursor expired or unknown, ask the question again")
+    record(question=cursor.question, sql_source="cursor", sql=cursor.sql)
+
+    with stage("db_query"):
+        page_query, page_params = await state.executors.run(
+            ExecutorStage.SQL_TEMPLATE, build_page_query, cursor.keyset, cursor.last_keys
+        )
+        page_rows, result_cache_miss = await _run_query(
+            page_query, page_query, {**cursor.params, **page_params}, generation, state, session
+        )
+    page = split_page(cursor.keyset, page_rows)
+    record(rows_source="database" if result_cache_miss else "result_cache", rows=page.rows)
+
+    next_cursor = None
+    if page.has_more and page.last_keys is not None:
+        next_cursor = state.cursors.create(
+            generation, replace(cursor, last_keys=page.last_keys, returned=cursor.returned + len(page.rows))
+        )
+    answer = await _answer_rows(
+        cursor.question, cursor.sql, cursor.projection, page.rows, generation, state, cache_answer=False
     )
-    state.logger.info(f"Generated SQL for user question '{request.question}': {generated_sql.generated_sql}")
+    return _answer_response(answer, cursor.returned, len(page.rows), cursor.total_matches, next_cursor)
+
 
-    validation_result = await state.run_in_thread_pool(
-        validate_and_limit_sql, generated_sql.generated_sql, state.db.dialect, state.logger
+def _answer_response(
+    answer: str, offset: int, page_rows: int, total_matches: int | None, next_cursor: str | None
+) -> Response:
+    """Returns the answer, noting which of the matches it covers if it only covers a page of them."""
+    if total_matches is not None and page_rows:
+        answer = f"{answer}\n\nShowing results {offset + 1}-{offset + page_rows} of {total_matches}."
+    return answer_response_codec.response(
+        AnswerResponse(answer=answer, total_matches=total_matches, next_cursor=next_cursor)
     )
-    state.logger.info(f"Validation result: {validation_result}")
-    if not validation_result.is_valid:
-        return AnswerResponse(answer="I'm sorry, I can't answer that question.")
-    assert validation_result.validated_query is not None  # cant be None if valid sql
-    sql_query: str = validation_result.validated_query
 
-    # Run SQL in db
-    result = await session.execute(text(sql_query))
-    rows = result.all()
-    state.logger.info(f"DB query result: {rows}")
 
-    # Generate answer
-    answer_generation_system_prompt, answer_generation_user_prompt = await build_answer_generation_prompt(
-        request.question, sql_query, rows
+async def _run_query(
+    sql_query: str, canonical_query: str, params: dict[str, Any], generation: int, state: State, session: AsyncSession
+) -> tuple[list[tuple[Any, ...]], bool]:
+    """
+    Runs a query, unless the same query was already run against the current data.
+
+    Returns:
+        tuple[list[tuple[Any, ...]], bool]: The rows, and whether they were read from the database
+    """
+    rows = state.result_cache.get(canonical_query, params, generation)
+    if rows is not None:
+        state.logger.info(f"Cached query result for generation {generation}: {len(rows)} rows")
+        state.logger.debug("Cached query result: %s", rows)
+        return list(rows), False
+
+    result = await session.execute(text(sql_query), params)
+    rows = [tuple(row) for row in result.all()]
+    state.result_cache.set(canonical_query, params, generation, rows)
+    state.logger.info(f"DB query returned {len(rows)} rows")
+    state.logger.debug("DB query result: %s", rows)  # Result sets can be large, formatted only for debugging
+    return rows, True
+
+
+async def _count_matches(
+    sql_query: str,
+    params: dict[str, Any],
+    original_limit: int | None,
+    generation: int,
+    state: State,
+    session: AsyncSession,
+) -> int | None:
+    """Counts the rows the query matches without the validation LIMIT, None if it can't be counted."""
+    count_query = await state.executors.run(
+        ExecutorStage.SQL_TEMPLATE, build_count_query, sql_query, state.db.dialect, original_limit
     )
-    answer = await generate_gemini_model_validated_answer(
-        state, (answer_generation_system_prompt, answer_generation_user_prompt), GeneratedAnswer
+    if count_query is None:
+        return None
+    rows, _ = await _run_query(count_query, count_query, params, generation, state, session)
+    return int(rows[0][0])
+
+
+async def _match_sql_template(
+    question: str, state: State, session: AsyncSession
+) -> tuple[SQLTemplate, dict[str, str]] | None:
+    """
+    Matches the question against the cached SQL templates and resolves its entities against the database.
+
+    Returns:
+        tuple[SQLTemplate, dict[str, str]] | None:
+        The matched template and its bind parameters, or None if no template matches or an entity can't be resolved.
+    """
+    template_match = state.sql_template_cache.match(question)
+    if template_match is None:
+        return None
+
+    template, values = template_match
+    params = await resolve_entities(session, template, values)
+    if params is None:
+        state.logger.info(f"SQL template matched but entities could not be resolved: {values}")
+        return None
+    return template, params
+
+
+def _project_follow_up(
+    question: str, turn: SessionTurn, state: State
+) -> tuple[tuple[ProjectedColumn, ...], list[tuple[Any, ...]]] | None:
+    """
+    Resolves a follow-up only asking for other columns of the previous results, e.g. "what are their phone numbers?",
+    by projecting the previous results.
+
+    Returns:
+        tuple[tuple[ProjectedColumn, ...], list[tuple[Any, ...]]] | None:
+        The projection and rows, or None if the follow-up filters the results, refers to tags or values, or asks for
+        columns the previous results don't have
+    """
+    selection = state.schema_index.select(question, [])
+    if selection.confidence < 1.0 or selection.values:
+        return None
+    return project_turn(turn, selection.matched_columns, DEFAULT_COLUMNS.get("businesses", ()))
+
+
+async def _scope_follow_up(
+    sql_query: str,
+    api_key: str,
+    session_id: str,
+    generation: int,
+    turn: SessionTurn,
+    state: State,
+    session: AsyncSession,
+) -> tuple[str, str] | None:
+    """
+    Restricts the SQL generated for a follow-up to the businesses of the previous results, resolving their ids on
+    first use.
+
+    Returns:
+        tuple[str, str] | None: The scoped query and its canonical form, or None if either query isn't over businesses
+    """
+    entity_ids = turn.entity_ids
+    if entity_ids is None:
+        ids_query = await state.executors.run(
+            ExecutorStage.SQL_TEMPLATE,
+            build_entity_ids_query,
+            turn,
+            state.db.dialect,
+            state.settings.session_max_entity_ids,
+        )
+        if ids_query is None:
+            state.logger.info("Previous results aren't about businesses, follow-up SQL is not scoped")
+            return None
+        try:
+            result = await session.execute(text(ids_query), turn.params)
+        except SQLAlchemyError as e:
+            state.logger.warning(
+                f"Could not resolve the businesses of the previous results, follow-up SQL is not scoped: {str(e)}"
+            )
+            return None
+        entity_ids = list(dict.fromkeys(row[0] for row in result.all()))
+        state.sessions.set_entity_ids(api_key, session_id, generation, turn, entity_ids)
+
+    scoped = await state.executors.run(
+        ExecutorStage.SQL_TEMPLATE, scope_to_entities, sql_query, entity_ids, state.db.dialect
     )
-    state.logger.info(f"Generated answer: {answer}")
-    return AnswerResponse(answer=answer.answer)
+    if scoped is None:
+        state.logger.info("Follow-up SQL isn't over businesses, it is not scoped")
+        return None
+    state.logger.info(f"Scoped follow-up SQL to {len(entity_ids)} businesses of the previous results")
+    return scoped
@@ -1,43 +1,110 @@
+import asyncio
 from logging import Logger
+from typing import TYPE_CHECKING, AsyncGenerator
 
-from fastapi import APIRouter, Depends
-from httpx import AsyncClient
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response, StreamingResponse
 
-from src.models.app.request import GetYelpDataRequest
-from src.models.app.response import GetYelpDataResponse
+from src.models.app.request import BasicBusinessInfo, GetYelpDataRequest
+from src.models.app.response import YelpJobResponse, yelp_business_data_codec, yelp_job_response_codec
+from src.utils.jobs import JobStatus, YelpJobRecord
 from src.utils.state import State, get_state
 from src.utils.yelp import YelpBusinessData, YelpBusinessSearch, YelpBusinessSearchParams
 
+if TYPE_CHECKING:
+    from httpx import AsyncClient
+
 router = APIRouter()
 
 
-@router.post("/get_yelp_data")
-async def get_yelp_data(request: GetYelpDataRequest, state: State = Depends(get_state)) -> GetYelpDataResponse:
-    return await _get_yelp_data(request, state.yelp_client, state.logger)
+@router.post("/get_yelp_data", status_code=202, response_model=YelpJobResponse)
+async def get_yelp_data(request: GetYelpDataRequest, state: State = Depends(get_state)) -> Response:
+    """Starts a background job fetching the Yelp data of the businesses, returning its id immediately."""
+    job = state.jobs.create(
+        len(request.businesses),
+        request.load_to_db,
+        _iter_yelp_data(request, state.yelp_client, state.logger, state.settings.yelp_job_concurrency),
+    )
+    return _job_response(job, status_code=202)
+
+
+@router.get("/get_yelp_data/{job_id}", response_model=YelpJobResponse)
+async def get_yelp_data_job(job_id: str, state: State = Depends(get_state)) -> Response:
+    """Returns the status and counts of a job, run by any worker process."""
+    return _job_response(_get_job(job_id, state))
+
+
+@router.get("/get_yelp_data/{job_id}/stream")
+async def stream_yelp_data_job(job_id: str, state: State = Depends(get_state)) -> StreamingResponse:
+    """Streams the results of a job as NDJSON, one YelpBusinessData per line, as they are fetched."""
+    _get_job(job_id, state)
+
+    async def _lines() -> AsyncGenerator[bytes, None]:
+        async for business in state.jobs.subscribe(job_id):
+            yield yelp_business_data_codec.encode(business) + b"\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
 
+@router.delete("/get_yelp_data/{job_id}", response_model=YelpJobResponse)
+async def cancel_yelp_data_job(job_id: str, state: State = Depends(get_state)) -> Response:
+    """
+    Cancels a job, results fetched so far are kept and are not loaded into the database. Jobs already loading their
+    results into the database can't be cancelled.
+    """
+    record = await state.jobs.cancel(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if record.status == JobStatus.LOADING:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is loading its results and can't be cancelled")
+    return _job_response(record)
 
-async def _get_yelp_data(request: GetYelpDataRequest, yelp_client: AsyncClient, logger: Logger) -> GetYelpDataResponse:
+
+def _get_job(job_id: str, state: State) -> YelpJobRecord:
+    record = state.jobs.get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return record
+
+
+def _job_response(record: YelpJobRecord, status_code: int = 200) -> Response:
+    response = YelpJobResponse(**record.model_dump(exclude={"pid"}))
+    return yelp_job_response_codec.response(response, status_code=status_code)
+
+
+async def _iter_yelp_data(
+    request: GetYelpDataRequest, yelp_client: "AsyncClient", logger: Logger, concurrency: int = 1
+) -> AsyncGenerator[tuple[BasicBusinessInfo, YelpBusinessData | None], None]:
+    """
+    Fetches the Yelp data of each business, with up to `concurrency` queries in flight.
+
+    Yields:
+        tuple[BasicBusinessInfo, YelpBusinessData | None]:
+        Each business with its data, or None if it wasn't found, in the order the queries complete.
+    """
     search = YelpBusinessSearch(yelp_client, logger)
-    missing: list[str] = []
-    data: list[YelpBusinessData] = []
-    for business in request.businesses:
-        response = await search.query(
-            YelpBusinessSearchParams(
-                location_name=business.location_name,
-                zip_code=business.zip_code,
-                phone_number=business.phone_number,
-            ),
-        )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _query(business: BasicBusinessInfo) -> tuple[BasicBusinessInfo, YelpBusinessData | None]:
+        async with semaphore:
+            response = await search.query(
+                YelpBusinessSearchParams(
+                    location_name=business.location_name,
+                    zip_code=business.zip_code,
+                    phone_number=business.phone_number,
+                ),
+            )
         if response:
             logger.info(f"Successfully fetched data for {business.location_name}")
-            data.append(response)
         else:
             logger.info(f"No data found for {business.location_name}")
-            missing.append(business.location_name)
             # Can supplement with google places data for businesses that are missing from yelp
+        return business, response
 
-    logger.info(f"Missing data for {len(missing)} businesses out of {len(request.businesses)}: {missing}")
-    return GetYelpDataResponse(
-        data=data,
-        missing=missing,
-    )
+    tasks = [asyncio.create_task(_query(business)) for business in request.businesses]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,17 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from src.utils.prompt_registry import prompt_registry
+from src.utils.state import State, get_state
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics(state: State = Depends(get_state)) -> dict[str, Any]:
+    return {
+        **state.metrics.snapshot(),
+        "prompt_versions": prompt_registry.versions(),
+        "event_loop_stalls": state.loop_monitor.recent_stalls(),
+    }
@@ -1,11 +1,40 @@
 import os
+from typing import Literal
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from src import ENV_PATH
 
 
+class ApiKeyConfig(BaseModel):
+    """Limits and priority class of an API key, unset limits are unlimited."""
+
+    name: str
+    requests_per_second: float | None = Field(default=None, gt=0)
+    burst: int | None = Field(
+        default=None, gt=0, description="Token bucket capacity, defaults to one second of requests."
+    )
+    max_concurrent: int | None = Field(default=None, gt=0)
+    priority: Literal["interactive", "batch"] = "interactive"
+    profiling: bool = Field(
+        default=False, description="Whether the key may profile its requests and list and download profiles."
+    )
+    daily_token_budget: int | None = Field(
+        default=None,
+        description="LLM tokens (input and output) the key may spend per UTC day, unset is unlimited. Counted across "
+        "worker processes in the shared cache when SHARED_CACHE_PATH is set, else per worker process.",
+    )
+
+
+class ModelPrice(BaseModel):
+    """Price of a model in USD per million tokens."""
+
+    input: float
+    output: float
+    cached_input: float | None = Field(default=None, description="Price of cached input tokens, defaults to input.")
+
+
 class Settings(BaseSettings):
     """
     Settings for the application.
@@ -15,23 +44,143 @@ class Settings(BaseSettings):
 
     # API Keys
     api_key: str = Field(alias="API_KEY")
+    api_keys: dict[str, ApiKeyConfig] = Field(
+        alias="API_KEYS",
+        default={},
+        description="JSON object of additional API keys to their limits and priority, "
+        'e.g. {"batch-key": {"name": "etl", "requests_per_second": 2, "max_concurrent": 4, "priority": "batch"}}.',
+    )
     yelp_api_key: str = Field(alias="YELP_API_KEY")
     google_ai_api_key: str = Field(alias="GOOGLE_AI_API_KEY")
 
     # App Settings
     app_name: str = Field(alias="APP_NAME")
     app_port: int = Field(alias="APP_PORT")
+    app_host: str = Field(alias="APP_HOST", default="0.0.0.0")
+    app_workers: int = Field(
+        alias="APP_WORKERS",
+        default=os.cpu_count() or 1,
+        description="Number of worker processes forked by run_server.py in production mode.",
+    )
     thread_pool_size: int = Field(
         alias="APP_THREAD_POOL_SIZE",
         default=min(16, os.cpu_count() or 1 + 2),
         description="Number of worker threads in the thread pool for application. Keep in mind 1 thread is used for queue logger.",
     )
+    process_pool_size: int = Field(
+        alias="APP_PROCESS_POOL_SIZE",
+        default=min(4, os.cpu_count() or 1),
+        description="Number of worker processes in the process pool used by stages configured with the process executor.",
+    )
+    sql_validation_executor: Literal["thread", "process", "inline"] = Field(
+        alias="SQL_VALIDATION_EXECUTOR",
+        default="thread",
+        description="Executor SQL validation (sqlglot parsing and regeneration) runs on.",
+    )
+    sql_template_executor: Literal["thread", "process", "inline"] = Field(
+        alias="SQL_TEMPLATE_EXECUTOR", default="thread"
+    )
+
+    warm_up_enabled: bool = Field(
+        alias="WARM_UP_ENABLED",
+        default=True,
+        description="Pre-open connections, load prompts and import heavy modules at startup instead of on first request.",
+    )
+    warm_up_connect_clients: bool = Field(alias="WARM_UP_CONNECT_CLIENTS", default=True)
+    prompt_reload_interval: float = Field(
+        alias="PROMPT_RELOAD_INTERVAL",
+        default=5.0,
+        description="Seconds between checks for changed prompt files, which are reloaded without a restart. 0 disables.",
+    )
+
+    loop_monitor_interval_ms: float = Field(
+        alias="LOOP_MONITOR_INTERVAL_MS",
+        default=100.0,
+        description="Milliseconds between probes of the event loop lag. 0 disables the loop monitor.",
+    )
+    loop_stall_threshold_ms: float = Field(
+        alias="LOOP_STALL_THRESHOLD_MS",
+        default=250.0,
+        description="Event loop lag from which the stack blocking the loop is captured and logged.",
+    )
+
+    # Admission control settings, limits apply per worker process
+    admission_max_in_flight: int = Field(
+        alias="ADMISSION_MAX_IN_FLIGHT",
+        default=64,
+        description="Maximum number of requests processed concurrently, further requests are queued.",
+    )
+    admission_max_queue: int = Field(alias="ADMISSION_MAX_QUEUE", default=256)
+    admission_default_deadline_ms: float | None = Field(
+        alias="ADMISSION_DEFAULT_DEADLINE_MS",
+        default=None,
+        description="Deadline of requests without an x-request-deadline-ms header. Unset means no deadline.",
+    )
+    admission_initial_service_time: float = Field(
+        alias="ADMISSION_INITIAL_SERVICE_TIME",
+        default=2.0,
+        description="Service time estimate in seconds used for wait estimates until requests have completed.",
+    )
+
+    # Profiling settings
+    profiling_sample_rate: float = Field(
+        alias="PROFILING_SAMPLE_RATE",
+        default=0.0,
+        description="Share of requests profiled, in addition to those with an x-profile: 1 header. 0 disables sampling.",
+    )
+    profiling_interval_ms: float = Field(alias="PROFILING_INTERVAL_MS", default=5.0)
+    profiling_dir: str = Field(
+        alias="PROFILING_DIR",
+        default="./data/profiles",
+        description="Directory of the request profiles, shared by every worker process.",
+    )
+    profiling_retention: int = Field(
+        alias="PROFILING_RETENTION",
+        default=50,
+        ge=1,
+        description="Number of request profiles kept on disk, the oldest are deleted first.",
+    )
+
+    # Trace recording settings
+    trace_path: str | None = Field(
+        alias="TRACE_PATH",
+        default=None,
+        description="NDJSON file every /answer request is appended to, with its SQL, rows, answer, LLM responses and "
+        "stage timings, to replay with run_replay.py. Unset disables recording.",
+    )
 
     # Yelp Settings
     yelp_base_url: str = Field(alias="YELP_BASE_URL")
+    yelp_job_concurrency: int = Field(
+        alias="YELP_JOB_CONCURRENCY",
+        default=4,
+        description="Number of Yelp queries in flight per /get_yelp_data job.",
+    )
+    yelp_job_retention: int = Field(
+        alias="YELP_JOB_RETENTION",
+        default=100,
+        description="Number of finished /get_yelp_data jobs kept for polling and streaming.",
+    )
 
     # Database Settings
     database_url: str = Field(alias="DATABASE_URL")
+    database_read_only: bool = Field(
+        alias="DATABASE_READ_ONLY",
+        default=True,
+        description="Open the database read-only, the app never writes to it and every worker can then open it safely.",
+    )
+    database_snapshot_retention: int = Field(
+        alias="DATABASE_SNAPSHOT_RETENTION",
+        default=3,
+        description="Number of published database snapshots kept on disk by the ETL.",
+    )
+
+    # ETL Settings
+    etl_artifact_chunk_size: int = Field(
+        alias="ETL_ARTIFACT_CHUNK_SIZE",
+        default=500,
+        description="Number of businesses per NDJSON chunk of the ETL artifact.",
+    )
 
     # Model settings
     chat_model: str = Field(alias="CHAT_MODEL")
@@ -39,10 +188,154 @@ class Settings(BaseSettings):
     validation_model: str = Field(alias="VALIDATION_MODEL")
     validation_temperature: float = Field(alias="VALIDATION_TEMPERATURE", default=0.0)
 
+    # LLM provider settings
+    llm_offline: bool = Field(
+        alias="LLM_OFFLINE",
+        default=False,
+        description="Answer LLM calls with an offline stub emulating the Gemini API, including context caching.",
+    )
+    llm_prefix_cache_enabled: bool = Field(
+        alias="LLM_PREFIX_CACHE_ENABLED",
+        default=True,
+        description="Cache the static SQL generation prompt prefix with Gemini context caching, referenced by handle.",
+    )
+    llm_prefix_cache_ttl: int = Field(
+        alias="LLM_PREFIX_CACHE_TTL",
+        default=3600,
+        description="TTL in seconds of cached prompt prefixes, refreshed in the background while in use.",
+    )
+
+    # Token accounting settings
+    llm_prices: dict[str, ModelPrice] = Field(
+        alias="LLM_PRICES",
+        default={},
+        description="JSON object of models to their price in USD per million tokens, for cost accounting, "
+        'e.g. {"gemini-2.0-flash": {"input": 0.1, "output": 0.4, "cached_input": 0.025}}.',
+    )
+    token_budget_soft_share: float = Field(
+        alias="TOKEN_BUDGET_SOFT_SHARE",
+        default=0.8,
+        description="Share of an API key's daily token budget from which its requests are limited to cheaper paths.",
+    )
+
+    # Model routing settings, the fast tier uses the chat model and the strong tier uses the validation model
+    sql_generation_tier: Literal["fast", "strong"] = Field(alias="SQL_GENERATION_TIER", default="fast")
+    answer_generation_tier: Literal["fast", "strong"] = Field(alias="ANSWER_GENERATION_TIER", default="fast")
+    repair_tier: Literal["fast", "strong"] = Field(
+        alias="REPAIR_TIER",
+        default="strong",
+        description="Tier of the JSON repair call, which only runs after a response failed validation.",
+    )
+
+    # Schema pruning settings
+    schema_pruning_enabled: bool = Field(
+        alias="SCHEMA_PRUNING_ENABLED",
+        default=False,
+        description="Only include the tables, columns and tags relevant to the question in the SQL generation prompt, "
+        "sent inline rather than from the cached prompt prefix.",
+    )
+    schema_pruning_min_confidence: float = Field(
+        alias="SCHEMA_PRUNING_MIN_CONFIDENCE",
+        default=0.75,
+        ge=0.0,
+        le=1.0,
+        description="Share of the question's words the pruned schema must match, else the full schema is used.",
+    )
+
+    # Speculative SQL generation settings
+    sql_candidates: int = Field(
+        alias="SQL_CANDIDATES",
+        default=1,
+        description="Number of SQL candidates generated in parallel per question, the first valid one is used. 1 disables.",
+    )
+    sql_candidate_temperature_step: float = Field(alias="SQL_CANDIDATE_TEMPERATURE_STEP", default=0.3)
+    sql_candidate_max_in_flight: int = Field(
+        alias="SQL_CANDIDATE_MAX_IN_FLIGHT",
+        default=8,
+        description="Maximum number of extra speculative SQL generation calls in flight at once per worker "
+        "process. Caps concurrency only, not token spend, see daily_token_budget of API_KEYS.",
+    )
+
+    # Cache settings
+    sql_template_cache_size: int = Field(
+        alias="SQL_TEMPLATE_CACHE_SIZE",
+        default=256,
+        description="Number of parameterized SQL templates kept for reuse across questions differing only by entity.",
+    )
+
+    result_cache_size: int = Field(
+        alias="RESULT_CACHE_SIZE",
+        default=1024,
+        description="Number of query results cached, keyed on canonical validated SQL and database generation.",
+    )
+    answer_cache_size: int = Field(
+        alias="ANSWER_CACHE_SIZE",
+        default=1024,
+        description="Number of final answers cached, keyed on the normalized question and database generation.",
+    )
+    shared_cache_path: str | None = Field(
+        alias="SHARED_CACHE_PATH",
+        default=None,
+        description="SQLite file the result, answer, session and cursor caches are shared through by every worker "
+        "process. run_server.py defaults it to a file in /dev/shm living as long as the server, else caches are per "
+        "process.",
+    )
+
+    # Conversation session settings
+    session_store_size: int = Field(
+        alias="SESSION_STORE_SIZE",
+        default=1024,
+        description="Number of conversation sessions kept for follow-up questions, 0 disables sessions.",
+    )
+    session_ttl: int = Field(
+        alias="SESSION_TTL",
+        default=1800,
+        description="Seconds a conversation session is kept after its last question.",
+    )
+    session_max_entity_ids: int = Field(
+        alias="SESSION_MAX_ENTITY_IDS",
+        default=1000,
+        description="Maximum number of businesses a follow-up is scoped to, for previous questions over aggregates.",
+    )
+
+    # Answer pagination settings
+    answer_page_size: int = Field(
+        alias="ANSWER_PAGE_SIZE",
+        default=20,
+        description="Number of rows answered per page of results truncated by the query LIMIT, 0 disables pagination.",
+    )
+    cursor_store_size: int = Field(
+        alias="CURSOR_STORE_SIZE",
+        default=1024,
+        description="Number of page cursors kept for clients to request the next page of results with.",
+    )
+    cursor_ttl: int = Field(
+        alias="CURSOR_TTL",
+        default=900,
+        description="Seconds a page cursor can be used for after the page it was returned with.",
+    )
+
+    # Answer rendering settings
+    local_render_enabled: bool = Field(
+        alias="LOCAL_RENDER_ENABLED",
+        default=True,
+        description="Render answers for simple results (counts, single values, short lists) without calling the LLM.",
+    )
+    local_render_max_rows: int = Field(alias="LOCAL_RENDER_MAX_ROWS", default=5)
+    local_render_max_columns: int = Field(alias="LOCAL_RENDER_MAX_COLUMNS", default=3)
+
     # Logger Settings
     debug: bool = Field(alias="DEBUG")
     sql_echo: bool = Field(alias="SQL_ECHO")
 
+    @property
+    def api_key_configs(self) -> dict[str, ApiKeyConfig]:
+        """
+        Every accepted API key to its config, API_KEY being the unlimited interactive key named default, which may
+        profile requests.
+        """
+        return {self.api_key: ApiKeyConfig(name="default", profiling=True), **self.api_keys}
+
     model_config = SettingsConfigDict(
         env_file=(f"{ENV_PATH}/.env", f"{ENV_PATH}/.secret"),
         case_sensitive=True,
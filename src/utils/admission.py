@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from src.utils.metrics import Metrics
+
+
+class Priority(IntEnum):
+    """Priority class of a request, lower values are admitted first."""
+
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int) -> None:
+        """
+        Raised when a request is shed instead of admitted.
+
+        Args:
+            reason: Why the request was shed, one of deadline, queue_full or preempted
+            retry_after: Seconds after which the client should retry
+        """
+        super().__init__(f"Request rejected by admission control: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    sequence: int
+    future: asyncio.Future[None] = field(compare=False)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue: int,
+        initial_service_time: float,
+        metrics: Metrics,
+        smoothing: float = 0.2,
+    ) -> None:
+        """
+        Bounds the number of requests in flight, queueing the rest by priority class and arrival order.
+
+        The wait of a queued request is estimated from the number of requests queued ahead of it and an exponentially
+        weighted moving average of the service time. Requests whose estimated wait plus service time would exceed
+        their deadline are shed immediately instead of timing out in the queue. When the queue is full, a request
+        preempts the newest queued request of a lower priority class.
+
+        Args:
+            max_in_flight: Maximum number of requests processed concurrently
+            max_queue: Maximum number of requests waiting for admission
+            initial_service_time: Service time estimate in seconds until requests have completed
+            metrics: Metrics registry to export queue times, rejections and occupancy to
+            smoothing: Weight of the latest service time in the moving average
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.service_time = initial_service_time
+        self.metrics = metrics
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self._waiters: list[_Waiter] = []
+        self._sequence = itertools.count()
+
+    def estimated_wait(self, priority: Priority) -> float:
+        """
+        Estimates the queue time of a request of a priority class arriving now, in seconds.
+
+        With every slot busy, slots free up at a rate of max_in_flight / service_time, and every request queued with
+        the same or a higher priority is admitted first.
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            return 0.0
+        ahead = sum(1 for waiter in self._waiters if waiter.priority <= priority)
+        return (ahead + 1) * self.service_time / self.max_in_flight
+
+    async def acquire(self, priority: Priority, deadline: float | None = None) -> None:
+        """
+        Waits until the request is admitted. Every admitted request must call release once done.
+
+        Args:
+            priority: Priority class of the request
+            deadline: time.monotonic() by which the request must have completed, None if it has no deadline
+
+        Raises:
+            AdmissionRejected: If the request is shed
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self._update_gauges()
+            return
+
+        now = time.monotonic()
+        wait = self.estimated_wait(priority)
+        if deadline is not None and now + wait + self.service_time > deadline:
+            raise self._reject("deadline", priority, wait)
+        if len(self._waiters) >= self.max_queue:
+            lowest = max(self._waiters)
+            if lowest.priority <= priority:
+                raise self._reject("queue_full", priority, wait)
+            self._waiters.remove(lowest)
+            heapq.heapify(self._waiters)
+            lowest.future.set_exception(self._reject("preempted", Priority(lowest.priority), wait))
+
+        waiter = _Waiter(priority, next(self._sequence), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        self._update_gauges()
+        timeout = None if deadline is None else deadline - now - self.service_time
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release()  # The slot was handed over as the wait ended, pass it on
+            elif not waiter.future.done():
+                waiter.future.cancel()
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self._update_gauges()
+            if isinstance(e, TimeoutError):
+                raise self._reject("deadline", priority, self.estimated_wait(priority)) from None
+            raise
+        finally:
+            self.metrics.observe("admission_queue_seconds", time.monotonic() - now, priority=priority.name.lower())
+
+    def release(self, service_time: float | None = None) -> None:
+        """
+        Releases the slot of an admitted request, handing it over to the next queued request.
+
+        Args:
+            service_time: Time in seconds the request took once admitted, None if it shouldn't update the estimate
+        """
+        if service_time is not None:
+            self.service_time += self.smoothing * (service_time - self.service_time)
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if not waiter.future.done():
+                waiter.future.set_result(None)  # In flight count is unchanged as the slot is handed over
+                self._update_gauges()
+                return
+        self.in_flight -= 1
+        self._update_gauges()
+
+    def _reject(self, reason: str, priority: Priority, wait: float) -> AdmissionRejected:
+        self.metrics.increment("admission_rejected_total", reason=reason, priority=priority.name.lower())
+        return AdmissionRejected(reason, max(1, math.ceil(wait)))
+
+    def _update_gauges(self) -> None:
+        self.metrics.set_gauge("admission_in_flight", self.in_flight)
+        self.metrics.set_gauge("admission_queued", len(self._waiters))
+        self.metrics.set_gauge("admission_service_time_seconds", round(self.service_time, 4))
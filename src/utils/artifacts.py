@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from types import NoneType
+from typing import Any, Iterable, Iterator, get_args
+
+from src.models.app.business_data import BusinessBase, BusinessLocation
+from src.models.app.response import yelp_business_data_codec
+from src.utils.serialization import decode_json
+from src.utils.yelp import YelpBusinessData
+
+# Bumped whenever the shape of YelpBusinessData records changes, readers refuse artifacts of another version
+ARTIFACT_SCHEMA_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass(frozen=True)
+class ArtifactChunk:
+    """Sealed NDJSON chunk of an artifact, as recorded in its manifest."""
+
+    name: str
+    records: int
+    bytes: int
+    sha256: str
+
+
+@dataclass
+class ArtifactManifest:
+    schema_version: int = ARTIFACT_SCHEMA_VERSION
+    record_type: str = YelpBusinessData.__name__
+    records: int = 0
+    chunks: list[ArtifactChunk] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    created_at: str = field(default_factory=lambda: datetime.now(UTC).isoformat())
+    updated_at: str = field(default_factory=lambda: datetime.now(UTC).isoformat())
+
+    @classmethod
+    def load(cls, path: Path) -> "ArtifactManifest":
+        data: dict[str, Any] = decode_json((path / MANIFEST_NAME).read_bytes())
+        if data["schema_version"] != ARTIFACT_SCHEMA_VERSION:
+            raise ValueError(
+                f"Artifact {path} has schema version {data['schema_version']}, expected {ARTIFACT_SCHEMA_VERSION}"
+            )
+        return cls(**{**data, "chunks": [ArtifactChunk(**chunk) for chunk in data["chunks"]]})
+
+    def save(self, path: Path) -> None:
+        """Atomically replaces the manifest, so readers see either the previous or the new list of chunks."""
+        self.updated_at = datetime.now(UTC).isoformat()
+        tmp_path = path / f"{MANIFEST_NAME}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path / MANIFEST_NAME)
+
+
+class ArtifactWriter:
+    def __init__(self, path: Path, chunk_size: int = 500, append: bool = False) -> None:
+        """
+        Writes Yelp business data to an artifact directory of append-only NDJSON chunks, as records are fetched.
+
+        Records are appended to the open chunk, which is sealed once it holds `chunk_size` records: it's flushed to
+        disk, then recorded with its record count and content hash in the manifest. Readers only see sealed chunks, so
+        an interrupted write leaves a valid artifact holding every chunk sealed before the interruption.
+
+        Args:
+            path: Directory of the artifact
+            chunk_size: Number of records per chunk
+            append: Whether to add chunks to an existing artifact, instead of replacing it
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        if not append and path.exists():
+            shutil.rmtree(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self.manifest = ArtifactManifest.load(path) if (path / MANIFEST_NAME).exists() else ArtifactManifest()
+        self._chunk_file: Any = None
+        self._chunk_name: str = ""
+        self._chunk_records: int = 0
+        self._chunk_bytes: int = 0
+        self._chunk_hash = hashlib.sha256()
+
+    def __enter__(self) -> "ArtifactWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def append(self, business: YelpBusinessData) -> None:
+        if self._chunk_file is None:
+            self._open_chunk()
+        line = yelp_business_data_codec.encode(business) + b"\n"
+        self._chunk_file.write(line)
+        self._chunk_hash.update(line)
+        self._chunk_records += 1
+        self._chunk_bytes += len(line)
+        if self._chunk_records >= self.chunk_size:
+            self._seal_chunk()
+
+    def add_missing(self, location_name: str) -> None:
+        """Records a business that wasn't found, saved with the next manifest update."""
+        self.manifest.missing.append(location_name)
+
+    def close(self) -> None:
+        """Seals the open chunk, if any, and saves the manifest."""
+        if self._chunk_file is not None:
+            self._seal_chunk()
+        else:
+            self.manifest.save(self.path)
+
+    def _open_chunk(self) -> None:
+        self._chunk_name = f"chunk-{len(self.manifest.chunks):06d}.ndjson"
+        self._chunk_file = open(self.path / self._chunk_name, "wb")
+        self._chunk_records = 0
+        self._chunk_bytes = 0
+        self._chunk_hash = hashlib.sha256()
+
+    def _seal_chunk(self) -> None:
+        self._chunk_file.flush()
+        os.fsync(self._chunk_file.fileno())
+        self._chunk_file.close()
+        self._chunk_file = None
+        self.manifest.chunks.append(
+            ArtifactChunk(self._chunk_name, self._chunk_records, self._chunk_bytes, self._chunk_hash.hexdigest())
+        )
+        self.manifest.records += self._chunk_records
+        self.manifest.save(self.path)
+
+
+class ArtifactReader:
+    def __init__(self, path: Path) -> None:
+        """
+        Reads an artifact written by ArtifactWriter. Chunks are read independently, so a subset of chunks can be
+        loaded, verified or re-parsed without touching the rest.
+
+        Args:
+            path: Directory of the artifact
+        """
+        self.path = path
+        self.manifest = ArtifactManifest.load(path)
+
+    @property
+    def chunks(self) -> list[ArtifactChunk]:
+        return self.manifest.chunks
+
+    def select(self, names: Iterable[str] | None = None) -> list[ArtifactChunk]:
+        """Returns the chunks with the given names, or every chunk if names is None."""
+        if names is None:
+            return self.chunks
+        names = list(names)
+        by_name = {chunk.name: chunk for chunk in self.chunks}
+        unknown = set(names) - by_name.keys()
+        if unknown:
+            raise ValueError(f"Unknown chunks in artifact {self.path}: {sorted(unknown)}")
+        return [by_name[name] for name in names]
+
+    def verify(self, chunk: ArtifactChunk) -> bool:
+        """Returns whether the content of the chunk matches the hash recorded in the manifest."""
+        return hashlib.sha256((self.path / chunk.name).read_bytes()).hexdigest() == chunk.sha256
+
+    def read_chunk(self, chunk: ArtifactChunk, verify: bool = True) -> list[YelpBusinessData]:
+        content = (self.path / chunk.name).read_bytes()
+        if verify and hashlib.sha256(content).hexdigest() != chunk.sha256:
+            raise ValueError(f"Chunk {chunk.name} of artifact {self.path} doesn't match its hash")
+        return [yelp_business_data_codec.decode(line) for line in content.splitlines() if line]
+
+    def iter_records(self, names: Iterable[str] | None = None, verify: bool = True) -> Iterator[YelpBusinessData]:
+        """Yields the records of the selected chunks, reading one chunk at a time."""
+        for chunk in self.select(names):
+            yield from self.read_chunk(chunk, verify)
+
+
+@dataclass
+class ArtifactDiff:
+    """Businesses added, removed or changed between two artifacts, by Yelp id."""
+
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    unchanged_chunks: int = 0
+
+
+def diff_artifacts(old: ArtifactReader, new: ArtifactReader) -> ArtifactDiff:
+    """
+    Compares the records of two artifacts. Chunks with the same content hash in both artifacts hold the same records
+    and are skipped without being read, only the remaining chunks are parsed and compared record by record.
+
+    Returns:
+        ArtifactDiff: Businesses added, removed or changed in the new artifact
+    """
+    shared_hashes = {chunk.sha256 for chunk in old.chunks} & {chunk.sha256 for chunk in new.chunks}
+    old_records = {
+        business.business_data.source_id: business
+        for business in old.iter_records(chunk.name for chunk in old.chunks if chunk.sha256 not in shared_hashes)
+    }
+    new_records = {
+        business.business_data.source_id: business
+        for business in new.iter_records(chunk.name for chunk in new.chunks if chunk.sha256 not in shared_hashes)
+    }
+    return ArtifactDiff(
+        added=sorted(str(key) for key in new_records.keys() - old_records.keys()),
+        removed=sorted(str(key) for key in old_records.keys() - new_records.keys()),
+        changed=sorted(
+            str(key) for key in new_records.keys() & old_records.keys() if new_records[key] != old_records[key]
+        ),
+        unchanged_chunks=sum(chunk.sha256 in shared_hashes for chunk in new.chunks),
+    )
+
+
+def export_parquet(reader: ArtifactReader, output_path: Path, names: Iterable[str] | None = None) -> int:
+    """
+    Exports the records of an artifact to a Parquet file for analytics, one row group per chunk. Business and location
+    fields become columns, and the tags of each business a list column holding the tags that are set.
+
+    Requires pyarrow, an optional extra of the app: `uv sync --extra parquet`.
+
+    Returns:
+        int: Number of exported records
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("The Parquet export requires pyarrow, install it with `uv sync --extra parquet`") from e
+
+    arrow_types = {str: pa.string(), float: pa.float64(), int: pa.int64(), bool: pa.bool_()}
+    columns = [
+        (name, arrow_types[next(arg for arg in get_args(info.annotation) or (info.annotation,) if arg is not NoneType)])
+        for model in (BusinessBase, BusinessLocation)
+        for name, info in model.model_fields.items()
+    ]
+    schema = pa.schema([*columns, ("tags", pa.list_(pa.string()))])
+
+    exported = 0
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for chunk in reader.select(names):
+            rows = [
+                {
+                    **business.business_data.model_dump(),
+                    **business.location_data.model_dump(),
+                    "tags": [tag for tag, value in business.business_tags.model_dump().items() if value],
+                }
+                for business in reader.read_chunk(chunk)
+            ]
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            exported += len(rows)
+    return exported
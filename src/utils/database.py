@@ -1,3 +1,5 @@
+import asyncio
+import sqlite3
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import AsyncGenerator
@@ -5,22 +7,20 @@ from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from src.settings import settings
+from src.utils.snapshots import SnapshotStore
 
 
-class DatabaseUtilities:
-    def __init__(self, driver: str = "sqlite+aiosqlite", dialect: str = "sqlite") -> None:
-        """Database class to interact with SQLite database."""
-        db_path: Path = Path(f"./data/{settings.database_url.split('/')[-1]}")
-        self.driver: str = driver
-        self.database_url: str = f"{driver}:///{db_path.absolute()}"
-        self.dialect: str = dialect
-
+class _EngineHandle:
+    def __init__(self, path: Path, generation: int, database_url: str) -> None:
+        """Engine and session maker of a single version of the database, counting the sessions it has open."""
+        self.path = path
+        self.generation = generation
+        self.database_url = database_url
         self.engine: AsyncEngine = create_async_engine(
-            self.database_url,
+            database_url,
             pool_pre_ping=True,
             connect_args={"check_same_thread": False},  # Allow multiple threads to access the database
         )
-
         self.session_maker = async_sessionmaker(
             autocommit=False,
             autoflush=False,
@@ -28,6 +28,95 @@ class DatabaseUtilities:
             class_=AsyncSession,
             expire_on_commit=False,
         )
+        self.sessions: int = 0
+        self.retired: bool = False
+
+
+class DatabaseUtilities:
+    def __init__(self, driver: str = "sqlite+aiosqlite", dialect: str = "sqlite") -> None:
+        """
+        Database class to interact with SQLite database.
+
+        The database is read from the snapshot currently published by the ETL (see SnapshotStore). When a new snapshot
+        is published, new sessions are opened on a new engine while sessions already open keep reading the previous
+        snapshot, whose engine is disposed once its last session closes. Requests therefore never see partial data and
+        are never blocked by a load.
+        """
+        self.driver: str = driver
+        self.dialect: str = dialect
+        self.snapshots = SnapshotStore(
+            Path("./data"), Path(settings.database_url.split("/")[-1]).stem, settings.database_snapshot_retention
+        )
+        self._pointer_signature = self.snapshots.pointer_signature()
+        self._handle = self._open_handle()
+
+    @property
+    def db_path(self) -> Path:
+        return self._handle.path
+
+    @property
+    def database_url(self) -> str:
+        return self._handle.database_url
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._handle.engine
+
+    def _open_handle(self) -> _EngineHandle:
+        """Opens an engine on the published snapshot, or on the legacy database file if nothing was published yet."""
+        snapshot = self.snapshots.current()
+        if snapshot is not None:
+            # Published snapshots are never written to again, so SQLite can skip locking altogether
+            path = snapshot.path
+            return _EngineHandle(
+                path, snapshot.generation, f"{self.driver}:///file:{path.absolute()}?mode=ro&immutable=1&uri=true"
+            )
+
+        path = self.snapshots.legacy_path
+        generation = 0
+        if path.exists():
+            with sqlite3.connect(path) as connection:
+                generation = connection.execute("PRAGMA user_version").fetchone()[0]
+            connection.close()
+        database_url = f"{self.driver}:///{path.absolute()}"
+        if settings.database_read_only:
+            # Read-only connections never take write locks, so any number of worker processes can share the file
+            database_url = f"{self.driver}:///file:{path.absolute()}?mode=ro&uri=true"
+        return _EngineHandle(path, generation, database_url)
+
+    def _refresh(self) -> _EngineHandle:
+        """
+        Switches to the published snapshot if it changed, retiring the previous engine. Only the pointer file is
+        stat'ed unless a new snapshot was published, so this is cheap enough to run for every session.
+        """
+        signature = self.snapshots.pointer_signature()
+        if signature != self._pointer_signature:
+            self._pointer_signature = signature
+            handle = self._open_handle()
+            if handle.path != self._handle.path:
+                previous, self._handle = self._handle, handle
+                previous.retired = True
+                if previous.sessions == 0:
+                    asyncio.get_running_loop().create_task(previous.engine.dispose())
+        return self._handle
+
+    async def get_generation(self) -> int:
+        """
+        Returns the generation of the published snapshot, which changes exactly when the ETL publishes new data.
+
+        Prefer get_session_generation within a request, which returns the generation of the snapshot the session reads.
+
+        Returns:
+            int: The current data generation
+        """
+        return self._refresh().generation
+
+    def dispose_after_fork(self) -> None:
+        """
+        Drops the connections inherited from the parent process without closing them, so a forked worker process opens
+        its own connections instead of sharing the parent's.
+        """
+        self._handle.engine.sync_engine.dispose(close=False)
 
     @asynccontextmanager
     async def create_session(self) -> AsyncGenerator[AsyncSession, None]:
@@ -53,13 +142,26 @@ class DatabaseUtilities:
         Note:
             Only use this function when you want to start a new transaction manually!!
         """
-        async with self.session_maker() as session:
-            try:
-                yield session
-                await session.commit()
-            except Exception:
-                await session.rollback()
-                raise
+        handle = self._refresh()
+        handle.sessions += 1
+        try:
+            async with handle.session_maker() as session:
+                session.info["generation"] = handle.generation
+                try:
+                    yield session
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+                    raise
+        finally:
+            handle.sessions -= 1
+            if handle.retired and handle.sessions == 0:
+                await handle.engine.dispose()
+
+
+def get_session_generation(session: AsyncSession) -> int:
+    """Returns the generation of the snapshot a session created by create_session reads from."""
+    return session.info["generation"]
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
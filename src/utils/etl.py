@@ -0,0 +1,112 @@
+from logging import Logger
+from typing import Iterable
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from src.models.database.sqlite import Base, Business, Location, Tag
+from src.settings import settings
+from src.utils.snapshots import Snapshot, SnapshotStore
+from src.utils.yelp import YelpBusinessData
+
+
+def load_businesses_to_db(session: Session, businesses: Iterable[YelpBusinessData], logger: Logger) -> int:
+    """
+    Loads Yelp business data into the database in a single transaction.
+
+    Businesses are upserted on their source and source id: a business already in the database is updated and its
+    location and tags replaced, so loading the same businesses twice doesn't duplicate them.
+
+    Args:
+        session: The database session to load the data with
+        businesses: The business data to load
+        logger: The logger to use for logging operations
+
+    Returns:
+        int: Number of businesses loaded
+    """
+    businesses = list(businesses)
+    source_ids = {business.business_data.source_id for business in businesses} - {None}
+    existing: dict[tuple[str, str | None], Business] = {
+        (business_model.source, business_model.source_id): business_model
+        for business_model in session.scalars(select(Business).where(Business.source_id.in_(source_ids)))
+    }
+
+    loaded = 0
+    for business in businesses:
+        business_info = business.business_data
+        location_info = business.location_data
+
+        logger.info(f"Loading business {business_info.name} ...")
+
+        # Create or update business record
+        key = (business_info.source, business_info.source_id)
+        business_model = existing.get(key) if business_info.source_id is not None else None
+        fields = {
+            "name": business_info.name,
+            "url": business_info.url,
+            "source_url": business_info.source_url,
+            "source_rating": business_info.source_rating,
+            "phone": business_info.phone if business_info.phone else None,
+        }
+        if business_model is None:
+            business_model = Business(source=business_info.source, source_id=business_info.source_id, **fields)
+            session.add(business_model)
+            existing[key] = business_model
+        else:
+            for field, value in fields.items():
+                setattr(business_model, field, value)
+
+        # Create location record
+        location_model = Location(
+            longitude=location_info.longitude,
+            latitude=location_info.latitude,
+            address=location_info.address,
+            city=location_info.city,
+            zip_code=location_info.zip_code,
+            country=location_info.country,
+            state=location_info.state,
+            active=location_info.active,
+        )
+        # Link location to business, replacing the previous one of an updated business
+        business_model.locations = [location_model]
+
+        # Link tags to business if tag value is True
+        business_model.tags = [Tag(tag=tag) for tag, val in business.business_tags.model_dump().items() if val is True]
+
+        loaded += 1
+
+    # Commit all changes
+    session.commit()
+    return loaded
+
+
+def load_businesses_to_snapshot(
+    snapshots: SnapshotStore, businesses: Iterable[YelpBusinessData], logger: Logger, copy_current: bool
+) -> Snapshot:
+    """
+    Builds a new database snapshot holding the Yelp business data and publishes it, so readers switch to it at once.
+
+    Args:
+        snapshots: The snapshot store to publish to
+        businesses: The business data to load
+        logger: The logger to use for logging operations
+        copy_current: Whether to add the data to a copy of the current snapshot, instead of to an empty database
+
+    Returns:
+        Snapshot: The published snapshot
+    """
+    with snapshots.build(copy_current=copy_current) as path:
+        engine = create_engine(f"sqlite:///{path}", echo=settings.sql_echo)
+        try:
+            Base.metadata.create_all(engine)  # No-op for tables copied from the current snapshot
+            with Session(engine) as session:
+                loaded = load_businesses_to_db(session, businesses, logger)
+        finally:
+            engine.dispose()
+    snapshot = snapshots.current()
+    assert snapshot is not None  # Just published
+    logger.info(
+        f"Published database snapshot {snapshot.generation} with {loaded} new or updated businesses: {snapshot.path}"
+    )
+    return snapshot
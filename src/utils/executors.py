@@ -0,0 +1,133 @@
+import asyncio
+import multiprocessing
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, TypeVar
+
+from src.settings import Settings
+from src.utils.metrics import Metrics
+
+T = TypeVar("T")
+
+
+class ExecutorStage(str, Enum):
+    SQL_VALIDATION = "sql_validation"
+    SQL_TEMPLATE = "sql_template"
+
+
+class ExecutorMode(str, Enum):
+    THREAD = "thread"
+    PROCESS = "process"
+    INLINE = "inline"
+
+
+def _init_process_worker(app_name: str) -> None:
+    """Sets up logging and imports sqlglot once in each process pool worker, so the first task doesn't pay for it."""
+    import logging
+
+    from src.utils.logger import configure_worker_logger
+    from src.utils.validate_sql import validate_and_limit_sql
+
+    validate_and_limit_sql("SELECT 1", "sqlite", logging.getLogger(__name__))  # Primes sqlglot's parser tables
+    configure_worker_logger(app_name)
+
+
+def _ping() -> None:
+    """No-op task used to start process pool workers ahead of traffic."""
+
+
+class StageExecutors:
+    def __init__(self, settings: Settings, metrics: Metrics) -> None:
+        """
+        Runs the CPU-bound stages of the pipeline (SQL validation, SQL template building) off the event loop.
+
+        Each stage runs on its configured executor: the thread pool, a process pool that sidesteps GIL contention with
+        the event loop at the cost of pickling arguments and results, or inline on the event loop, which avoids any
+        hand-off for cheap work. Functions and arguments of stages run in the process pool must be picklable.
+
+        Args:
+            settings: Application settings holding the executor of each stage and the pool sizes
+            metrics: Metrics registry to export per stage run time to
+        """
+        self.settings = settings
+        self.metrics = metrics
+        self.stage_modes: dict[ExecutorStage, ExecutorMode] = {
+            ExecutorStage.SQL_VALIDATION: ExecutorMode(settings.sql_validation_executor),
+            ExecutorStage.SQL_TEMPLATE: ExecutorMode(settings.sql_template_executor),
+        }
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.settings.thread_pool_size)
+        return self._thread_pool
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # Forking a process running an event loop and threads is unsafe, workers are started from a clean process
+            context = multiprocessing.get_context("forkserver" if sys.platform == "linux" else "spawn")
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.settings.process_pool_size,
+                mp_context=context,
+                initializer=_init_process_worker,
+                initargs=(self.settings.app_name,),
+            )
+        return self._process_pool
+
+    def executor(self, stage: ExecutorStage) -> Executor | None:
+        """Returns the executor a stage runs on, None if it runs inline."""
+        mode = self.stage_modes[stage]
+        if mode == ExecutorMode.PROCESS:
+            return self.process_pool
+        if mode == ExecutorMode.THREAD:
+            return self.thread_pool
+        return None
+
+    async def run(self, stage: ExecutorStage, func: Callable[..., T], *args: Any) -> T:
+        """
+        Runs a function on the executor of a pipeline stage.
+
+        Args:
+            stage: The pipeline stage
+            func: The function to run
+            *args: Arguments to pass to the function
+
+        Returns:
+            The function's result
+        """
+        start_time = time.perf_counter()
+        executor = self.executor(stage)
+        if executor is None:
+            result = func(*args)
+        else:
+            result = await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        self.metrics.observe(
+            "executor_stage_seconds",
+            time.perf_counter() - start_time,
+            stage=stage.value,
+            mode=self.stage_modes[stage].value,
+        )
+        return result
+
+    async def warm_up(self) -> None:
+        """Starts every process pool worker ahead of traffic if any stage runs in the process pool."""
+        if ExecutorMode.PROCESS not in self.stage_modes.values():
+            return
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self.process_pool, _ping) for _ in range(self.settings.process_pool_size))
+        )
+
+    def shutdown(self) -> None:
+        """Safely shutdown the pools if they exist."""
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=True, cancel_futures=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True, cancel_futures=True)
+            self._process_pool = None
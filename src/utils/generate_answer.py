@@ -1,15 +1,27 @@
-from google.genai.types import GenerateContentConfig
+import time
+
 from pydantic import ValidationError
 from tenacity import retry, stop_after_attempt, wait_random_exponential
 
 from src.models.app.validation import ValidationModel
+from src.utils.json_repair import repair_json_locally
+from src.utils.model_router import ModelTier, Stage
 from src.utils.prompt_builder import build_response_fix_prompt
+from src.utils.prompt_cache import PromptPrefix
 from src.utils.state import State
+from src.utils.tracing import record_llm_call
+from src.utils.usage import BudgetState
 
 
 @retry(stop=stop_after_attempt(3), wait=wait_random_exponential(min=0.5, max=5))
 async def generate_gemini_model_validated_answer(
-    state: State, prompt: tuple[str, str], model: type[ValidationModel], repair: bool = True
+    state: State,
+    prompt: tuple[str, str] | tuple[PromptPrefix, str],
+    model: type[ValidationModel],
+    stage: Stage,
+    repair: bool = True,
+    escalate: bool = False,
+    temperature: float | None = None,
 ) -> ValidationModel:
     """
     Makes a Google Gemini generate content API call with retry logic and validates the response against a Pydantic
@@ -17,10 +29,15 @@ async def generate_gemini_model_validated_answer(
 
     Args:
         state (State): Application state containing Google AI client and settings
-        prompt (tuple[str, str]): tuple of system and user prompts to send to the API
+        prompt (tuple[str, str] | tuple[PromptPrefix, str]): tuple of system and user prompts to send to the API. With
+        a static prompt prefix in place of the system prompt, the prefix is referenced by its provider-side cache
+        handle if available, and sent inline before the user prompt otherwise
         model (type[ValidationModel]): Pydantic model to specify the JSON response structure and validate the response
         against
+        stage (Stage): Pipeline stage of the call, selects the model tier used
         repair (bool): Whether to attempt to repair the response if it is not valid
+        escalate (bool): Whether to use the strong model tier instead of the stage's configured tier
+        temperature (float | None): Temperature overriding the selected tier's temperature
 
     Returns:
         ValidationModel:
@@ -28,32 +45,72 @@ async def generate_gemini_model_validated_answer(
         If the answer is empty, an empty instance of the model is returned.
     """
 
+    from google.genai.types import GenerateContentConfig  # Deferred, importing google-genai is slow
+
     system_prompt, user_prompt = prompt
-    generated_content = await state.google_client.aio.models.generate_content(
-        model=state.settings.chat_model,
-        contents=user_prompt,
-        config=GenerateContentConfig(
-            system_instruction=system_prompt,
-            temperature=state.settings.chat_temperature,
-            response_mime_type="application/json",
-            response_schema=model,
-        ),
-    )
+    choice = state.model_router.select(stage, escalate)
+    cached_content: str | None = None
+    if isinstance(system_prompt, PromptPrefix):
+        prefix = system_prompt
+        if state.settings.llm_prefix_cache_enabled:
+            cached_content = await state.prompt_cache.get(state.google_client, choice.model, prefix)
+        if cached_content is None:
+            system_prompt, user_prompt = prefix.system_prompt, f"{prefix.context}\n{user_prompt}"
+
+    start_time = time.perf_counter()
+    try:
+        generated_content = await state.google_client.aio.models.generate_content(
+            model=choice.model,
+            contents=user_prompt,
+            config=GenerateContentConfig(
+                cached_content=cached_content,
+                system_instruction=None if cached_content else system_prompt,
+                temperature=choice.temperature if temperature is None else temperature,
+                response_mime_type="application/json",
+                response_schema=model,
+            ),
+        )
+    except Exception:
+        if cached_content is not None:
+            state.prompt_cache.invalidate(choice.model, prefix)  # e.g. expired early, recreated by the retry
+        raise
+    usage = generated_content.usage_metadata
+    state.model_router.record_call(stage, choice, time.perf_counter() - start_time, usage)
+    state.usage.record(stage.value, choice.model, usage)
+    if usage is not None:
+        cached_tokens = f", {usage.cached_content_token_count or 0} from {cached_content}" if cached_content else ""
+        state.logger.info(f"{stage.value} prompt tokens: {usage.prompt_token_count}{cached_tokens}")
     answer_str = generated_content.text if generated_content.text else "I dont know."
-    state.logger.debug(f"LLM answer: {answer_str}")
+    state.logger.debug("LLM answer: %s", answer_str)
+    record_llm_call(stage.value, choice.model, model.__name__, answer_str)
 
     try:
         validated_answer = model.model_validate_json(answer_str)
         return validated_answer
 
     except ValidationError as validation_error:
+        # Try cheap deterministic fixes before spending a model call on the repair
+        local_repair = repair_json_locally(answer_str, model)
+        if local_repair is not None:
+            repaired_answer, repair_type = local_repair
+            state.logger.info(f"Locally repaired {model.__name__} response with fix: {repair_type}")
+            state.metrics.increment("json_repairs_total", model=model.__name__, outcome=repair_type)
+            return repaired_answer
+
         state.logger.warning(
             "Gemini answering was unable to parse response into model. Attempting validation repair...\n"
         )
+        if repair and state.usage.budget_state() != BudgetState.OK:
+            state.usage.record_downgrade("no_llm_repair")
+            repair = False
+        state.metrics.increment("json_repairs_total", model=model.__name__, outcome="llm" if repair else "failed")
         if repair:
             system_fix_prompt, user_fix_prompt = await build_response_fix_prompt(answer_str, model, validation_error)
+            repair_choice = state.model_router.select(Stage.REPAIR)
+            if repair_choice.tier == ModelTier.STRONG and choice.tier != ModelTier.STRONG:
+                state.model_router.record_escalation(stage, "validation")
             return await generate_gemini_model_validated_answer(
-                state, (system_fix_prompt, user_fix_prompt), model, repair=False
+                state, (system_fix_prompt, user_fix_prompt), model, Stage.REPAIR, repair=False
             )  # Set repair to False to avoid infinite recursion
         else:
             state.logger.error("Error in generate_gemini_model_validated_answer\n", exc_info=True)
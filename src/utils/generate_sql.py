@@ -0,0 +1,190 @@
+import asyncio
+
+from sqlalchemy import text
+
+from src.models.app.validation import GeneratedSQL
+from src.models.database.sqlite import Business, Location, Tag
+from src.utils.executors import ExecutorStage
+from src.utils.generate_answer import generate_gemini_model_validated_answer
+from src.utils.model_router import Stage
+from src.utils.prompt_builder import build_sql_generation_prompt
+from src.utils.prompt_cache import PromptPrefix
+from src.utils.schema_pruning import SchemaSelection
+from src.utils.state import State
+from src.utils.usage import BudgetState
+from src.utils.validate_sql import SQLValidationResult, validate_and_limit_sql
+
+
+async def generate_validated_sql(
+    question: str, state: State, previous_turn: tuple[str, str] | None = None
+) -> SQLValidationResult:
+    """
+    Generates SQL for the question and validates it.
+
+    The prompt only holds the tables, columns and tags relevant to the question, unless their selection is too
+    uncertain, in which case it holds the full schema and tags.
+    With SQL_CANDIDATES > 1, several candidates are generated in parallel and the first one passing validation and an
+    EXPLAIN is used. If the SQL is rejected, it is generated again once with the strong model tier. Keys over the soft
+    share of their daily token budget get neither.
+
+    Args:
+        question: The user question
+        state: Application state
+        previous_turn: The (question, SQL query) pair of the previous turn of the session, for follow-up questions
+
+    Returns:
+        SQLValidationResult: Validation result of the selected SQL, or of the last rejected SQL
+    """
+    tags = await state.tag_vocabulary.get()
+    # Follow-ups get the full schema, as they refer to the previous query's tables without naming them
+    selection = _select_schema(question, tags, state) if previous_turn is None else None
+    prompt = await build_sql_generation_prompt(
+        question, state.db.dialect, [Business, Location, Tag], tags, selection, previous_turn
+    )
+
+    # Keys close to their daily token budget only get a single candidate on the configured tier
+    within_budget = state.usage.budget_state() == BudgetState.OK
+    if state.settings.sql_candidates > 1 and within_budget:
+        validation_result = await _generate_speculative_candidates(question, prompt, state)
+    else:
+        if state.settings.sql_candidates > 1:
+            state.usage.record_downgrade("single_sql_candidate")
+        validation_result = await _generate_candidate(question, prompt, state)
+
+    if validation_result.is_valid or not state.model_router.can_escalate(Stage.SQL_GENERATION):
+        return validation_result
+    if not within_budget:
+        state.usage.record_downgrade("no_escalation")
+        return validation_result
+
+    state.logger.info("Generated SQL was rejected, escalating SQL generation to the strong model tier")
+    state.model_router.record_escalation(Stage.SQL_GENERATION, "sql_rejected")
+    return await _generate_candidate(question, prompt, state, escalate=True)
+
+
+def _select_schema(question: str, tags: list[str], state: State) -> SchemaSelection | None:
+    """
+    Selects the schema and tags relevant to the question for the SQL generation prompt.
+
+    Returns:
+        SchemaSelection | None: The selection, or None for the full schema if pruning is disabled or the selection
+        accounts for too little of the question
+    """
+    if not state.settings.schema_pruning_enabled:
+        return None
+    selection = state.schema_index.select(question, tags)
+    if not selection.columns or selection.confidence < state.settings.schema_pruning_min_confidence:
+        state.logger.info(f"Using the full schema, selection confidence {selection.confidence:.2f} is too low")
+        state.metrics.increment("schema_pruning_total", outcome="fallback")
+        return None
+    state.logger.info(
+        f"Pruned schema to columns {selection.columns} and {len(selection.tags)} out of {len(tags)} tags, "
+        f"confidence {selection.confidence:.2f}"
+    )
+    state.metrics.increment("schema_pruning_total", outcome="pruned")
+    return selection
+
+
+async def _generate_candidate(
+    question: str,
+    prompt: tuple[PromptPrefix, str] | tuple[str, str],
+    state: State,
+    escalate: bool = False,
+    temperature: float | None = None,
+    explain: bool = False,
+) -> SQLValidationResult:
+    """
+    Generates a single SQL candidate and validates it.
+
+    Args:
+        question: The user question
+        prompt: SQL generation (static prompt prefix or system prompt, user prompt) pair
+        state: Application state
+        escalate: Whether to generate with the strong model tier
+        temperature: Temperature overriding the tier's temperature
+        explain: Whether to also check that the database can plan the validated query
+
+    Returns:
+        SQLValidationResult: Validation result of the candidate
+    """
+    generated_sql: GeneratedSQL = await generate_gemini_model_validated_answer(
+        state, prompt, GeneratedSQL, Stage.SQL_GENERATION, escalate=escalate, temperature=temperature
+    )
+    sql = getattr(generated_sql, "generated_sql", "")  # Missing if the response could not be validated
+    state.logger.info(f"Generated SQL for user question '{question}': {sql}")
+
+    validation_result = await state.executors.run(
+        ExecutorStage.SQL_VALIDATION, validate_and_limit_sql, sql, state.db.dialect, state.logger
+    )
+    state.logger.info(f"Validation result: {validation_result}")
+    if explain and validation_result.is_valid:
+        return await _explain(validation_result, state)
+    return validation_result
+
+
+async def _explain(validation_result: SQLValidationResult, state: State) -> SQLValidationResult:
+    """Checks that the database can plan a validated query, catching unknown tables and columns before running it."""
+    explain_prefix = "EXPLAIN QUERY PLAN" if state.db.dialect == "sqlite" else "EXPLAIN"
+    try:
+        async with state.db.create_session() as session:
+            await session.execute(text(f"{explain_prefix} {validation_result.validated_query}"))
+    except Exception as e:
+        return SQLValidationResult(False, f"EXPLAIN failed: {str(e)}", None)
+    return validation_result
+
+
+async def _generate_speculative_candidates(
+    question: str, prompt: tuple[PromptPrefix, str] | tuple[str, str], state: State
+) -> SQLValidationResult:
+    """
+    Generates SQL candidates in parallel with increasing temperatures, returning the first one that passes validation
+    and an EXPLAIN and cancelling the others.
+
+    Candidates beyond the first are only issued while fewer than SQL_CANDIDATE_MAX_IN_FLIGHT speculative calls are in
+    flight.
+
+    Returns:
+        SQLValidationResult: Validation result of the first valid candidate, or of the last rejected candidate
+    """
+    base_temperature = state.model_router.select(Stage.SQL_GENERATION).temperature
+    step = state.settings.sql_candidate_temperature_step
+
+    async def _run_candidate(index: int, speculative: bool) -> tuple[int, SQLValidationResult]:
+        try:
+            temperature = min(base_temperature + index * step, 2.0)
+            return index, await _generate_candidate(question, prompt, state, temperature=temperature, explain=True)
+        finally:
+            if speculative:
+                state.sql_candidate_slots.release()
+
+    tasks: list[asyncio.Task[tuple[int, SQLValidationResult]]] = [asyncio.create_task(_run_candidate(0, False))]
+    for index in range(1, state.settings.sql_candidates):
+        if state.sql_candidate_slots.locked():
+            state.metrics.increment("sql_candidates_total", outcome="skipped_max_in_flight")
+            continue
+        await state.sql_candidate_slots.acquire()
+        tasks.append(asyncio.create_task(_run_candidate(index, True)))
+
+    validation_result = SQLValidationResult(False, "No SQL candidate was generated", None)
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                index, validation_result = await next_done
+            except Exception:
+                state.logger.error("Error generating SQL candidate\n", exc_info=True)
+                state.metrics.increment("sql_candidates_total", outcome="error")
+                continue
+
+            state.metrics.increment(
+                "sql_candidates_total", outcome="valid" if validation_result.is_valid else "invalid"
+            )
+            if validation_result.is_valid:
+                state.logger.info(f"Using SQL candidate {index} out of {len(tasks)}")
+                state.metrics.increment("sql_candidate_wins_total", index=str(index))
+                return validation_result
+        return validation_result
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                state.metrics.increment("sql_candidates_total", outcome="cancelled")
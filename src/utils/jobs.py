@@ -0,0 +1,344 @@
+import asyncio
+import os
+import re
+import uuid
+from datetime import UTC, datetime
+from enum import Enum
+from logging import Logger
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncGenerator, AsyncIterator
+
+from pydantic import BaseModel, Field
+
+from src.settings import Settings
+from src.utils.metrics import Metrics
+from src.utils.serialization import JsonCodec
+from src.utils.snapshots import SnapshotStore
+from src.utils.yelp import YelpBusinessData
+
+if TYPE_CHECKING:
+    from src.models.app.request import BasicBusinessInfo
+
+# Seconds between checks for new results and cancellations of jobs running in another worker process
+JOB_POLL_INTERVAL = 0.25
+# Seconds a cancellation waits for the job to stop
+JOB_CANCEL_TIMEOUT = 5.0
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    LOADING = "loading"  # Loading the results into a new database snapshot, which can't be cancelled
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class YelpJobRecord(BaseModel):
+    """Status and counts of a background Yelp job, as stored for every worker process to read."""
+
+    job_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = JobStatus.PENDING
+    total: int
+    fetched: int = 0
+    found: int = 0
+    missing: list[str] = Field(default_factory=list)
+    load_to_db: bool
+    loaded: bool = False
+    error: str | None = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    finished_at: datetime | None = None
+    pid: int = Field(default_factory=os.getpid)  # Worker process running the job
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+_record_codec = JsonCodec(YelpJobRecord)
+_result_codec = JsonCodec(YelpBusinessData)
+
+
+class JobStore:
+    def __init__(self, directory: Path) -> None:
+        """
+        Records and results of background jobs, kept in files so that every worker process can poll, stream and cancel
+        a job running in another one.
+
+        Each job has a record file, atomically replaced by the worker running the job on every change, an NDJSON file
+        its results are appended to, and a marker file created to request its cancellation.
+
+        Args:
+            directory: Directory of the job files, created if missing
+        """
+        self.directory = directory
+
+    def save(self, record: YelpJobRecord) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path(record.job_id, ".tmp")
+        tmp_path.write_bytes(_record_codec.encode(record))
+        os.replace(tmp_path, self._path(record.job_id, ".json"))
+
+    def load(self, job_id: str) -> YelpJobRecord | None:
+        """Returns the record of the job, None if it doesn't exist. Jobs whose worker exited are reported failed."""
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            record = _record_codec.decode(self._path(job_id, ".json").read_bytes())
+        except FileNotFoundError:
+            return None
+        if not record.done and not _is_alive(record.pid):
+            record.status = JobStatus.FAILED
+            record.error = "The worker process running the job exited"
+        return record
+
+    def append_result(self, job_id: str, result: YelpBusinessData) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self._path(job_id, ".ndjson"), "ab") as f:
+            f.write(_result_codec.encode(result) + b"\n")
+
+    def read_results(self, job_id: str, offset: int) -> tuple[list[YelpBusinessData], int]:
+        """
+        Reads the results of the job appended after the offset.
+
+        Returns:
+            tuple[list[YelpBusinessData], int]: The results, and the offset to read the next results from
+        """
+        try:
+            with open(self._path(job_id, ".ndjson"), "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        complete = data[: data.rfind(b"\n") + 1]  # A line being appended is read once complete
+        return [_result_codec.decode(line) for line in complete.splitlines()], offset + len(complete)
+
+    def request_cancel(self, job_id: str) -> None:
+        self._path(job_id, ".cancel").touch()
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return self._path(job_id, ".cancel").exists()
+
+    def prune(self, retention: int) -> None:
+        """Deletes the files of the oldest finished jobs above the retention limit."""
+        records = [self.load(path.stem) for path in self.directory.glob("*.json")]
+        finished = sorted(
+            (record for record in records if record is not None and record.done), key=lambda record: record.created_at
+        )
+        for record in finished[: max(0, len(finished) - retention)]:
+            for suffix in (".json", ".ndjson", ".cancel"):
+                self._path(record.job_id, suffix).unlink(missing_ok=True)
+
+    def _path(self, job_id: str, suffix: str) -> Path:
+        return self.directory / f"{job_id}{suffix}"
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class YelpJob:
+    def __init__(self, record: YelpJobRecord) -> None:
+        """
+        Background job fetching the Yelp data of a list of businesses, running on the event loop of the worker process
+        that created it.
+
+        Args:
+            record: Record of the job, saved to the job store on every change
+        """
+        self.record = record
+        self.task: asyncio.Task[None] | None = None
+        self.watcher: asyncio.Task[None] | None = None
+        self.results: list[YelpBusinessData] = []
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        """Wakes up every subscriber of this worker waiting for the job to change."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_for_change(self, timeout: float) -> None:
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except TimeoutError:
+            return
+
+
+class JobManager:
+    def __init__(self, settings: Settings, metrics: Metrics, logger: Logger, snapshots: SnapshotStore) -> None:
+        """
+        Creates and keeps track of background Yelp jobs.
+
+        Jobs run in the worker process that created them, while their records and results are kept in a job store
+        under the data directory, so any worker can poll, stream or cancel them. Only the latest YELP_JOB_RETENTION
+        finished jobs are kept.
+
+        Args:
+            settings: Application settings holding the job retention
+            metrics: Metrics registry to export job outcomes to
+            logger: Logger of the app
+            snapshots: Database snapshot store results are published to
+        """
+        self.settings = settings
+        self.metrics = metrics
+        self.logger = logger
+        self.snapshots = snapshots
+        self.store = JobStore(snapshots.data_dir / "jobs")
+        self.jobs: dict[str, YelpJob] = {}  # Jobs running in this worker process
+
+    def create(
+        self,
+        total: int,
+        load_to_db: bool,
+        results: AsyncIterator[tuple["BasicBusinessInfo", YelpBusinessData | None]],
+    ) -> YelpJobRecord:
+        """
+        Creates a job and starts consuming its results in the background.
+
+        Args:
+            total: Number of businesses to fetch
+            load_to_db: Whether to load the results into the database once every business was fetched
+            results: Iterator of each business with its data, or None if it wasn't found
+
+        Returns:
+            YelpJobRecord: Record of the created job
+        """
+        job = YelpJob(YelpJobRecord(total=total, load_to_db=load_to_db))
+        self.store.save(job.record)
+        self.store.prune(self.settings.yelp_job_retention)
+        job.task = asyncio.create_task(self._run(job, results))
+        self.jobs[job.record.job_id] = job
+        job.watcher = asyncio.create_task(self._watch_cancel(job))
+        self.logger.info(f"Created Yelp job {job.record.job_id} for {total} businesses")
+        return job.record
+
+    def get(self, job_id: str) -> YelpJobRecord | None:
+        """Returns the record of a job running or run by any worker process, None if it doesn't exist."""
+        job = self.jobs.get(job_id)
+        return job.record if job is not None else self.store.load(job_id)
+
+    async def subscribe(self, job_id: str) -> AsyncGenerator[YelpBusinessData, None]:
+        """
+        Yields every result of the job, from the first one, as they are fetched, until the job is done.
+
+        Yields:
+            YelpBusinessData: Data of each business found
+        """
+        offset = 0
+        while True:
+            record = self.get(job_id)  # Read before the results, every result of a done job is then read below
+            results, offset = self.store.read_results(job_id, offset)
+            for result in results:
+                yield result
+            if record is None or record.done:
+                return
+            job = self.jobs.get(job_id)
+            if job is not None:
+                await job.wait_for_change(JOB_POLL_INTERVAL)
+            else:
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    async def cancel(self, job_id: str) -> YelpJobRecord | None:
+        """
+        Requests the cancellation of a job, and waits for it to stop or start loading its results, which can't be
+        cancelled.
+
+        Returns:
+            YelpJobRecord | None: Record of the job once stopped, None if it doesn't exist
+        """
+        record = self.get(job_id)
+        if record is None or record.done or record.status == JobStatus.LOADING:
+            return record
+        self.store.request_cancel(job_id)
+        job = self.jobs.get(job_id)
+        if job is not None:
+            self._cancel(job)
+
+        deadline = asyncio.get_running_loop().time() + JOB_CANCEL_TIMEOUT
+        while asyncio.get_running_loop().time() < deadline:
+            record = self.get(job_id)
+            if record is None or record.done or record.status == JobStatus.LOADING:
+                break
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+        return record
+
+    def _cancel(self, job: YelpJob) -> None:
+        if job.task is not None and not job.task.done() and job.record.status != JobStatus.LOADING:
+            job.task.cancel()
+
+    async def _watch_cancel(self, job: YelpJob) -> None:
+        """Cancels the job when another worker process requests it."""
+        while job.task is not None and not job.task.done():
+            if self.store.cancel_requested(job.record.job_id):
+                self._cancel(job)
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    async def _run(
+        self, job: YelpJob, results: AsyncIterator[tuple["BasicBusinessInfo", YelpBusinessData | None]]
+    ) -> None:
+        record = job.record
+        record.status = JobStatus.RUNNING
+        self.store.save(record)
+        try:
+            async for business, data in results:
+                record.fetched += 1
+                if data:
+                    self.store.append_result(record.job_id, data)
+                    job.results.append(data)
+                    record.found += 1
+                else:
+                    record.missing.append(business.location_name)
+                self.store.save(record)
+                job.notify()
+
+            if record.load_to_db and job.results:
+                record.status = JobStatus.LOADING
+                self.store.save(record)
+                # The snapshot is built by a thread that can't be interrupted, so the job reports its real outcome
+                # even if cancelled meanwhile, e.g. on shutdown
+                loading = asyncio.ensure_future(asyncio.to_thread(self._load_to_db, job.results))
+                try:
+                    await asyncio.shield(loading)
+                except asyncio.CancelledError:
+                    await loading
+                record.loaded = True
+            record.status = JobStatus.SUCCEEDED
+        except asyncio.CancelledError:
+            record.status = JobStatus.CANCELLED
+            raise
+        except Exception as e:
+            self.logger.error(f"Yelp job {record.job_id} failed\n", exc_info=True)
+            record.status = JobStatus.FAILED
+            record.error = getattr(e, "detail", None) or str(e)
+        finally:
+            if hasattr(results, "aclose"):
+                await results.aclose()
+            record.finished_at = datetime.now(UTC)
+            self.store.save(record)
+            self.jobs.pop(record.job_id, None)
+            job.notify()
+            self.metrics.increment("yelp_jobs_total", status=record.status.value)
+            self.logger.info(
+                f"Yelp job {record.job_id} {record.status.value}: fetched {record.fetched} out of {record.total} "
+                f"businesses, {len(record.missing)} missing"
+            )
+
+    def _load_to_db(self, businesses: list[YelpBusinessData]) -> None:
+        """Publishes a new database snapshot holding the current data and the results."""
+        from src.utils.etl import load_businesses_to_snapshot  # Imports the SQLAlchemy ORM models
+
+        load_businesses_to_snapshot(self.snapshots, businesses, self.logger, copy_current=True)
+
+    def shutdown(self) -> None:
+        """Cancels every job running in this worker process, jobs loading their results finish loading."""
+        for job in self.jobs.values():
+            self._cancel(job)
@@ -0,0 +1,131 @@
+import ast
+import json
+import re
+from typing import Callable
+
+from pydantic import ValidationError
+
+from src.models.app.validation import ValidationModel
+
+_CODE_FENCE = re.compile(r"^\s*```[\w-]*\s*\n?(.*?)\n?\s*```\s*$", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_UNQUOTED_KEY = re.compile(r"([{,]\s*)([A-Za-z_]\w*)(\s*:)")
+_SINGLE_UNQUOTED_FIELD = re.compile(r"^\{\s*[\"']?(\w+)[\"']?\s*:\s*(.*?)\s*\}$", re.DOTALL)
+
+
+def _strip_code_fences(content: str, model: type[ValidationModel]) -> str | None:
+    """```json {...} ``` -> {...}"""
+    match = _CODE_FENCE.match(content)
+    return match.group(1) if match else None
+
+
+def _extract_object(content: str, model: type[ValidationModel]) -> str | None:
+    """Here is the answer: {...} -> {...}"""
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end < start or (start == 0 and end == len(content) - 1):
+        return None
+    return content[start : end + 1]
+
+
+def _python_literal(content: str, model: type[ValidationModel]) -> str | None:
+    """{'key': 'value', 'flag': True} -> {"key": "value", "flag": true}"""
+    try:
+        value = ast.literal_eval(content)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return json.dumps(value) if isinstance(value, dict) else None
+
+
+def _remove_trailing_commas(content: str, model: type[ValidationModel]) -> str | None:
+    """{"key": "value",} -> {"key": "value"}"""
+    repaired = _TRAILING_COMMA.sub(r"\1", content)
+    return repaired if repaired != content else None
+
+
+def _quote_keys(content: str, model: type[ValidationModel]) -> str | None:
+    """{key: "value"} -> {"key": "value"}, or {key: some text} -> {"key": "some text"} for single field objects"""
+    match = _SINGLE_UNQUOTED_FIELD.match(content.strip())
+    if match and match.group(1) in model.model_fields:
+        value = match.group(2)
+        try:
+            return json.dumps({match.group(1): json.loads(value)})
+        except ValueError:
+            return json.dumps({match.group(1): _unquote(value)})
+
+    repaired = _UNQUOTED_KEY.sub(r'\1"\2"\3', content)
+    return repaired if repaired != content else None
+
+
+def _close_truncated(content: str, model: type[ValidationModel]) -> str | None:
+    """{"key": "value" -> {"key": "value"}, content cut inside a string is left to the LLM repair"""
+    closers: list[str] = []
+    in_string = escaped = False
+    for char in content:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            in_string = not in_string
+        elif not in_string and char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif not in_string and char in "}]" and closers:
+            closers.pop()
+
+    # A value cut short, e.g. SQL cut inside its WHERE clause, may still validate while meaning something else
+    if in_string or not closers:
+        return None
+    return content.rstrip().rstrip(",") + "".join(reversed(closers))
+
+
+def _wrap_bare_value(content: str, model: type[ValidationModel]) -> str | None:
+    """SELECT ... -> {"generated_sql": "SELECT ..."} for models with a single required string field"""
+    required = [name for name, field in model.model_fields.items() if field.is_required()]
+    if len(required) != 1 or model.model_fields[required[0]].annotation is not str or content.lstrip().startswith("{"):
+        return None
+    value = _unquote(content.strip()).strip()
+    return json.dumps({required[0]: value}) if value else None
+
+
+def _unquote(value: str) -> str:
+    """Removes a matching pair of quotes around a value."""
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+# Ladder of deterministic fixes, applied cumulatively in order until the content validates
+REPAIR_LADDER: tuple[tuple[str, Callable[[str, type[ValidationModel]], str | None]], ...] = (
+    ("code_fence", _strip_code_fences),
+    ("surrounding_text", _extract_object),
+    ("python_literal", _python_literal),
+    ("trailing_comma", _remove_trailing_commas),
+    ("unquoted_key", _quote_keys),
+    ("truncated", _close_truncated),
+    ("bare_value", _wrap_bare_value),
+)
+
+
+def repair_json_locally(content: str, model: type[ValidationModel]) -> tuple[ValidationModel, str] | None:
+    """
+    Attempts to repair an LLM response that failed validation with a ladder of deterministic fixes, validating the
+    content against the Pydantic model after each applied fix.
+
+    Args:
+        content: The response that failed validation
+        model: Pydantic model the response should validate against
+
+    Returns:
+        tuple[ValidationModel, str] | None:
+        The validated model and the name of the fix that made it validate, or None if the response can't be repaired.
+    """
+    for name, fix in REPAIR_LADDER:
+        repaired = fix(content, model)
+        if repaired is None:
+            continue
+        content = repaired
+        try:
+            return model.model_validate_json(content), name
+        except ValidationError:
+            continue
+    return None
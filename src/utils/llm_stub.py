@@ -0,0 +1,203 @@
+import itertools
+import json
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, cast
+
+if TYPE_CHECKING:
+    from src.utils.tracing import LLMCall
+
+# Responses of the offline client, by field of the requested response schema
+OFFLINE_FIELD_VALUES: dict[str, str] = {
+    "generated_sql": "SELECT COUNT(*) AS business_count FROM businesses",
+    "answer": "This answer was generated offline.",
+}
+
+
+class OfflineLLMError(Exception):
+    """Error returned by the offline client, in place of the provider's client errors."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens of a text, at about 4 characters per token like Gemini's tokenizer."""
+    return math.ceil(len(text) / 4)
+
+
+def _text(value: Any) -> str:
+    """Returns the text of a prompt given as a string, a list of strings or google-genai contents."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "\n".join(_text(item) for item in value)
+    parts = getattr(value, "parts", None)
+    if parts is not None:
+        return "\n".join(part.text or "" for part in parts)
+    return str(value)
+
+
+def _ttl_seconds(ttl: str | None) -> float:
+    return float(ttl.rstrip("s")) if ttl else 3600.0
+
+
+@dataclass
+class OfflineUsageMetadata:
+    prompt_token_count: int
+    cached_content_token_count: int | None
+    candidates_token_count: int
+    total_token_count: int
+
+
+@dataclass
+class OfflineResponse:
+    text: str
+    usage_metadata: OfflineUsageMetadata
+
+
+@dataclass
+class OfflineCachedContent:
+    name: str
+    model: str
+    display_name: str | None
+    token_count: int
+    expires_at: float  # time.monotonic() deadline
+
+
+@dataclass
+class _OfflineModels:
+    caches: "_OfflineCaches"
+    calls: list[dict[str, Any]] = field(default_factory=list)
+
+    async def get(self, model: str) -> dict[str, str]:
+        return {"name": model}
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None) -> OfflineResponse:
+        """
+        Answers with a fixed JSON object matching the response schema, and reports token usage like the provider: a
+        call referencing a cached prefix sends only its own contents, but still counts the prefix in its prompt tokens.
+        """
+        schema = getattr(config, "response_schema", None)
+        fields = getattr(schema, "model_fields", {"answer": None})
+        return self._respond(
+            model, contents, config, json.dumps({name: OFFLINE_FIELD_VALUES.get(name, "offline") for name in fields})
+        )
+
+    def _respond(self, model: str, contents: Any, config: Any, text: str) -> OfflineResponse:
+        cached_tokens: int | None = None
+        cached_content_name = getattr(config, "cached_content", None)
+        if cached_content_name:
+            cached_content = self.caches.lookup(cached_content_name)
+            if cached_content.model != model:
+                raise OfflineLLMError(f"400 Cached content {cached_content_name} was created for another model")
+            if getattr(config, "system_instruction", None):
+                raise OfflineLLMError("400 System instruction must be part of the cached content")
+            cached_tokens = cached_content.token_count
+
+        prompt_tokens = estimate_tokens(_text(contents)) + estimate_tokens(
+            _text(getattr(config, "system_instruction", None))
+        )
+        candidates_tokens = estimate_tokens(text)
+        total_prompt_tokens = prompt_tokens + (cached_tokens or 0)
+        self.calls.append({"model": model, "prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens})
+        return OfflineResponse(
+            text,
+            OfflineUsageMetadata(
+                total_prompt_tokens, cached_tokens, candidates_tokens, total_prompt_tokens + candidates_tokens
+            ),
+        )
+
+
+@dataclass
+class _OfflineCaches:
+    contents: dict[str, OfflineCachedContent] = field(default_factory=dict)
+    min_tokens: int = 0
+    _ids: Any = field(default_factory=itertools.count)
+
+    def lookup(self, name: str) -> OfflineCachedContent:
+        cached_content = self.contents.get(name)
+        if cached_content is None or cached_content.expires_at <= time.monotonic():
+            self.contents.pop(name, None)
+            raise OfflineLLMError(f"404 Cached content {name} not found or expired")
+        return cached_content
+
+    async def create(self, model: str, config: Any) -> OfflineCachedContent:
+        token_count = estimate_tokens(_text(config.contents)) + estimate_tokens(_text(config.system_instruction))
+        if token_count < self.min_tokens:
+            raise OfflineLLMError(f"400 Cached content is too small: {token_count} < {self.min_tokens} tokens")
+        name = f"cachedContents/offline-{next(self._ids)}"
+        self.contents[name] = OfflineCachedContent(
+            name, model, config.display_name, token_count, time.monotonic() + _ttl_seconds(config.ttl)
+        )
+        return self.contents[name]
+
+    async def update(self, name: str, config: Any) -> OfflineCachedContent:
+        cached_content = self.lookup(name)
+        cached_content.expires_at = time.monotonic() + _ttl_seconds(config.ttl)
+        return cached_content
+
+    async def delete(self, name: str) -> None:
+        self.lookup(name)
+        del self.contents[name]
+
+
+@dataclass
+class _ReplayModels(_OfflineModels):
+    responses: dict[str, deque[str]] = field(default_factory=dict)  # Recorded responses by response schema
+    unrecorded_calls: int = 0
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None) -> OfflineResponse:
+        """
+        Answers with the next recorded response of the call's response schema, the last one once all were used, e.g.
+        by speculative candidates. Calls of a schema without recorded responses get the fixed offline answer.
+        """
+        schema = getattr(getattr(config, "response_schema", None), "__name__", "")
+        responses = self.responses.get(schema)
+        if not responses:
+            self.unrecorded_calls += 1
+            return await super().generate_content(model, contents, config)
+        text = responses.popleft() if len(responses) > 1 else responses[0]
+        return self._respond(model, contents, config, text)
+
+
+class _OfflineAio:
+    def __init__(self, min_cache_tokens: int, models: type[_OfflineModels] = _OfflineModels) -> None:
+        self.caches = _OfflineCaches(min_tokens=min_cache_tokens)
+        self.models = models(self.caches)
+
+
+class OfflineGoogleClient:
+    def __init__(self, min_cache_tokens: int = 0) -> None:
+        """
+        Stand-in for the Google GenAI client when LLM_OFFLINE is set, to run the app without network access or API key.
+
+        Emulates the async API used by the app: content generation answering fixed JSON objects, and context caching
+        with TTLs, expiry, model binding and a minimum cached size. Token counts are estimated from text lengths.
+
+        Args:
+            min_cache_tokens: Minimum number of tokens of cached contents, smaller contents are refused
+        """
+        self.aio = _OfflineAio(min_cache_tokens)
+
+
+class ReplayGoogleClient:
+    def __init__(self) -> None:
+        """
+        Offline client answering LLM calls with the responses recorded in a request trace, to replay traces without
+        network access. Context caching is emulated like by OfflineGoogleClient.
+        """
+        self.aio = _OfflineAio(0, _ReplayModels)
+        self._models = cast(_ReplayModels, self.aio.models)
+
+    @property
+    def unrecorded_calls(self) -> int:
+        """Number of calls answered without a recorded response, e.g. as the pipeline now makes other calls."""
+        return self._models.unrecorded_calls
+
+    def load(self, llm_calls: "list[LLMCall]") -> None:
+        """Sets the recorded responses answered until the next load, those of the trace being replayed."""
+        self._models.responses = {}
+        for call in llm_calls:
+            self._models.responses.setdefault(call.schema, deque()).append(call.text)
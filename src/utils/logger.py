@@ -52,3 +52,24 @@ def get_queue_logger(
     print(f"Active threads: {[t.name for t in threading.enumerate()]}")
 
     return logger, listener
+
+
+def configure_worker_logger(app_name: str) -> logging.Logger:
+    """
+    Sets up the logger in a process pool worker, which logs straight to stdout as it has no event loop to block.
+
+    Args:
+        app_name (str): Name of the application/logger
+
+    Returns:
+        logging.Logger: Configured logger
+    """
+    logger: logging.Logger = logging.getLogger(app_name)
+    logger.setLevel(("debug" if settings.debug else "info").upper())
+
+    console_handler = logging.StreamHandler(stream=sys.stdout)
+    console_handler.setFormatter(
+        logging.Formatter("%(name)s - %(asctime)s - %(processName)s - %(funcName)s - %(levelname)s - %(message)s")
+    )
+    logger.addHandler(console_handler)
+    return logger
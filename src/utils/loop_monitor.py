@@ -0,0 +1,115 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from logging import Logger
+from typing import Any
+
+from src.utils.metrics import Metrics
+
+# Event loop lag buckets in seconds, finer than the default latency buckets at the low end
+LAG_BUCKETS: tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+@dataclass
+class LoopStall:
+    """Event loop stall caught while in progress, with the stack of the code blocking the loop."""
+
+    started_at: str
+    blocked_for_ms: float  # When the stack was captured, the stall may have lasted longer
+    task: str | None  # Name and coroutine of the task running when the stack was captured, None for a callback
+    stack: list[str]
+
+
+class LoopMonitor:
+    def __init__(
+        self, interval: float, stall_threshold: float, metrics: Metrics, logger: Logger, max_stalls: int = 20
+    ) -> None:
+        """
+        Measures the lag of the event loop and catches what blocks it.
+
+        A probe task sleeps for `interval` seconds in a loop, the lag being how late it wakes up, recorded in the
+        event_loop_lag_seconds histogram. The probe's wake-ups are watched from a thread, which doesn't need the loop to
+        run: once the loop hasn't run the probe for `stall_threshold` seconds past its deadline, the thread captures the
+        stack of the loop thread and the task running, logs them as a warning and keeps the last `max_stalls` stalls.
+
+        Args:
+            interval: Seconds between probes
+            stall_threshold: Seconds of lag from which the loop is considered stalled
+            metrics: Metrics registry to export the lag to
+            logger: Logger of the app
+            max_stalls: Number of stalls kept, listed by /metrics
+        """
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.metrics = metrics
+        self.logger = logger
+        self.stalls: deque[LoopStall] = deque(maxlen=max_stalls)
+        self._deadline = 0.0  # time.monotonic() the probe is due to wake up at
+        self._probe: asyncio.Task[None] | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Starts the probe on the running loop and the watchdog thread."""
+        loop = asyncio.get_running_loop()
+        self._deadline = time.monotonic() + self.interval
+        self._probe = asyncio.create_task(self._run_probe())
+        self._watchdog = threading.Thread(
+            target=self._watch, args=(loop, threading.get_ident()), name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._probe is not None:
+            self._probe.cancel()
+        if self._watchdog is not None:
+            self._watchdog.join()
+
+    def recent_stalls(self) -> list[dict[str, Any]]:
+        """Returns the last stalls caught, newest first."""
+        return [asdict(stall) for stall in reversed(self.stalls)]
+
+    async def _run_probe(self) -> None:
+        while True:
+            self._deadline = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._deadline)
+            self.metrics.observe("event_loop_lag_seconds", lag, LAG_BUCKETS)
+            if lag >= self.stall_threshold:
+                self.metrics.increment("event_loop_stalls_total")
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int) -> None:
+        caught_deadline: float | None = None  # Deadline of the stall already caught, captured once per stall
+        while not self._stopped.wait(self.stall_threshold / 2):
+            deadline = self._deadline
+            blocked_for = time.monotonic() - deadline
+            if blocked_for < self.stall_threshold or deadline == caught_deadline:
+                continue
+            frame = sys._current_frames().get(loop_thread_id)
+            if frame is None:
+                return
+            caught_deadline = deadline
+            task = asyncio.current_task(loop)
+            root = None if task is None else getattr(task.get_coro(), "cr_frame", None)
+            frames = []
+            while frame is not None:
+                frames.append((frame, frame.f_lineno))
+                if frame is root:  # Frames below the task's coroutine belong to the event loop
+                    break
+                frame = frame.f_back
+            stall = LoopStall(
+                started_at=datetime.fromtimestamp(time.time() - blocked_for, UTC).isoformat(),
+                blocked_for_ms=round(blocked_for * 1000, 3),
+                task=None if task is None else f"{task.get_name()} {task.get_coro()!r}",
+                stack=traceback.StackSummary.extract(reversed(frames)).format(),
+            )
+            self.stalls.append(stall)
+            self.logger.warning(
+                f"Event loop blocked for {stall.blocked_for_ms} ms by task {stall.task}, stack:\n{''.join(stall.stack)}"
+            )
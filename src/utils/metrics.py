@@ -0,0 +1,88 @@
+import bisect
+from typing import Any
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """Cumulative histogram with fixed upper bounds, in the style of Prometheus histograms."""
+        self.buckets = buckets
+        self.counts: list[int] = [0] * (len(buckets) + 1)  # Last bucket is +Inf
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        cumulative: dict[str, int] = {}
+        total = 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            total += count
+            cumulative[bound] = total
+        return {"buckets": cumulative, "sum": round(self.sum, 6), "count": self.count}
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """
+        In-process metrics registry of counters, gauges and histograms, each identified by a name and a set of labels.
+        Only meant to be updated from the event loop.
+        """
+        self._counters: dict[str, dict[LabelKey, float]] = {}
+        self._gauges: dict[str, dict[LabelKey, float]] = {}
+        self._histograms: dict[str, dict[LabelKey, Histogram]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Increments a counter."""
+        series = self._counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """Sets a gauge to a value."""
+        self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **labels: str) -> None:
+        """Records an observation in a histogram."""
+        series = self._histograms.setdefault(name, {})
+        key = _label_key(labels)
+        if key not in series:
+            series[key] = Histogram(buckets)
+        series[key].observe(value)
+
+    def get_counter(self, name: str, **labels: str) -> float:
+        """Returns the current value of a counter, 0 if it was never incremented."""
+        return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Returns every metric keyed on its name and labels (e.g. 'llm_calls_total{stage="repair",tier="fast"}').
+        """
+        return {
+            "counters": {
+                _series_name(name, key): value for name, s in self._counters.items() for key, value in s.items()
+            },
+            "gauges": {_series_name(name, key): value for name, s in self._gauges.items() for key, value in s.items()},
+            "histograms": {
+                _series_name(name, key): histogram.snapshot()
+                for name, s in self._histograms.items()
+                for key, histogram in s.items()
+            },
+        }
+
+
+def _label_key(labels: dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def _series_name(name: str, key: LabelKey) -> str:
+    if not key:
+        return name
+    return name + "{" + ",".join(f'{label}="{value}"' for label, value in key) + "}"
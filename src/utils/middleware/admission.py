@@ -0,0 +1,74 @@
+import time
+from typing import Callable
+
+from fastapi import FastAPI, Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from src.utils.admission import AdmissionController, AdmissionRejected, Priority
+
+
+class AdmissionMiddleware(BaseHTTPMiddleware):
+    def __init__(
+        self,
+        app: FastAPI,
+        default_deadline_ms: float | None = None,
+        exempt_paths: tuple[str, ...] = ("/metrics",),
+    ):
+        """
+        Middleware to admit requests through the app's admission controller, shedding load with a 503 and a Retry-After
+        header when a request can't be served within its deadline.
+
+        The deadline is read from the optional x-request-deadline-ms header, in milliseconds from the request's arrival.
+        The priority class is the one of the request's API key.
+
+        Args:
+            app (FastAPI): FastAPI application instance.
+            default_deadline_ms (float | None): Deadline of requests without a deadline header, None for no deadline.
+            exempt_paths (tuple[str, ...]): Paths served without admission control.
+        """
+        super().__init__(app)
+        self.default_deadline_ms = default_deadline_ms
+        self.exempt_paths = exempt_paths
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        """
+        Process the incoming request once admitted.
+
+        Args:
+            request (Request): The incoming request object.
+            call_next (Callable): The next middleware or route handler.
+
+        Returns:
+            Response: The response object.
+        """
+        if request.url.path in self.exempt_paths:
+            return await call_next(request)
+
+        deadline_ms: float | None = self.default_deadline_ms
+        if "x-request-deadline-ms" in request.headers:
+            try:
+                deadline_ms = float(request.headers["x-request-deadline-ms"])
+            except ValueError:
+                return JSONResponse(
+                    status_code=400,
+                    content={"detail": "Bad Request: x-request-deadline-ms must be a number of milliseconds"},
+                )
+        deadline = None if deadline_ms is None else time.monotonic() + deadline_ms / 1000
+        priority: Priority = getattr(request.state, "priority", Priority.INTERACTIVE)  # Set by AuthMiddleware
+
+        admission: AdmissionController = request.app.state.state.admission
+        try:
+            await admission.acquire(priority, deadline)
+        except AdmissionRejected as e:
+            return JSONResponse(
+                status_code=503,
+                content={"detail": f"Service Unavailable: request shed by admission control ({e.reason})"},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+
+        start_time = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            admission.release(time.perf_counter() - start_time)
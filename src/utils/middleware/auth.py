@@ -1,25 +1,44 @@
+import math
 from typing import Callable
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
+from src.settings import ApiKeyConfig
+from src.utils.admission import Priority
+from src.utils.metrics import Metrics
+from src.utils.rate_limit import KeyLimiter, TokenBucket
+from src.utils.usage import UsageAccounting
+
 
 class AuthMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: FastAPI, api_key: str):
+    def __init__(self, app: FastAPI, api_keys: dict[str, ApiKeyConfig]):
         """
-        Middleware to enforce API key authentication on incoming requests.
+        Middleware to enforce API key authentication and per key rate and concurrency limits on incoming requests.
+
+        Requests over a key's rate or concurrency limit are rejected with a 429. Rate limited keys get RateLimit-Limit,
+        RateLimit-Remaining and RateLimit-Reset headers on every response. The key's name, priority class and whether
+        it may profile requests are set on request.state for the middleware and routes behind it, and the LLM usage of
+        the request is accounted to the key.
 
         Args:
             app (FastAPI): FastAPI application instance.
-            api_key (str): API key used for authenticating requests.
+            api_keys (dict[str, ApiKeyConfig]): API keys used for authenticating requests, with their limits.
         """
         super().__init__(app)
-        self.api_key = api_key
+        self.api_keys = api_keys
+        self.limiters: dict[str, KeyLimiter] = {}
+        for key, config in api_keys.items():
+            bucket = None
+            if config.requests_per_second is not None:
+                capacity = config.burst or max(1, math.ceil(config.requests_per_second))
+                bucket = TokenBucket(config.requests_per_second, capacity)
+            self.limiters[key] = KeyLimiter(config.name, bucket, config.max_concurrent)
 
-    async def dispatch(self, request: Request, call_next: Callable):
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """
-        Process the incoming request and enforce API key authentication.
+        Process the incoming request and enforce API key authentication and limits.
 
         Args:
             request (Request): The incoming request object.
@@ -28,11 +47,53 @@ class AuthMiddleware(BaseHTTPMiddleware):
         Returns:
             Response: The response object.
         """
+        metrics: Metrics = request.app.state.state.metrics
         api_key = request.headers.get("x-api-key")
-        if api_key != self.api_key:
+        limiter = self.limiters.get(api_key) if api_key is not None else None
+        if api_key is None or limiter is None:
+            metrics.increment("api_key_requests_total", key="unknown", outcome="forbidden")
             return JSONResponse(
                 status_code=403,
                 content={"detail": "Forbidden: Invalid API Key"},
             )
-        response = await call_next(request)
+
+        if limiter.bucket is not None and not limiter.bucket.try_acquire():
+            metrics.increment("api_key_requests_total", key=limiter.name, outcome="rate_limited")
+            response: Response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too Many Requests: rate limit exceeded"},
+                headers={"Retry-After": str(limiter.bucket.retry_after)},
+            )
+            return self._add_rate_limit_headers(response, limiter)
+        if not limiter.concurrency_available():
+            metrics.increment("api_key_requests_total", key=limiter.name, outcome="concurrency_limited")
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too Many Requests: concurrent request limit exceeded"},
+                headers={"Retry-After": "1"},
+            )
+            return self._add_rate_limit_headers(response, limiter)
+
+        request.state.api_key_name = limiter.name
+        request.state.priority = Priority[self.api_keys[api_key].priority.upper()]
+        request.state.profiling_allowed = self.api_keys[api_key].profiling
+        metrics.increment("api_key_requests_total", key=limiter.name, outcome="allowed")
+        limiter.in_flight += 1
+        metrics.set_gauge("api_key_in_flight", limiter.in_flight, key=limiter.name)
+        usage: UsageAccounting = request.app.state.state.usage
+        usage_token = usage.start_request(limiter.name)
+        try:
+            response = await call_next(request)
+        finally:
+            usage.finish_request(usage_token)
+            limiter.in_flight -= 1
+            metrics.set_gauge("api_key_in_flight", limiter.in_flight, key=limiter.name)
+        return self._add_rate_limit_headers(response, limiter)
+
+    @staticmethod
+    def _add_rate_limit_headers(response: Response, limiter: KeyLimiter) -> Response:
+        if limiter.bucket is not None:
+            response.headers["RateLimit-Limit"] = str(limiter.bucket.capacity)
+            response.headers["RateLimit-Remaining"] = str(limiter.bucket.remaining)
+            response.headers["RateLimit-Reset"] = str(limiter.bucket.reset_after)
         return response
@@ -1,15 +1,17 @@
 import time
 from logging import Logger
-from typing import Callable
+from typing import Any, Callable
 
 from fastapi import FastAPI, Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from src.utils.usage import current_usage
+
 
 class LoggerMiddleware(BaseHTTPMiddleware):
     def __init__(self, app: FastAPI):
         """
-        Middleware to log incoming requests and their responses.
+        Middleware to log incoming requests and their responses, with the LLM calls and tokens of the request.
 
         Args:
             app (FastAPI): FastAPI application instance.
@@ -35,9 +37,12 @@ class LoggerMiddleware(BaseHTTPMiddleware):
         logger.info(f"Request received: {request_dict}")
         response: Response = await call_next(request)
 
-        response_dict: dict[str, int | float] = {
+        response_dict: dict[str, Any] = {
             "status": response.status_code,
             "process_time_ms": round((time.time() - start_time) * 1000, 3),
         }
+        usage = current_usage()  # Set by AuthMiddleware, filled by the LLM calls of the request
+        if usage is not None and usage.stages:
+            response_dict["llm_usage"] = usage.summary()
         logger.info(f"Request completed: {response_dict}")
         return response
@@ -0,0 +1,98 @@
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.metrics import Metrics
+from src.utils.profiling import ProfileMetadata, RequestProfile, profiling, question_hash
+from src.utils.stages import stage_timings_ms
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: float = 0.0,
+        interval_ms: float = 5.0,
+        max_concurrent: int = 2,
+        exempt_prefixes: tuple[str, ...] = ("/admin", "/metrics"),
+    ):
+        """
+        Middleware to profile single requests on demand, with a sampling profiler and timings of the request's stages.
+
+        A request is profiled when it has an x-profile: 1 header and its API key is allowed to profile, or otherwise
+        with a probability of `sample_rate`. Profiled responses get an x-profile-id header, the id to download the
+        profile with from /admin/profiles. Other requests go straight through: it's a pure ASGI middleware, so it
+        doesn't wrap them in a task nor read their body.
+
+        Args:
+            app (ASGIApp): The application behind the middleware.
+            sample_rate (float): Share of requests profiled without the header.
+            interval_ms (float): Milliseconds between samples of a profiled request.
+            max_concurrent (int): Maximum number of requests profiled concurrently per worker, further ones aren't.
+            exempt_prefixes (tuple[str, ...]): Path prefixes of requests never profiled.
+        """
+        self.app = app
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.max_concurrent = max_concurrent
+        self.exempt_prefixes = exempt_prefixes
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = scope["app"].state.state
+        profile = RequestProfile(trigger, self.interval)
+        body = bytearray()
+        status: int | None = None
+
+        async def receive_body() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                body.extend(message.get("body", b""))
+            return message
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        self.in_flight += 1
+        try:
+            with profiling(profile):
+                await self.app(scope, receive_body, send_with_id)
+        finally:
+            self.in_flight -= 1
+            metadata = ProfileMetadata(
+                id=profile.id,
+                method=scope["method"],
+                path=scope["path"],
+                trigger=trigger,
+                api_key=scope.get("state", {}).get("api_key_name"),
+                question_sha256=question_hash(bytes(body)),
+                status=status,
+                duration_ms=round((time.perf_counter() - profile.start_time) * 1000, 3),
+                stage_timings_ms=stage_timings_ms(profile.stage_timings),
+                samples=sum(profile.samples.values()),
+                interval_ms=self.interval * 1000,
+            )
+            await state.run_in_thread_pool(state.profiles.save, metadata, profile.samples)
+            metrics: Metrics = state.metrics
+            metrics.increment("request_profiles_total", trigger=trigger)
+            state.logger.info(f"Saved profile {profile.id} of {scope['path']}: {metadata.stage_timings_ms}")
+
+    def _trigger(self, scope: Scope) -> str | None:
+        """Returns what triggers profiling of the request, header or sampled, or None if it isn't profiled."""
+        if self.in_flight >= self.max_concurrent or scope["path"].startswith(self.exempt_prefixes):
+            return None
+        if (b"x-profile", b"1") in scope["headers"] and scope.get("state", {}).get("profiling_allowed"):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
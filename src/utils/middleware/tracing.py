@@ -0,0 +1,42 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.tracing import RequestTrace, tracing
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp, paths: tuple[str, ...] = ("/answer",)):
+        """
+        Middleware to record the requests of the traced paths to the app's trace recorder, if TRACE_PATH is set.
+
+        The pipeline records its steps into the trace of the current request, which is appended to the trace file once
+        the response is sent. Requests that don't reach the pipeline, e.g. rejected ones, aren't recorded. Without a
+        trace recorder, requests go straight through.
+
+        Args:
+            app (ASGIApp): The application behind the middleware.
+            paths (tuple[str, ...]): Paths of the traced requests.
+        """
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        state = scope["app"].state.state if scope["type"] == "http" else None
+        if state is None or state.traces is None or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        start_time = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+            await send(message)
+
+        with tracing(trace):
+            await self.app(scope, receive, send_with_status)
+        trace.duration_ms = round((time.perf_counter() - start_time) * 1000, 3)
+        if trace.question is not None:
+            await state.run_in_thread_pool(state.traces.append, trace)
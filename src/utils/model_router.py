@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+
+from src.settings import Settings
+from src.utils.metrics import Metrics
+
+# Buckets of prompt token counts per call
+TOKEN_BUCKETS: tuple[float, ...] = (128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+class Stage(str, Enum):
+    SQL_GENERATION = "sql_generation"
+    ANSWER_GENERATION = "answer_generation"
+    REPAIR = "repair"
+
+
+class ModelTier(str, Enum):
+    FAST = "fast"
+    STRONG = "strong"
+
+
+@dataclass(frozen=True)
+class ModelChoice:
+    """Model selected to run a pipeline stage."""
+
+    tier: ModelTier
+    model: str
+    temperature: float
+
+
+class ModelRouter:
+    def __init__(self, settings: Settings, metrics: Metrics) -> None:
+        """
+        Routes each pipeline stage to a model tier.
+
+        The fast tier uses the chat model and the strong tier uses the validation model. Each stage runs on its
+        configured tier, and is escalated to the strong tier when its output fails validation.
+
+        Args:
+            settings: Application settings holding the models and tier of each stage
+            metrics: Metrics registry to export per tier latency and escalations to
+        """
+        self.metrics = metrics
+        self.models: dict[ModelTier, tuple[str, float]] = {
+            ModelTier.FAST: (settings.chat_model, settings.chat_temperature),
+            ModelTier.STRONG: (settings.validation_model, settings.validation_temperature),
+        }
+        self.stage_tiers: dict[Stage, ModelTier] = {
+            Stage.SQL_GENERATION: ModelTier(settings.sql_generation_tier),
+            Stage.ANSWER_GENERATION: ModelTier(settings.answer_generation_tier),
+            Stage.REPAIR: ModelTier(settings.repair_tier),
+        }
+
+    def select(self, stage: Stage, escalate: bool = False) -> ModelChoice:
+        """
+        Selects the model to run a stage with.
+
+        Args:
+            stage: The pipeline stage
+            escalate: Whether to use the strong tier regardless of the stage's configured tier
+
+        Returns:
+            ModelChoice: The selected tier, model and temperature
+        """
+        tier = ModelTier.STRONG if escalate else self.stage_tiers[stage]
+        model, temperature = self.models[tier]
+        return ModelChoice(tier, model, temperature)
+
+    def can_escalate(self, stage: Stage) -> bool:
+        """Returns whether the stage runs on a tier below the strong tier by default."""
+        return self.stage_tiers[stage] != ModelTier.STRONG
+
+    def record_call(self, stage: Stage, choice: ModelChoice, latency: float, usage: Any = None) -> None:
+        """
+        Records the latency of a model call for its stage and tier, and the prompt tokens it sent.
+
+        Args:
+            stage: The pipeline stage
+            choice: The model the call was made with
+            latency: Duration of the call in seconds
+            usage: Usage metadata of the response, holding the prompt and cached prompt token counts
+        """
+        stage_label, tier_label = stage.value, choice.tier.value
+        self.metrics.increment("llm_calls_total", stage=stage_label, tier=tier_label)
+        self.metrics.observe("llm_latency_seconds", latency, stage=stage_label, tier=tier_label)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        if prompt_tokens is None:
+            return
+        # Cached tokens are part of the prompt tokens but are billed at a discount and not sent with the request
+        cached_tokens = getattr(usage, "cached_content_token_count", None) or 0
+        self.metrics.increment("llm_prompt_tokens_total", prompt_tokens, stage=stage_label, tier=tier_label)
+        self.metrics.increment("llm_cached_prompt_tokens_total", cached_tokens, stage=stage_label, tier=tier_label)
+        self.metrics.observe(
+            "llm_sent_prompt_tokens", prompt_tokens - cached_tokens, TOKEN_BUCKETS, stage=stage_label, tier=tier_label
+        )
+
+    def record_escalation(self, stage: Stage, reason: str) -> None:
+        """Records an escalation of a stage to the strong tier."""
+        self.metrics.increment("llm_escalations_total", stage=stage.value, reason=reason)
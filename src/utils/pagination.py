@@ -0,0 +1,290 @@
+import secrets
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Sequence, cast
+
+from src.utils.result_cache import CacheBackend, GenerationCache
+from src.utils.validate_sql import ProjectedColumn
+
+# Tables to their primary key, appended to the sort keys of a paginated query so that every row has a distinct key
+ROW_ID_COLUMNS: dict[str, str] = {"businesses": "id", "locations": "id", "tags": "id"}
+
+_KEY_PREFIX = "_cursor_key"
+_PAGE_ALIAS = "_page"
+_VALUE_ALIAS = "_value"
+
+
+@dataclass(frozen=True)
+class Keyset:
+    """A validated query rewritten for keyset pagination, its sort keys selected as extra trailing columns."""
+
+    query: str  # Query selecting the sort keys after the projection, without ORDER BY and LIMIT unless capped
+    descending: tuple[bool, ...]  # Direction of each sort key
+    page_size: int
+    dialect: str
+
+
+@dataclass(frozen=True)
+class Page:
+    """A page of results, without the sort keys, and the sort keys of its last row to resume after."""
+
+    rows: list[tuple[Any, ...]]
+    last_keys: tuple[Any, ...] | None
+    has_more: bool
+
+
+@dataclass(frozen=True)
+class PageCursor:
+    """Position in the results of a paginated question, resumed by a page request."""
+
+    question: str
+    sql: str  # Validated query, shown to the answer generation
+    params: dict[str, Any]
+    projection: tuple[ProjectedColumn, ...]
+    keyset: Keyset
+    last_keys: tuple[Any, ...]
+    returned: int  # Rows returned by the previous pages
+    total_matches: int | None
+    expires_at: float  # time.time() deadline, wall clock as cursors can be shared by worker processes
+
+
+class CursorStore(GenerationCache):
+    def __init__(self, max_size: int, ttl: float, backend: CacheBackend | None = None) -> None:
+        """
+        Server-side store of page cursors, keyed on an opaque random token handed to the client.
+
+        Cursors expire `ttl` seconds after they were created, and are dropped with the data generation their results
+        were read from, so that every page of a question comes from the same data.
+
+        Args:
+            max_size: Maximum number of cursors kept, the least recently used being evicted, 0 disables cursors
+            ttl: Seconds a cursor can be used for
+            backend: Storage of the cursors, defaults to an in-process LRU
+        """
+        super().__init__(max_size, backend)
+        self.ttl = ttl
+
+    def create(self, generation: int, cursor: PageCursor) -> str | None:
+        """Stores the cursor, returning its token, or None if cursors are disabled."""
+        if self.max_size <= 0:
+            return None
+        token = secrets.token_urlsafe(16)
+        self._set(self._key(token), generation, replace(cursor, expires_at=time.time() + self.ttl))
+        return token
+
+    def get(self, token: str, generation: int) -> PageCursor | None:
+        """Returns the cursor of the token, or None if it doesn't exist, expired or is from an older generation."""
+        cursor: PageCursor | None = self._get(self._key(token), generation)
+        if cursor is None or cursor.expires_at < time.time():
+            return None
+        return cursor
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return "cursor\x00" + token
+
+
+def _outer_tables(parsed: Any) -> list[Any] | None:
+    """Returns the tables of the FROM clause and joins of a parsed query, or None if any of them isn't a plain table."""
+    from sqlglot import expressions as exp
+
+    from_clause = next((node for node in parsed.find_all(exp.From) if node.parent is parsed), None)
+    if from_clause is None:
+        return None
+    tables = [from_clause.this, *(join.this for join in parsed.args.get("joins") or [])]
+    if not all(isinstance(table, exp.Table) for table in tables):
+        return None
+    return tables
+
+
+def resolve_order(parsed: Any) -> Any | None:
+    """
+    Returns a copy of the ORDER BY of a parsed SELECT, its references to the projection by alias or position replaced
+    by the expressions they refer to, so that it still applies once the projection changes. None without ORDER BY.
+    """
+    from sqlglot import expressions as exp
+
+    order = parsed.args.get("order")
+    if order is None:
+        return None
+    aliases = {expression.alias: expression.unalias() for expression in parsed.expressions if expression.alias}
+    order = order.copy()
+    for ordered in order.expressions:
+        key = ordered.this
+        if isinstance(key, exp.Column) and not key.table and key.name in aliases:
+            ordered.set("this", aliases[key.name].copy())
+        elif isinstance(key, exp.Literal) and key.is_int and 0 < int(key.this) <= len(parsed.expressions):
+            ordered.set("this", parsed.expressions[int(key.this) - 1].unalias().copy())
+    return order
+
+
+def build_keyset(sql: str, dialect: str, page_size: int, limit: int | None = None) -> Keyset | None:
+    """
+    Rewrites a validated query for keyset pagination.
+
+    The query is sorted on its ORDER BY expressions, then on the primary key of each of its tables so that the order is
+    total. Pages are then read after the sort keys of the previous page's last row, rather than with an OFFSET that
+    rescans every previous row.
+
+    Args:
+        sql: Validated query
+        dialect: SQL dialect of the query
+        page_size: Number of rows per page
+        limit: The query's own LIMIT lowered by validation, capping the rows of every page together, with its OFFSET
+
+    Returns:
+        Keyset | None: The rewritten query, or None if the query can't be paginated: grouped, distinct or aggregate
+        queries, or queries over subqueries or tables without a known primary key
+    """
+    import sqlglot  # Deferred to keep the app import fast
+    from sqlglot import expressions as exp
+
+    parsed = sqlglot.parse_one(sql, dialect=dialect)
+    if not isinstance(parsed, exp.Select) or parsed.args.get("with"):
+        return None
+    if parsed.args.get("group") or parsed.args.get("distinct") or parsed.args.get("having"):
+        return None
+    if all(expression.find(exp.AggFunc) for expression in parsed.expressions):
+        return None
+    tables = _outer_tables(parsed)
+    if tables is None or any(table.name.lower() not in ROW_ID_COLUMNS for table in tables):
+        return None
+
+    # ORDER BY may refer to the projection by alias or position, which the extra key columns can't
+    keys: list[tuple[exp.Expression, bool]] = []
+    order = resolve_order(parsed)
+    for ordered in order.expressions if order is not None else []:
+        keys.append((ordered.this, bool(ordered.args.get("desc"))))
+    for table in tables:
+        keys.append((exp.column(ROW_ID_COLUMNS[table.name.lower()], table=table.alias_or_name), False))
+
+    query = parsed.copy()
+    for clause in ("order", "limit", "offset"):
+        query.set(clause, None)
+    if limit is not None:
+        # The rows the query's own LIMIT keeps, in the total order of the pages
+        query = query.order_by(
+            *(exp.Ordered(this=key.copy(), desc=descending, nulls_first=not descending) for key, descending in keys)
+        ).limit(limit)
+        query.set("offset", parsed.args.get("offset"))
+    query = query.select(*(key.as_(f"{_KEY_PREFIX}{index}") for index, (key, _) in enumerate(keys)))
+    return Keyset(query.sql(dialect=dialect), tuple(descending for _, descending in keys), page_size, dialect)
+
+
+def build_page_query(keyset: Keyset, last_keys: Sequence[Any] | None) -> tuple[str, dict[str, Any]]:
+    """
+    Builds the query of the page after the given sort keys, reading one more row than the page size to tell if another
+    page follows.
+
+    Null sort keys come first in ascending order and last in descending order, whatever the dialect's default.
+
+    Args:
+        keyset: The paginated query
+        last_keys: Sort keys of the previous page's last row, None for the first page
+
+    Returns:
+        tuple[str, dict[str, Any]]: The page query and the bind parameters of the sort keys
+    """
+    import sqlglot
+    from sqlglot import expressions as exp
+
+    def _key(index: int) -> exp.Column:
+        return exp.column(f"{_KEY_PREFIX}{index}", table=_PAGE_ALIAS)
+
+    query = cast(exp.Select, sqlglot.parse_one(keyset.query, dialect=keyset.dialect))
+    page = exp.select("*").from_(query.subquery(_PAGE_ALIAS))
+    params: dict[str, Any] = {}
+    if last_keys is not None:
+        # Rows after the last one: greater on a key, all previous keys being equal
+        after: exp.Condition | None = None
+        equal: list[exp.Expression] = []
+        for index, (value, descending) in enumerate(zip(last_keys, keyset.descending)):
+            key, param = _key(index), exp.Placeholder(this=f"{_KEY_PREFIX}{index}")
+            greater: exp.Condition
+            if value is None:
+                greater = exp.false() if descending else key.is_(exp.null()).not_()
+                equal_key: exp.Expression = key.is_(exp.null())
+            else:
+                params[f"{_KEY_PREFIX}{index}"] = value
+                greater = exp.or_(key < param, key.is_(exp.null())) if descending else key > param
+                equal_key = key.eq(param)
+            term = exp.and_(*equal, greater) if equal else greater
+            after = term if after is None else exp.or_(after, term)
+            equal.append(equal_key)
+        page = page.where(after)
+    page = page.order_by(*_page_order(keyset))
+    return page.limit(keyset.page_size + 1).sql(dialect=keyset.dialect), params
+
+
+def build_first_rows_query(keyset: Keyset, expression: Any, rows: int) -> str:
+    """
+    Builds the query selecting an expression over the tables of a paginated query for its first rows, in the order of
+    its pages, e.g. the business ids of the rows of its first page.
+
+    Args:
+        keyset: The paginated query
+        expression: Expression to select, over the tables of the query
+        rows: Number of rows to select the expression for
+
+    Returns:
+        str: The query, taking the same bind parameters as the paginated query
+    """
+    import sqlglot
+    from sqlglot import expressions as exp
+
+    query = cast(exp.Select, sqlglot.parse_one(keyset.query, dialect=keyset.dialect)).select(
+        expression.as_(_VALUE_ALIAS)
+    )
+    first_rows = (
+        exp.select(exp.column(_VALUE_ALIAS, table=_PAGE_ALIAS))
+        .from_(query.subquery(_PAGE_ALIAS))
+        .order_by(*_page_order(keyset))
+        .limit(rows)
+    )
+    return first_rows.sql(dialect=keyset.dialect)
+
+
+def _page_order(keyset: Keyset) -> list[Any]:
+    """Returns the ORDER BY of the pages of a paginated query, null sort keys first in ascending order."""
+    from sqlglot import expressions as exp
+
+    return [
+        exp.Ordered(
+            this=exp.column(f"{_KEY_PREFIX}{index}", table=_PAGE_ALIAS), desc=descending, nulls_first=not descending
+        )
+        for index, descending in enumerate(keyset.descending)
+    ]
+
+
+def split_page(keyset: Keyset, rows: Sequence[Sequence[Any]]) -> Page:
+    """Splits the rows of a page query into the page's rows, without their sort keys, and the keys to resume after."""
+    keys = len(keyset.descending)
+    page_rows = rows[: keyset.page_size]
+    return Page(
+        rows=[tuple(row[:-keys]) for row in page_rows],
+        last_keys=tuple(page_rows[-1][-keys:]) if page_rows else None,
+        has_more=len(rows) > keyset.page_size,
+    )
+
+
+def build_count_query(sql: str, dialect: str, limit: int | None = None) -> str | None:
+    """
+    Rewrites a validated query to count the rows it matches without the LIMIT of validation, but within its own LIMIT
+    if validation lowered it, with its OFFSET.
+
+    Returns:
+        str | None: The count query, taking the same bind parameters, or None if the query isn't a SELECT
+    """
+    import sqlglot
+    from sqlglot import expressions as exp
+
+    parsed = sqlglot.parse_one(sql, dialect=dialect)
+    if not isinstance(parsed, exp.Select):
+        return None
+    offset = parsed.args.get("offset")
+    for clause in ("order", "limit", "offset"):
+        parsed.set(clause, None)
+    if limit is not None:
+        parsed = parsed.limit(limit)
+        parsed.set("offset", offset)
+    return exp.select(exp.Count(this=exp.Star())).from_(parsed.subquery("_matches")).sql(dialect=dialect)
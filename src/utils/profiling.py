@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from types import FrameType
+from typing import Any, Iterator
+
+from src.utils.stages import timing_stages
+
+
+def _frame_label(frame: FrameType) -> str:
+    """Label of a frame in collapsed stacks, semicolons being the separator of the format."""
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_qualname}".replace(";", ":")
+
+
+class SamplingProfiler(threading.Thread):
+    def __init__(self, task: asyncio.Task[Any], loop_thread_id: int, interval: float) -> None:
+        """
+        Wall-clock sampling profiler of a single asyncio task, run in a daemon thread so the profiled code isn't
+        instrumented. Every `interval` seconds, it records the stack of the task: the stack of the event loop thread
+        while the task is running, else the chain of coroutines the task is suspended on, ending with an <await> frame.
+        Time spent waiting on the LLM, the database or an executor thus shows under the coroutine waiting for it.
+
+        Args:
+            task: The task to profile
+            loop_thread_id: Id of the thread running the task's event loop
+            interval: Seconds between samples
+        """
+        super().__init__(name="request-profiler", daemon=True)
+        self.task = task
+        self.loop = task.get_loop()
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            stack = self._sample()
+            if stack:
+                self.samples[";".join(stack)] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def _sample(self) -> list[str]:
+        coro = self.task.get_coro()
+        root = getattr(coro, "cr_frame", None)
+        if root is None:  # Task is done
+            return []
+
+        if asyncio.current_task(self.loop) is self.task:
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack: list[str] = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                if frame is root:  # Frames below the task's coroutine belong to the event loop
+                    break
+                frame = frame.f_back
+            return stack[::-1]
+
+        stack = []
+        awaited: Any = coro
+        while awaited is not None:
+            frame = getattr(awaited, "cr_frame", None) or getattr(awaited, "gi_frame", None)
+            if frame is None:
+                stack.append("<await>")
+                break
+            stack.append(_frame_label(frame))
+            awaited = getattr(awaited, "cr_await", None) or getattr(awaited, "gi_yieldfrom", None)
+        return stack
+
+
+@dataclass
+class ProfileMetadata:
+    id: str
+    method: str
+    path: str
+    trigger: str  # header or sampled
+    api_key: str | None
+    question_sha256: str | None
+    status: int | None
+    duration_ms: float
+    stage_timings_ms: dict[str, float]
+    samples: int
+    interval_ms: float
+    created_at: str = field(default_factory=lambda: datetime.now(UTC).isoformat())
+
+
+class RequestProfile:
+    def __init__(self, trigger: str, interval: float) -> None:
+        """
+        Profile of a single request: the samples of its task and the time spent in each stage of the request.
+
+        Args:
+            trigger: What triggered the profile, header or sampled
+            interval: Seconds between samples
+        """
+        self.id = f"{time.time_ns() // 1_000_000:013d}-{uuid.uuid4().hex[:8]}"  # Sorts by creation time
+        self.trigger = trigger
+        self.interval = interval
+        self.stage_timings: dict[str, float] = {}
+        self.samples: Counter[str] = Counter()  # Number of samples per collapsed stack, set once stopped
+        self.start_time = time.perf_counter()
+        self._profiler: SamplingProfiler | None = None
+
+    def start(self) -> None:
+        """Starts sampling the current task."""
+        task = asyncio.current_task()
+        assert task is not None
+        self._profiler = SamplingProfiler(task, threading.get_ident(), self.interval)
+        self._profiler.start()
+
+    def stop(self) -> None:
+        assert self._profiler is not None
+        self._profiler.stop()
+        self.samples = self._profiler.samples
+
+
+@contextmanager
+def profiling(profile: RequestProfile) -> Iterator[RequestProfile]:
+    """Samples the current task and times the stages of the request until exiting."""
+    with timing_stages() as timings:
+        profile.stage_timings = timings
+        profile.start()
+        try:
+            yield profile
+        finally:
+            profile.stop()
+
+
+def question_hash(body: bytes) -> str | None:
+    """Returns the SHA-256 of the question of a JSON request body, or None if it has no question."""
+    try:
+        question = json.loads(body).get("question")
+    except (ValueError, AttributeError):
+        return None
+    return hashlib.sha256(question.encode()).hexdigest() if isinstance(question, str) else None
+
+
+class ProfileStore:
+    def __init__(self, path: Path, retention: int) -> None:
+        """
+        Bounded on-disk ring of request profiles, shared by every worker process. Each profile is stored as a collapsed
+        stacks file, as read by flamegraph.pl, speedscope or inferno, next to its JSON metadata. Once more than
+        `retention` profiles are stored, the oldest are deleted.
+
+        Args:
+            path: Directory of the profiles
+            retention: Number of profiles kept
+        """
+        self.path = path
+        self.retention = retention
+
+    def save(self, metadata: ProfileMetadata, samples: Counter[str]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        folded = "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+        (self.path / f"{metadata.id}.folded").write_text(folded)
+        # Metadata is written last and atomically, profiles are only listed once complete
+        tmp_path = self.path / f"{metadata.id}.json.tmp"
+        tmp_path.write_text(json.dumps(asdict(metadata), indent=2))
+        os.replace(tmp_path, self.path / f"{metadata.id}.json")
+        self._prune()
+
+    def list(self) -> list[dict[str, Any]]:
+        """Returns the metadata of the stored profiles, newest first."""
+        profiles = []
+        for metadata_path in sorted(self.path.glob("*.json"), reverse=True):
+            try:
+                profiles.append(json.loads(metadata_path.read_text()))
+            except (FileNotFoundError, ValueError):  # Pruned by another worker
+                continue
+        return profiles
+
+    def read(self, profile_id: str) -> str | None:
+        """Returns the collapsed stacks of the profile, or None if it doesn't exist."""
+        folded_path = self.path / f"{profile_id}.folded"
+        if folded_path.parent != self.path or not (self.path / f"{profile_id}.json").exists():
+            return None
+        try:
+            return folded_path.read_text()
+        except FileNotFoundError:
+            return None
+
+    def _prune(self) -> None:
+        profiles = sorted(self.path.glob("*.json"))
+        for metadata_path in profiles[: max(0, len(profiles) - self.retention)]:
+            metadata_path.unlink(missing_ok=True)
+            metadata_path.with_suffix(".folded").unlink(missing_ok=True)
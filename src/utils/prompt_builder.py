@@ -1,22 +1,12 @@
-import json
-from pathlib import Path
 from typing import Any, Type
 
-import aiofiles
-from async_lru import alru_cache
 from pydantic import ValidationError
 from sqlalchemy.orm import DeclarativeBase
 
-from src import PROMPT_PATH
 from src.models.app.validation import ValidationModel
-
-
-@alru_cache(maxsize=4)  # Cache up to 4 prompts
-async def _load_prompt(path: Path) -> dict[str, str]:
-    """Internal helper function to load a prompt from a JSON file asynchronously."""
-    async with aiofiles.open(path, mode="r") as file:
-        content = await file.read()
-        return json.loads(content)
+from src.utils.prompt_cache import PromptPrefix
+from src.utils.prompt_registry import prompt_registry
+from src.utils.schema_pruning import SchemaSelection
 
 
 async def build_answer_generation_prompt(question: str, generated_sql: str, results: Any) -> tuple[str, str]:
@@ -32,13 +22,10 @@ async def build_answer_generation_prompt(question: str, generated_sql: str, resu
         tuple[str, str]:
         A tuple containing (system prompt, user prompt) pair in that order.
     """
-    prompt_path = PROMPT_PATH / "generate_answer"
-
-    system_prompt_data = await _load_prompt(prompt_path / "system.json")
-    system_prompt = system_prompt_data["message"]
-
-    user_prompt_data = await _load_prompt(prompt_path / "user.json")
-    user_prompt = user_prompt_data["message"].format(question=question, generated_sql=generated_sql, results=results)
+    system_prompt = prompt_registry.get("generate_answer/system").message
+    user_prompt = prompt_registry.get("generate_answer/user").format(
+        question=question, generated_sql=generated_sql, results=results
+    )
 
     return system_prompt, user_prompt
 
@@ -58,13 +45,8 @@ async def build_response_fix_prompt(
         A tuple containing (system prompt, user prompt) pair in that order.
     """
     try:
-        prompt_path = PROMPT_PATH / "validation"
-
-        system_prompt_data = await _load_prompt(prompt_path / "system.txt")
-        system_prompt = system_prompt_data["message"]
-
-        user_prompt_data = await _load_prompt(prompt_path / "user.txt")
-        user_prompt = user_prompt_data["message"].format(
+        system_prompt = prompt_registry.get("validation/system").message
+        user_prompt = prompt_registry.get("validation/user").format(
             json_output=content, json_schema=model.model_json_schema(), error=error
         )
 
@@ -72,31 +54,47 @@ async def build_response_fix_prompt(
 
     except Exception as e:
         raise RuntimeError(
-            f"Error in build_validation_prompt: {str(e)}. Ensure the prompt files exist, "
-            f"contain the required keys ('message'), and the provided content and model are valid for formatting."
+            f"Error in build_response_fix_prompt: {str(e)}. Ensure the validation prompts are loaded in the prompt "
+            f"registry and the provided content and model are valid for formatting."
         )
 
 
 async def build_sql_generation_prompt(
-    question: str, dialect: str, models: list[Type[DeclarativeBase]]
-) -> tuple[str, str]:
+    question: str,
+    dialect: str,
+    models: list[Type[DeclarativeBase]],
+    tags: list[str],
+    selection: SchemaSelection | None = None,
+    previous_turn: tuple[str, str] | None = None,
+) -> tuple[PromptPrefix, str] | tuple[str, str]:
     """
-    Builds a prompt for generating a SQL query from a user question, database dialect, and table schemas.
+    Builds a prompt for generating a SQL query from a user question, database dialect, table schemas and tags.
+
+    With the full schema, the system prompt, dialect, schemas and tags are identical across questions and make up the
+    static prefix of the prompt, which can be cached by the provider. Only the user prompt holding the question changes
+    per request. With a selection of the schema relevant to the question, the prompt only holds the selected tables,
+    columns and tags, and is sent inline as it differs across questions.
+
     Args:
         question: The user question to generate a SQL query for.
         dialect: The database dialect to use for the SQL query.
         models: A list of SQLAlchemy models to use for the SQL query.
+        tags: The valid tags to filter businesses on.
+        selection: The tables, columns and tags relevant to the question, None for the full schema.
+        previous_turn: The (question, SQL query) pair of the previous turn of the session if the question follows up
+            on it, prepended to the user prompt.
 
     Returns:
-        A tuple containing the system prompt and user prompt.
+        A tuple containing the static prompt prefix, or the system prompt for a selection, and the user prompt.
     """
 
-    def _get_sqlalchemy_schema(model: Type[DeclarativeBase]) -> str:
+    def _get_sqlalchemy_schema(model: Type[DeclarativeBase], selected_columns: tuple[str, ...] | None) -> str:
         """
         Converts a SQLAlchemy model to a readable schema format for LLM prompts.
 
         Args:
             model: SQLAlchemy model class
+            selected_columns: Columns to include, None for every column
 
         Returns:
             str: A formatted string representation of the table schema
@@ -110,6 +108,8 @@ async def build_sql_generation_prompt(
         # Get columns
         columns: list[str] = []
         for column in model.__table__.columns:
+            if selected_columns is not None and column.name not in selected_columns:
+                continue
             column_type: str = str(column.type)
             nullable: str = "NULL" if column.nullable else "NOT NULL"
             primary_key: str = "PRIMARY KEY" if column.primary_key else ""
@@ -127,57 +127,34 @@ async def build_sql_generation_prompt(
         # Get relationships
         if hasattr(model, "__mapper__"):
             for rel in model.__mapper__.relationships:
+                if selection is not None and rel.target.name not in selection.columns:
+                    continue
                 rel_type: str = "one-to-many" if rel.uselist else "one-to-one"
                 schema_parts.append(f"  Relationship: {rel.key} ({rel_type}) -> {rel.target}")
 
         return "\n".join(schema_parts)
 
     # Convert models to schema strings
-    schemas: str = "\n\n".join(_get_sqlalchemy_schema(model) for model in models)
-
-    # HARD CODED TAGS FOR NOW -> TODO: fetch from db & implement caching + refresh cache on new tag entry to db
-    tags = [
-        "alcohol",
-        "ambience_casual",
-        "ambience_classy",
-        "ambience_intimate",
-        "ambience_romantic",
-        "ambience_trendy",
-        "ambience_upscale",
-        "bike_parking",
-        "breakfast",
-        "brunch",
-        "business_accepts_android_pay",
-        "business_accepts_apple_pay",
-        "business_accepts_credit_cards",
-        "business_parking_garage",
-        "business_parking_lot",
-        "business_parking_street",
-        "caters",
-        "dinner",
-        "dogs_allowed",
-        "good_for_kids",
-        "happy_hour",
-        "has_gluten_free",
-        "has_tv",
-        "liked_by_vegans",
-        "liked_by_vegetarians",
-        "lunch",
-        "outdoor_seating",
-        "restaurants_delivery",
-        "restaurants_good_for_groups",
-        "restaurants_reservations",
-        "restaurants_table_service",
-        "restaurants_take_out",
-        "waitlist_reservation",
-        "wi_fi",
-    ]
-    prompt_path = PROMPT_PATH / "generate_sql"
-
-    system_prompt_data = await _load_prompt(prompt_path / "system.json")
-    system_prompt = system_prompt_data["message"]
-
-    user_prompt_data = await _load_prompt(prompt_path / "user.json")
-    user_prompt = user_prompt_data["message"].format(question=question, dialect=dialect, schemas=schemas, tags=tags)
+    if selection is None:
+        schemas: str = "\n\n".join(_get_sqlalchemy_schema(model, None) for model in models)
+    else:
+        schemas = "\n\n".join(
+            _get_sqlalchemy_schema(model, selection.columns[model.__tablename__])
+            for model in models
+            if model.__tablename__ in selection.columns
+        )
+        tags = selection.tags
+
+    system_prompt = prompt_registry.get("generate_sql/system").message
+    context = prompt_registry.get("generate_sql/context").format(dialect=dialect, schemas=schemas, tags=tags)
+    user_prompt = prompt_registry.get("generate_sql/user").format(question=question)
+    if previous_turn is not None:
+        previous_question, previous_sql = previous_turn
+        follow_up = prompt_registry.get("generate_sql/follow_up").format(
+            previous_question=previous_question, previous_sql=previous_sql
+        )
+        user_prompt = f"{follow_up}\n{user_prompt}"
 
-    return system_prompt, user_prompt
+    if selection is not None:
+        return system_prompt, f"{context}\n{user_prompt}"
+    return PromptPrefix("generate_sql", system_prompt, context), user_prompt
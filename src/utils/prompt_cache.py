@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass, field
+from logging import Logger
+from typing import TYPE_CHECKING, Any
+
+from src.utils.metrics import Metrics
+
+if TYPE_CHECKING:
+    from google.genai import Client as GoogleClient
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """
+    Static part of a prompt, identical across requests: the system prompt and a context sent before the user prompt.
+    Its fingerprint changes whenever its content does, e.g. when the schema or tag vocabulary changes.
+    """
+
+    name: str
+    system_prompt: str
+    context: str
+    fingerprint: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        digest = hashlib.sha256(f"{self.system_prompt}\0{self.context}".encode()).hexdigest()
+        object.__setattr__(self, "fingerprint", digest)
+
+
+@dataclass
+class _CachedPrefix:
+    prefix: str
+    name: str  # Handle of the cached content at the provider
+    fingerprint: str
+    expires_at: float  # time.monotonic() deadline
+    refresh: asyncio.Task[None] | None = None
+
+
+class PromptPrefixCache:
+    def __init__(
+        self, ttl: float, metrics: Metrics, logger: Logger, refresh_margin: float = 0.2, retry_after: float = 300.0
+    ) -> None:
+        """
+        Registers static prompt prefixes with Gemini's context caching, once per prefix and model, so calls reference
+        them by handle instead of resending them.
+
+        A cached prefix is refreshed in the background once it has less than `refresh_margin` of its TTL left, and is
+        recreated when its content changes, the previous one being deleted. Caches are per worker process and expire
+        on their own at the provider when the app stops. If the provider refuses to cache a prefix, e.g. as it's below
+        the minimum size of the model, the prefix is sent inline and caching is retried after `retry_after` seconds.
+
+        Args:
+            ttl: Time to live of cached prefixes at the provider, in seconds
+            metrics: Metrics registry to export cache outcomes to
+            logger: Logger of the app
+            refresh_margin: Share of the TTL left below which a cached prefix is refreshed
+            retry_after: Seconds to wait before retrying to cache a prefix the provider refused
+        """
+        self.ttl = ttl
+        self.metrics = metrics
+        self.logger = logger
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self._entries: dict[tuple[str, str], _CachedPrefix] = {}
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self._unavailable_until: dict[tuple[str, str], float] = {}
+        self._background: set[asyncio.Task[Any]] = set()
+
+    async def get(self, client: "GoogleClient", model: str, prefix: PromptPrefix) -> str | None:
+        """
+        Returns the handle of the cached prefix for the model, creating it if it doesn't exist, expired or changed.
+
+        Args:
+            client: Google GenAI client
+            model: Model the prefix is cached for, cached contents are bound to a model
+            prefix: The static prompt prefix
+
+        Returns:
+            str | None: Name of the cached content, or None if the prefix must be sent inline
+        """
+        key = (prefix.name, model)
+        entry = self._entries.get(key)
+        if entry is not None and entry.fingerprint == prefix.fingerprint and entry.expires_at > time.monotonic():
+            self._maybe_refresh(client, entry)
+            self.metrics.increment("llm_prefix_cache_total", prefix=prefix.name, outcome="hit")
+            return entry.name
+        if self._unavailable_until.get(key, 0.0) > time.monotonic():
+            self.metrics.increment("llm_prefix_cache_total", prefix=prefix.name, outcome="inline")
+            return None
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            entry = self._entries.get(key)  # Created by a concurrent call while waiting for the lock
+            if entry is not None and entry.fingerprint == prefix.fingerprint and entry.expires_at > time.monotonic():
+                self.metrics.increment("llm_prefix_cache_total", prefix=prefix.name, outcome="hit")
+                return entry.name
+            return await self._create(client, model, prefix, entry)
+
+    def invalidate(self, model: str, prefix: PromptPrefix) -> None:
+        """Forgets the cached prefix of the model, e.g. after a call referencing it failed, so it's recreated."""
+        self._entries.pop((prefix.name, model), None)
+
+    async def _create(
+        self, client: "GoogleClient", model: str, prefix: PromptPrefix, previous: _CachedPrefix | None
+    ) -> str | None:
+        from google.genai.types import CreateCachedContentConfig  # Deferred, importing google-genai is slow
+
+        key = (prefix.name, model)
+        try:
+            cached_content = await client.aio.caches.create(
+                model=model,
+                config=CreateCachedContentConfig(
+                    display_name=f"{prefix.name}-{prefix.fingerprint[:12]}",
+                    system_instruction=prefix.system_prompt,
+                    contents=[prefix.context],
+                    ttl=f"{int(self.ttl)}s",
+                ),
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not cache prompt prefix {prefix.name} for {model}, sending it inline: {str(e)}")
+            self.metrics.increment("llm_prefix_cache_total", prefix=prefix.name, outcome="error")
+            self._unavailable_until[key] = time.monotonic() + self.retry_after
+            return None
+
+        assert cached_content.name is not None
+        self._entries[key] = _CachedPrefix(
+            prefix.name, cached_content.name, prefix.fingerprint, time.monotonic() + self.ttl
+        )
+        self._unavailable_until.pop(key, None)
+        changed = previous is not None and previous.fingerprint != prefix.fingerprint
+        self.metrics.increment(
+            "llm_prefix_cache_total", prefix=prefix.name, outcome="recreate" if changed else "create"
+        )
+        self.logger.info(f"Cached prompt prefix {prefix.name} for {model}: {cached_content.name}")
+        if previous is not None:
+            self._spawn(self._delete(client, previous.name))
+        return cached_content.name
+
+    def _maybe_refresh(self, client: "GoogleClient", entry: _CachedPrefix) -> None:
+        """Extends the TTL of the cached prefix in the background once it's close to expiring."""
+        if entry.refresh is None and entry.expires_at - time.monotonic() < self.ttl * self.refresh_margin:
+            entry.refresh = self._spawn(self._refresh(client, entry))
+
+    async def _refresh(self, client: "GoogleClient", entry: _CachedPrefix) -> None:
+        from google.genai.types import UpdateCachedContentConfig
+
+        try:
+            await client.aio.caches.update(name=entry.name, config=UpdateCachedContentConfig(ttl=f"{int(self.ttl)}s"))
+            entry.expires_at = time.monotonic() + self.ttl
+            self.metrics.increment("llm_prefix_cache_total", prefix=entry.prefix, outcome="refresh")
+        except Exception as e:
+            self.logger.warning(f"Could not refresh cached prompt prefix {entry.name}: {str(e)}")
+            entry.expires_at = 0.0  # Recreated by the next call
+        finally:
+            entry.refresh = None
+
+    async def _delete(self, client: "GoogleClient", name: str) -> None:
+        try:
+            await client.aio.caches.delete(name=name)
+        except Exception as e:
+            self.logger.debug(f"Could not delete cached prompt prefix {name}: {str(e)}")
+
+    def _spawn(self, coroutine: Any) -> asyncio.Task[Any]:
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from logging import Logger
+from pathlib import Path
+from string import Formatter
+from typing import Any
+
+from src import PROMPT_PATH
+
+# Placeholders each prompt template must define, prompts mapped to None are static and never formatted
+PROMPT_PLACEHOLDERS: dict[str, frozenset[str] | None] = {
+    "generate_answer/system": None,
+    "generate_answer/user": frozenset({"question", "generated_sql", "results"}),
+    "generate_sql/system": None,
+    "generate_sql/context": frozenset({"dialect", "schemas", "tags"}),
+    "generate_sql/follow_up": frozenset({"previous_question", "previous_sql"}),
+    "generate_sql/user": frozenset({"question"}),
+    "validation/system": None,
+    "validation/user": frozenset({"json_output", "json_schema", "error"}),
+}
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """A prompt template pre-parsed into its literal parts and placeholders."""
+
+    name: str
+    role: str
+    message: str
+    version: str
+    parts: tuple[tuple[str, str | None], ...]  # (literal text, placeholder following it)
+    mtime_ns: int
+
+    @property
+    def placeholders(self) -> frozenset[str]:
+        return frozenset(field for _, field in self.parts if field is not None)
+
+    def format(self, **kwargs: Any) -> str:
+        """
+        Formats the prompt with the given placeholder values.
+
+        Args:
+            **kwargs: Values of every placeholder of the prompt
+
+        Returns:
+            str: The formatted prompt, or the message as is for static prompts
+        """
+        return "".join(literal + (str(kwargs[field]) if field is not None else "") for literal, field in self.parts)
+
+
+class PromptRegistry:
+    def __init__(self, path: Path, placeholders: dict[str, frozenset[str] | None]) -> None:
+        """
+        Registry of every prompt template under the prompts directory.
+
+        Prompts are loaded and validated once, then served from memory. Changed files are reloaded by reload_changed,
+        keeping the previous version of a prompt if the new one is invalid.
+
+        Args:
+            path: Directory containing the prompt JSON files, grouped in one folder per task
+            placeholders: Expected placeholders per prompt name, None for static prompts
+        """
+        self.path = path
+        self.placeholders = placeholders
+        self._prompts: dict[str, Prompt] = {}
+
+    def load(self) -> None:
+        """
+        Loads and validates every prompt. Raises ValueError if any prompt is invalid or missing.
+        """
+        prompts = {prompt.name: prompt for prompt in map(self._load_prompt, sorted(self.path.glob("*/*.json")))}
+        missing = set(self.placeholders) - set(prompts)
+        if missing:
+            raise ValueError(f"Missing prompt files for: {', '.join(sorted(missing))}")
+        self._prompts = prompts
+
+    def get(self, name: str) -> Prompt:
+        """
+        Gets a prompt by name (e.g. "generate_sql/user"), loading the registry on first use.
+
+        Args:
+            name: Prompt name, the path of its file relative to the prompts directory without extension
+
+        Returns:
+            Prompt: The prompt
+        """
+        if not self._prompts:
+            self.load()
+        return self._prompts[name]
+
+    def versions(self) -> dict[str, str]:
+        """Returns the version id of every loaded prompt."""
+        return {name: prompt.version for name, prompt in self._prompts.items()}
+
+    def reload_changed(self, logger: Logger) -> list[str]:
+        """
+        Reloads every prompt whose file changed since it was loaded.
+
+        Args:
+            logger: Logger to report reloads and invalid prompts
+
+        Returns:
+            list[str]: Names of the prompts that were reloaded
+        """
+        reloaded: list[str] = []
+        for file in sorted(self.path.glob("*/*.json")):
+            name = self._get_name(file)
+            current = self._prompts.get(name)
+            if current is not None and file.stat().st_mtime_ns == current.mtime_ns:
+                continue
+            try:
+                prompt = self._load_prompt(file)
+            except Exception as e:
+                logger.error(f"Invalid prompt {name}, keeping version {current.version if current else None}: {e}")
+                continue
+            if current is None or prompt.version != current.version:
+                logger.info(
+                    f"Reloaded prompt {name}: version {current.version if current else None} -> {prompt.version}"
+                )
+                reloaded.append(name)
+            self._prompts[name] = prompt
+        return reloaded
+
+    async def watch(self, logger: Logger, interval: float) -> None:
+        """
+        Polls the prompt files for changes and reloads them until cancelled.
+
+        Args:
+            logger: Logger to report reloads and invalid prompts
+            interval: Seconds between polls
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload_changed, logger)
+            except Exception:
+                logger.error("Error reloading prompts\n", exc_info=True)
+
+    def _get_name(self, file: Path) -> str:
+        return file.relative_to(self.path).with_suffix("").as_posix()
+
+    def _load_prompt(self, file: Path) -> Prompt:
+        """Loads a prompt file, pre-parses its message and validates its placeholders."""
+        name = self._get_name(file)
+        mtime_ns = file.stat().st_mtime_ns
+        content = file.read_bytes()
+        data = json.loads(content)
+        message: str = data["message"]
+
+        expected = self.placeholders.get(name)
+        if expected is None:
+            parts: tuple[tuple[str, str | None], ...] = ((message, None),)
+        else:
+            parts = tuple(_parse_message(name, message))
+            found = frozenset(field for _, field in parts if field is not None)
+            if found != expected:
+                raise ValueError(f"Prompt {name} has placeholders {sorted(found)}, expected {sorted(expected)}")
+
+        return Prompt(
+            name=name,
+            role=data.get("role", ""),
+            message=message,
+            version=hashlib.sha256(content).hexdigest()[:12],
+            parts=parts,
+            mtime_ns=mtime_ns,
+        )
+
+
+def _parse_message(name: str, message: str) -> list[tuple[str, str | None]]:
+    """Splits a message into (literal, placeholder) parts. Raises ValueError on unsupported placeholder syntax."""
+    parts: list[tuple[str, str | None]] = []
+    for literal, field, format_spec, conversion in Formatter().parse(message):
+        if field is not None and (not field.isidentifier() or format_spec or conversion):
+            raise ValueError(f"Prompt {name} has unsupported placeholder '{{{field}}}'")
+        parts.append((literal, field))
+    return parts
+
+
+# Singleton instance for entire application
+prompt_registry = PromptRegistry(PROMPT_PATH, PROMPT_PLACEHOLDERS)
@@ -0,0 +1,61 @@
+import math
+import time
+from dataclasses import dataclass, field
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int) -> None:
+        """
+        Token bucket refilled continuously at a fixed rate, allowing bursts of up to its capacity.
+
+        Tokens are refilled lazily from the time elapsed since the last check, so checks are O(1). The bucket is only
+        used from the event loop and never awaits between reading and updating its tokens, so it needs no locks.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens, i.e. the largest burst allowed
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self) -> bool:
+        """Takes a token if one is available, returning whether it was taken."""
+        self._refill(time.monotonic())
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    @property
+    def remaining(self) -> int:
+        """Whole tokens left as of the last check."""
+        return int(self.tokens)
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until the next token is available, as of the last check."""
+        return max(1, math.ceil((1 - self.tokens) / self.rate))
+
+    @property
+    def reset_after(self) -> int:
+        """Seconds until the bucket is full again, as of the last check."""
+        return math.ceil((self.capacity - self.tokens) / self.rate)
+
+
+@dataclass
+class KeyLimiter:
+    """Rate and concurrency limits of a single API key."""
+
+    name: str
+    bucket: TokenBucket | None = None
+    max_concurrent: int | None = None
+    in_flight: int = field(default=0)
+
+    def concurrency_available(self) -> bool:
+        return self.max_concurrent is None or self.in_flight < self.max_concurrent
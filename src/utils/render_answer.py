@@ -0,0 +1,196 @@
+import re
+from enum import Enum
+from typing import Any, Sequence
+
+from src.utils.validate_sql import ProjectedColumn
+
+
+class QuestionType(Enum):
+    COUNT = "count"
+    YES_NO = "yes_no"
+    LOOKUP = "lookup"
+
+
+class ResultShape(Enum):
+    EMPTY = "empty"
+    SCALAR = "scalar"
+    SINGLE_ROW = "single_row"
+    SHORT_LIST = "short_list"
+    COMPLEX = "complex"
+
+
+_COUNT_QUESTION = re.compile(r"\bhow many\b(?:\s+(?P<noun>[a-z][\w-]*))?", re.IGNORECASE)
+_YES_NO_QUESTION = re.compile(r"^\s*(is|are|does|do|can|has|have)\b", re.IGNORECASE)
+_IDENTIFIER = re.compile(r"^\w+$")
+
+# Nouns counted by "how many" questions that read well in a count answer, other words following "how many" (e.g. "of",
+# "are") are answered with "results"
+_COUNT_NOUNS = frozenset(
+    "bars businesses cafes cities companies locations places restaurants results shops stores tags".split()
+)
+
+# Templates keyed on question type, then result shape
+_TEMPLATES: dict[QuestionType, dict[ResultShape, str]] = {
+    QuestionType.COUNT: {
+        ResultShape.EMPTY: "There are no {noun} matching your question.",
+        ResultShape.SCALAR: "There {verb} {value} {noun} matching your question.",
+    },
+    QuestionType.YES_NO: {
+        ResultShape.EMPTY: "No, I couldn't find anything matching your question.",
+        ResultShape.SCALAR: "{yes_no}, I found {value} {matches} for your question.",
+    },
+    QuestionType.LOOKUP: {
+        ResultShape.EMPTY: "I couldn't find any results matching your question.",
+        ResultShape.SCALAR: "The {label} is {value}.",
+        ResultShape.SINGLE_ROW: "{fields}",
+        ResultShape.SHORT_LIST: "Here are the {count} results:\n{items}",
+    },
+}
+
+
+def classify_question(question: str) -> QuestionType:
+    """Classifies a user question into one of the question types we have answer templates for."""
+    if _COUNT_QUESTION.search(question):
+        return QuestionType.COUNT
+    if _YES_NO_QUESTION.match(question):
+        return QuestionType.YES_NO
+    return QuestionType.LOOKUP
+
+
+def get_result_shape(
+    projection: Sequence[ProjectedColumn], rows: Sequence[Sequence[Any]], max_rows: int, max_columns: int
+) -> ResultShape:
+    """
+    Recognizes the shape of a query result from the validated query's projection and the number of rows returned.
+
+    Args:
+        projection: Projected columns of the validated query
+        rows: Rows returned by the query
+        max_rows: Maximum number of rows considered a short list
+        max_columns: Maximum number of columns that can be rendered locally
+
+    Returns:
+        ResultShape: The recognized shape, COMPLEX if the result should be phrased by the LLM
+    """
+    if not projection or len(projection) > max_columns:
+        return ResultShape.COMPLEX
+    if any(not _IDENTIFIER.match(column.name) and column.aggregate != "count" for column in projection):
+        # Stars and unaliased expressions can't be turned into readable labels, unaliased counts are phrased as numbers
+        return ResultShape.COMPLEX
+    if len(rows) == 0:
+        return ResultShape.EMPTY
+    if len(rows) == 1 and len(projection) == 1:
+        return ResultShape.SCALAR
+    if len(rows) == 1:
+        return ResultShape.SINGLE_ROW
+    if len(rows) <= max_rows:
+        return ResultShape.SHORT_LIST
+    return ResultShape.COMPLEX
+
+
+def render_answer_locally(
+    question: str,
+    projection: Sequence[ProjectedColumn],
+    rows: Sequence[Sequence[Any]],
+    max_rows: int = 5,
+    max_columns: int = 3,
+) -> str | None:
+    """
+    Renders a natural language answer for simple query results without calling the LLM.
+
+    Args:
+        question: The user question
+        projection: Projected columns of the validated query
+        rows: Rows returned by the query
+        max_rows: Maximum number of rows rendered as a list
+        max_columns: Maximum number of columns rendered per row
+
+    Returns:
+        str | None: The rendered answer, or None if the result is too complex and should be phrased by the LLM
+    """
+    question_type = classify_question(question)
+    shape = get_result_shape(projection, rows, max_rows, max_columns)
+    template = _TEMPLATES[question_type].get(shape)
+    if template is None:
+        return None
+
+    if question_type in (QuestionType.COUNT, QuestionType.YES_NO):
+        match = _COUNT_QUESTION.search(question)
+        noun = match.group("noun").lower() if match and match.group("noun") else "results"
+        if noun not in _COUNT_NOUNS:
+            noun = "results"
+        if shape == ResultShape.EMPTY:
+            return template.format(noun=noun)
+
+        # Only counts can be phrased as a number of matches
+        value = rows[0][0]
+        if projection[0].aggregate != "count" or not isinstance(value, int):
+            return None
+        return template.format(
+            value=value,
+            noun=noun,
+            verb="is" if value == 1 else "are",
+            yes_no="Yes" if value > 0 else "No",
+            matches="match" if value == 1 else "matches",
+        )
+
+    if any(column.aggregate is not None and not _IDENTIFIER.match(column.name) for column in projection):
+        return None
+
+    return template.format(
+        label=_format_label(projection[0]),
+        value=_format_value(rows[0][0]) if rows else "",
+        fields="\n".join(
+            f"- {_format_label(column).capitalize()}: {_format_value(value)}"
+            for column, value in zip(projection, rows[0] if rows else ())
+        ),
+        count=len(rows),
+        items="\n".join(f"- {_format_row(projection, row)}" for row in rows),
+    )
+
+
+def render_results_list(projection: Sequence[ProjectedColumn], rows: Sequence[Sequence[Any]]) -> str:
+    """
+    Lists the rows of a query result whatever its shape, the fallback answer when the LLM can't be called.
+
+    Args:
+        projection: Projected columns of the validated query
+        rows: Rows returned by the query
+
+    Returns:
+        str: The rows as a list, labelled by column when the projection names every column
+    """
+    lookup_templates = _TEMPLATES[QuestionType.LOOKUP]
+    if not rows:
+        return lookup_templates[ResultShape.EMPTY]
+    labelled = len(projection) == len(rows[0]) and all(_IDENTIFIER.match(column.name) for column in projection)
+    items = "\n".join(
+        f"- {_format_row(projection, row) if labelled else ', '.join(_format_value(value) for value in row)}"
+        for row in rows
+    )
+    return lookup_templates[ResultShape.SHORT_LIST].format(count=len(rows), items=items)
+
+
+def _format_label(column: ProjectedColumn) -> str:
+    """Turns a column name into a readable label (e.g. zip_code -> zip code)."""
+    return column.name.replace("_", " ").strip() or "result"
+
+
+def _format_value(value: Any) -> str:
+    """Formats a single result value for display."""
+    if value is None:
+        return "N/A"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+def _format_row(projection: Sequence[ProjectedColumn], row: Sequence[Any]) -> str:
+    """Formats a row as its first value followed by the remaining labelled values."""
+    first, *rest = [_format_value(value) for value in row]
+    if not rest:
+        return first
+    details = ", ".join(f"{_format_label(column)}: {value}" for column, value in zip(projection[1:], rest))
+    return f"{first} ({details})"
@@ -0,0 +1,155 @@
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Protocol, Sequence
+
+
+class CacheBackend(Protocol):
+    """Storage of cache entries, each tagged with the database generation it was computed from."""
+
+    def get(self, key: str) -> Any | None: ...
+
+    def set(self, key: str, value: Any, generation: int) -> None: ...
+
+    def add(self, key: str, amount: int, generation: int) -> None:
+        """Adds to the number stored under the key, starting from 0, atomically across the processes sharing it."""
+        ...
+
+    def drop_older_generations(self, generation: int) -> None: ...
+
+
+class LocalCacheBackend:
+    def __init__(self, max_size: int) -> None:
+        """In-process LRU storage of cache entries, private to the worker process."""
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[int, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: Any, generation: int) -> None:
+        self._entries[key] = (generation, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def add(self, key: str, amount: int, generation: int) -> None:
+        self.set(key, (self.get(key) or 0) + amount, generation)
+
+    def drop_older_generations(self, generation: int) -> None:
+        for key in [key for key, (entry_generation, _) in self._entries.items() if entry_generation < generation]:
+            del self._entries[key]
+
+
+class GenerationCache:
+    def __init__(self, max_size: int, backend: CacheBackend | None = None) -> None:
+        """
+        Cache of values keyed on their inputs and the database generation they were read from.
+
+        Entries from older generations are dropped as soon as a newer generation is seen, so values never outlive the
+        data they were read from.
+
+        Args:
+            max_size: Maximum number of entries kept, 0 disables the cache
+            backend: Storage of the entries, defaults to an in-process LRU
+        """
+        self.max_size = max_size
+        self.generation: int | None = None
+        self.backend: CacheBackend = backend if backend is not None else LocalCacheBackend(max_size)
+
+    def _get(self, key: str, generation: int) -> Any | None:
+        if self.max_size <= 0:
+            return None
+        self._check_generation(generation)
+        return self.backend.get(self._versioned_key(key, generation))
+
+    def _set(self, key: str, generation: int, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        self._check_generation(generation)
+        if generation != self.generation:
+            return  # Stale value read from an older generation
+        self.backend.set(self._versioned_key(key, generation), value, generation)
+
+    def _check_generation(self, generation: int) -> None:
+        """Drops every cached entry of older generations when a newer database generation is seen."""
+        if self.generation is None or generation > self.generation:
+            self.backend.drop_older_generations(generation)
+            self.generation = generation
+
+    @staticmethod
+    def _versioned_key(key: str, generation: int) -> str:
+        return hashlib.sha256(f"{generation}\x00{key}".encode()).hexdigest()
+
+
+class ResultCache(GenerationCache):
+    """
+    Cache of query results keyed on the canonical validated query, its bind parameters and the database generation the
+    results were read from.
+    """
+
+    def get(self, canonical_query: str, params: dict[str, Any], generation: int) -> Sequence[Any] | None:
+        """
+        Gets cached rows for a query.
+
+        Args:
+            canonical_query: Canonical form of the validated query
+            params: Bind parameters of the query
+            generation: Current database generation
+
+        Returns:
+            Sequence[Any] | None: The cached rows, or None on a cache miss
+        """
+        return self._get(self._key(canonical_query, params), generation)
+
+    def set(self, canonical_query: str, params: dict[str, Any], generation: int, rows: Sequence[Any]) -> None:
+        """
+        Caches rows for a query, evicting older results if full.
+
+        Args:
+            canonical_query: Canonical form of the validated query
+            params: Bind parameters of the query
+            generation: Database generation the rows were read from
+            rows: Rows returned by the query, as plain tuples so they can be stored outside the process
+        """
+        self._set(self._key(canonical_query, params), generation, rows)
+
+    @staticmethod
+    def _key(canonical_query: str, params: dict[str, Any]) -> str:
+        return f"result\x00{canonical_query}\x00{sorted(params.items())!r}"
+
+
+class AnswerCache(GenerationCache):
+    """Cache of final answers keyed on the normalized question and the database generation they were answered from."""
+
+    def get(self, question: str, generation: int) -> str | None:
+        """
+        Gets the cached answer to a question.
+
+        Args:
+            question: The user question
+            generation: Current database generation
+
+        Returns:
+            str | None: The cached answer, or None on a cache miss
+        """
+        return self._get(self._key(question), generation)
+
+    def set(self, question: str, generation: int, answer: str) -> None:
+        """
+        Caches the answer to a question.
+
+        Args:
+            question: The user question
+            generation: Database generation the answer was generated from
+            answer: The answer returned to the user
+        """
+        self._set(self._key(question), generation, answer)
+
+    @staticmethod
+    def _key(question: str) -> str:
+        return "answer\x00" + re.sub(r"\s+", " ", question).strip().rstrip("?.!").strip().lower()
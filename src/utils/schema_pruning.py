@@ -0,0 +1,231 @@
+import re
+from collections import deque
+from dataclasses import dataclass
+from itertools import takewhile
+from typing import Type, cast
+
+from sqlalchemy import Table
+from sqlalchemy.orm import DeclarativeBase
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Words carrying no meaning about the schema
+_STOPWORDS = frozenset(
+    "a about all an and any are as at be by can count do does find for from get give has have how i in is it its list "
+    "many me much number of on one ones or please show that the their them there these they this those to total what "
+    "whats which who with".split()
+)
+
+# Prepositions introducing a value of the question, e.g. the name of a business or a city
+_VALUE_PREPOSITIONS = frozenset(("of", "named", "called", "at", "in", "near", "for", "from"))
+
+# Descriptions of tables and columns, words users may ask about them with besides their name
+SCHEMA_DESCRIPTIONS: dict[str, str] = {
+    "businesses": "business place shop store company restaurant",
+    "businesses.name": "name called named",
+    "businesses.url": "website site link",
+    "businesses.source": "source provider yelp origin",
+    "businesses.source_id": "yelp id",
+    "businesses.source_url": "yelp page link",
+    "businesses.source_rating": "rating rated stars star score review best top highest lowest",
+    "businesses.phone": "phone telephone call contact",
+    "businesses.created_at": "added created",
+    "locations": "location located where",
+    "locations.longitude": "coordinates near nearby distance map",
+    "locations.latitude": "coordinates near nearby distance map",
+    "locations.address": "address street",
+    "locations.city": "city town",
+    "locations.zip_code": "zip code postal zipcode",
+    "locations.country": "country",
+    "locations.state": "state",
+    "locations.active": "active open closed operating",
+    "locations.created_at": "added created",
+    "tags": "tag attribute feature amenity category offer offering",
+    "tags.tag": "tag attribute feature amenity category",
+}
+
+# Columns kept whenever their table is, to identify rows and match values of the question against
+DEFAULT_COLUMNS: dict[str, tuple[str, ...]] = {
+    "businesses": ("name",),
+    "locations": ("address", "city", "zip_code"),
+    "tags": ("tag",),
+}
+
+# Tables holding the values questions refer to, e.g. business names and cities
+VALUE_TABLES: tuple[str, ...] = ("businesses", "locations")
+
+
+def _stem(word: str) -> str:
+    """Reduces plurals to their singular, so "businesses" and "business" match."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("es") and word[:-2].endswith(("s", "x", "ch", "sh")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _words(text: str) -> list[str]:
+    return _WORD.findall(text.lower().replace("'", ""))
+
+
+def _tokens(text: str) -> set[str]:
+    return {_stem(word) for word in _words(text) if word not in _STOPWORDS and _stem(word) not in _STOPWORDS}
+
+
+@dataclass(frozen=True)
+class SchemaSelection:
+    """Subset of the schema and tags relevant to a question, with the share of the question it accounts for."""
+
+    columns: dict[str, tuple[str, ...]]  # Tables to their selected columns
+    tags: list[str]
+    confidence: float
+    matched_columns: tuple[str, ...] = ()  # Columns the question's words matched, without the ones kept with them
+    values: tuple[str, ...] = ()  # Words of the values the question refers to, e.g. a business name
+
+
+class SchemaIndex:
+    def __init__(self, models: list[Type[DeclarativeBase]], descriptions: dict[str, str] = SCHEMA_DESCRIPTIONS) -> None:
+        """
+        Lexical index of the tables, columns and tags of the SQL generation prompt, selecting the ones relevant to a
+        question.
+
+        Tables and columns are indexed once on the words of their name and description, tags as they are first seen.
+        Words of the question are matched against them, after dropping stopwords and plurals. A question's selection
+        holds the tables and columns it matched, the columns identifying their rows, the keys joining them and the tags
+        it matched, or every tag if it asked about tags without matching one.
+
+        Args:
+            models: SQLAlchemy models of the tables
+            descriptions: Table names and table.column names to words describing them
+        """
+        self.models = models
+        self._table_tokens: dict[str, set[str]] = {}
+        self._column_tokens: dict[tuple[str, str], set[str]] = {}
+        self._keys: dict[str, tuple[str, ...]] = {}  # Tables to their primary and foreign key columns
+        self._neighbours: dict[str, set[str]] = {}  # Tables to the tables they join with
+        for model in models:
+            table = cast(Table, model.__table__)
+            self._table_tokens[table.name] = _tokens(f"{table.name} {descriptions.get(table.name, '')}")
+            self._keys[table.name] = tuple(
+                column.name for column in table.columns if column.primary_key or column.foreign_keys
+            )
+            self._neighbours.setdefault(table.name, set())
+            for column in table.columns:
+                for foreign_key in column.foreign_keys:
+                    target = foreign_key.column.table.name
+                    self._neighbours[table.name].add(target)
+                    self._neighbours.setdefault(target, set()).add(table.name)
+                if column.name in self._keys[table.name]:
+                    continue  # Kept with their table, "business" in "business_id" would select every table
+                description = descriptions.get(f"{table.name}.{column.name}", "")
+                self._column_tokens[(table.name, column.name)] = _tokens(
+                    f"{column.name.replace('_', ' ')} {description}"
+                )
+        self._table_words: set[str] = set().union(*self._table_tokens.values())
+        self._tag_tokens: dict[str, set[str]] = {}
+
+    def select(self, question: str, tags: list[str]) -> SchemaSelection:
+        """
+        Selects the tables, columns and tags relevant to the question.
+
+        The confidence of the selection is the share of the question's words matching the schema or tags, values (e.g.
+        "of Grizzly Peak") and numbers aside. Words matching nothing may refer to
+        tags or columns missing from the selection, which should then fall back to the full schema.
+
+        Args:
+            question: The user question
+            tags: Valid tags of the current data
+
+        Returns:
+            SchemaSelection: The selected tables and columns, tags and confidence of the selection
+        """
+        words = [
+            _stem(word)
+            for word in _words(question)
+            if (word not in _STOPWORDS and _stem(word) not in _STOPWORDS) or word in _VALUE_PREPOSITIONS
+        ]
+        question_tokens = set(words)
+        matched: set[str] = set()
+
+        columns: dict[str, set[str]] = {}  # Selected tables to their matched columns
+        for table, table_tokens in self._table_tokens.items():
+            if table_tokens & question_tokens:
+                matched |= table_tokens & question_tokens
+                columns.setdefault(table, set())
+        for (table, column), column_tokens in self._column_tokens.items():
+            if column_tokens & question_tokens:
+                matched |= column_tokens & question_tokens
+                columns.setdefault(table, set()).add(column)
+
+        selected_tags = []
+        for tag in tags:
+            tag_tokens = self._tag_tokens.get(tag)
+            if tag_tokens is None:
+                # Words naming a table, e.g. "business" in "business_accepts_credit_cards", don't select tags
+                tag_tokens = _tokens(f"{tag.replace('_', ' ')} {tag.replace('_', '')}") - self._table_words
+                self._tag_tokens[tag] = tag_tokens
+            if tag_tokens & question_tokens:
+                matched |= tag_tokens & question_tokens
+                selected_tags.append(tag)
+        if selected_tags:
+            columns.setdefault("tags", set())
+
+        # Unmatched words following a preposition are a value, e.g. "of Grizzly Peak" or "in Berkeley", matched
+        # against the identifying columns
+        value_words: dict[str, None] = {}  # Ordered set
+        for index, word in enumerate(words):
+            if word not in _VALUE_PREPOSITIONS:
+                continue
+            value = list(takewhile(lambda w: w not in matched and w not in _VALUE_PREPOSITIONS, words[index + 1 :]))
+            if value:
+                value_words.update(dict.fromkeys(value))
+                for table in VALUE_TABLES:
+                    if table in self._table_tokens:
+                        columns.setdefault(table, set())
+
+        content_words = [
+            word for word in words if word not in _VALUE_PREPOSITIONS and word not in value_words and not word.isdigit()
+        ]
+        confidence = sum(word in matched for word in content_words) / len(content_words) if content_words else 0.0
+
+        for table in self._join_path(set(columns)):
+            columns.setdefault(table, set())
+        if "tags" in columns and not selected_tags:
+            selected_tags = list(tags)  # Asked about tags without naming one
+
+        selected_columns: dict[str, tuple[str, ...]] = {}
+        for model in self.models:
+            table = model.__tablename__
+            if table in columns:
+                kept = columns[table] | set(self._keys[table]) | set(DEFAULT_COLUMNS.get(table, ()))
+                selected_columns[table] = tuple(
+                    column.name for column in model.__table__.columns if column.name in kept
+                )
+        matched_columns = tuple(dict.fromkeys(column for table_columns in columns.values() for column in table_columns))
+        return SchemaSelection(selected_columns, selected_tags, confidence, matched_columns, tuple(value_words))
+
+    def _join_path(self, tables: set[str]) -> set[str]:
+        """Returns the tables joining the given tables together, through the shortest foreign key paths."""
+        if len(tables) < 2:
+            return set()
+        connected = {min(tables)}
+        joining: set[str] = set()
+        for target in sorted(tables - connected):
+            previous: dict[str, str | None] = {target: None}
+            queue = deque([target])
+            while queue:
+                table = queue.popleft()
+                if table in connected:
+                    node: str | None = table
+                    while node is not None:  # Walk the path back to the target
+                        joining.add(node)
+                        connected.add(node)
+                        node = previous[node]
+                    break
+                for neighbour in self._neighbours.get(table, ()):
+                    if neighbour not in previous:
+                        previous[neighbour] = table
+                        queue.append(neighbour)
+        return joining - tables
@@ -0,0 +1,37 @@
+from typing import Any, Generic, TypeVar
+
+import orjson
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+T = TypeVar("T")
+
+
+def decode_json(data: bytes | str) -> Any:
+    """Decodes an untyped JSON payload, such as a Yelp API response body, with orjson."""
+    return orjson.loads(data)
+
+
+class JsonCodec(Generic[T]):
+    def __init__(self, type_: type[T]) -> None:
+        """
+        JSON encoder and decoder of a type, compiled once by pydantic-core at creation.
+
+        Encoding writes JSON bytes straight from the model, skipping the validation and `jsonable_encoder` round trip
+        FastAPI applies to returned models. Decoding parses and validates JSON bytes into typed models in a single pass.
+
+        Args:
+            type_: Type to encode and decode, e.g. a pydantic model
+        """
+        self.type_ = type_
+        self._adapter: TypeAdapter[T] = TypeAdapter(type_)
+
+    def encode(self, value: T) -> bytes:
+        return self._adapter.dump_json(value)
+
+    def decode(self, data: bytes | str) -> T:
+        return self._adapter.validate_json(data)
+
+    def response(self, value: T, status_code: int = 200) -> Response:
+        """Returns a response whose body is the encoded value, passed as is to the ASGI server."""
+        return Response(self.encode(value), status_code=status_code, media_type="application/json")
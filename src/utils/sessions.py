@@ -0,0 +1,192 @@
+import re
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Sequence
+
+from src.utils.pagination import Keyset, build_first_rows_query, resolve_order
+from src.utils.result_cache import CacheBackend, GenerationCache
+from src.utils.validate_sql import ProjectedColumn, canonicalize_sql
+
+# Words referring back to the results of the previous question
+_FOLLOW_UP = re.compile(
+    r"\b(those|these|them|they|their|theirs|its|which of|of which|same ones|that one|this one)\b", re.I
+)
+
+# Tables of the businesses results are about, to their column holding the business id
+ENTITY_COLUMNS: dict[str, str] = {"businesses": "id", "locations": "business_id", "tags": "business_id"}
+
+
+@dataclass(frozen=True)
+class SessionTurn:
+    """Last answered question of a session, with the query and results follow-ups are resolved against."""
+
+    question: str
+    sql: str
+    params: dict[str, Any]
+    projection: tuple[ProjectedColumn, ...]
+    rows: list[tuple[Any, ...]]
+    expires_at: float  # time.time() deadline, wall clock as sessions can be shared by worker processes
+    entity_ids: list[Any] | None = None  # Business ids of the results, resolved on first use
+    keyset: Keyset | None = None  # Paginated query of the results, the rows being its first page
+
+
+class SessionStore(GenerationCache):
+    def __init__(self, max_size: int, ttl: float, backend: CacheBackend | None = None) -> None:
+        """
+        Bounded store of the last turn of conversation sessions, keyed on the API key and the client's session id, so
+        that clients of different keys choosing the same session id never see each other's results.
+
+        Turns expire `ttl` seconds after they were stored, and are dropped with the data generation they were read
+        from, as business ids may change across generations.
+
+        Args:
+            max_size: Maximum number of sessions kept, the least recently used being evicted, 0 disables sessions
+            ttl: Seconds a session is kept after its last turn
+            backend: Storage of the sessions, defaults to an in-process LRU
+        """
+        super().__init__(max_size, backend)
+        self.ttl = ttl
+
+    def get(self, api_key: str, session_id: str, generation: int) -> SessionTurn | None:
+        """Returns the last turn of the session, or None if it doesn't exist, expired or is from an older generation."""
+        turn: SessionTurn | None = self._get(self._key(api_key, session_id), generation)
+        if turn is None or turn.expires_at < time.time():
+            return None
+        return turn
+
+    def set(
+        self,
+        api_key: str,
+        session_id: str,
+        generation: int,
+        question: str,
+        sql: str,
+        params: dict[str, Any],
+        projection: tuple[ProjectedColumn, ...],
+        rows: Sequence[tuple[Any, ...]],
+        entity_ids: list[Any] | None = None,
+        keyset: Keyset | None = None,
+    ) -> None:
+        """Stores the last turn of the session, replacing the previous one and extending the session's TTL."""
+        turn = SessionTurn(question, sql, params, projection, list(rows), time.time() + self.ttl, entity_ids, keyset)
+        self._set(self._key(api_key, session_id), generation, turn)
+
+    def set_entity_ids(
+        self, api_key: str, session_id: str, generation: int, turn: SessionTurn, entity_ids: list[Any]
+    ) -> None:
+        """Stores the resolved business ids of the session's last turn."""
+        self._set(self._key(api_key, session_id), generation, replace(turn, entity_ids=entity_ids))
+
+    @staticmethod
+    def _key(api_key: str, session_id: str) -> str:
+        return f"session\x00{api_key}\x00{session_id}"
+
+
+def is_follow_up(question: str) -> bool:
+    """Whether the question refers back to the results of the previous question, e.g. "what are their phones?"."""
+    return _FOLLOW_UP.search(question) is not None
+
+
+def project_turn(
+    turn: SessionTurn, columns: Sequence[str], keep: Sequence[str]
+) -> tuple[tuple[ProjectedColumn, ...], list[tuple[Any, ...]]] | None:
+    """
+    Projects the results of the previous turn onto the columns a follow-up asks about, without querying again.
+
+    Args:
+        turn: Last turn of the session
+        columns: Columns the follow-up asks about
+        keep: Columns identifying the results, e.g. the business name, kept if the previous turn selected them
+
+    Returns:
+        tuple[tuple[ProjectedColumn, ...], list[tuple[Any, ...]]] | None:
+        The projection and rows, or None if a column asked about isn't among the previous turn's plain columns
+    """
+    positions = {column.name: index for index, column in enumerate(turn.projection) if column.aggregate is None}
+    if not columns or any(column not in positions for column in columns):
+        return None
+    selected = [positions[column] for column in dict.fromkeys([*keep, *columns]) if column in positions]
+    return (
+        tuple(turn.projection[index] for index in selected),
+        [tuple(row[index] for index in selected) for row in turn.rows],
+    )
+
+
+def _entity_column(parsed: Any) -> Any | None:
+    """Returns the business id column of the outermost tables of a parsed query, businesses first."""
+    from sqlglot import expressions as exp
+
+    from_clause = next((node for node in parsed.find_all(exp.From) if node.parent is parsed), None)
+    tables = [] if from_clause is None else [from_clause.this]
+    tables += [join.this for join in parsed.args.get("joins") or []]
+    tables = [table for table in tables if isinstance(table, exp.Table) and table.name.lower() in ENTITY_COLUMNS]
+    if not tables:
+        return None
+    table = min(tables, key=lambda table: list(ENTITY_COLUMNS).index(table.name.lower()))
+    return exp.column(ENTITY_COLUMNS[table.name.lower()], table=table.alias_or_name)
+
+
+def build_entity_ids_query(turn: SessionTurn, dialect: str, max_ids: int) -> str | None:
+    """
+    Rewrites the validated query of a turn to select the ids of the businesses its results are about: the businesses
+    listed, or the businesses counted or aggregated over. For paginated results, only the businesses of the first page,
+    which is the turn's rows.
+
+    Args:
+        turn: Turn of a session
+        dialect: SQL dialect of the query
+        max_ids: Maximum number of ids selected by an aggregate query
+
+    Returns:
+        str | None: The ids query, taking the turn's bind parameters, or None for grouped queries and queries not over
+        businesses
+    """
+    import sqlglot  # Deferred to keep the app import fast
+    from sqlglot import expressions as exp
+
+    parsed = sqlglot.parse_one(turn.sql, dialect=dialect)
+    if not isinstance(parsed, exp.Select) or parsed.args.get("group") or parsed.args.get("distinct"):
+        return None
+    column = _entity_column(parsed)
+    if column is None:
+        return None
+    if turn.keyset is not None:
+        return build_first_rows_query(turn.keyset, column, len(turn.rows))
+
+    aggregate = all(expression.find(exp.AggFunc) for expression in parsed.expressions)
+    order = resolve_order(parsed)  # Resolved before the projection its aliases and positions refer to is replaced
+    ids_query = parsed.select(column, append=False)
+    ids_query.set("order", order)
+    if aggregate:  # All the businesses the aggregate is over, rather than its single row
+        ids_query.set("order", None)
+        ids_query = ids_query.distinct().limit(max_ids)
+    return ids_query.sql(dialect=dialect)
+
+
+def scope_to_entities(sql: str, entity_ids: list[Any], dialect: str) -> tuple[str, str] | None:
+    """
+    Restricts a validated query to the businesses of the previous turn.
+
+    Args:
+        sql: Validated query generated for a follow-up
+        entity_ids: Business ids of the previous turn's results
+        dialect: SQL dialect of the query
+
+    Returns:
+        tuple[str, str] | None: The scoped query and its canonical form, or None if the query isn't over businesses
+    """
+    import sqlglot
+    from sqlglot import expressions as exp
+
+    parsed = sqlglot.parse_one(sql, dialect=dialect)
+    if not isinstance(parsed, exp.Select):
+        return None
+    column = _entity_column(parsed)
+    if column is None:
+        return None
+    if entity_ids:
+        condition = column.isin(*(exp.convert(entity_id) for entity_id in entity_ids))
+    else:
+        condition = exp.EQ(this=exp.Literal.number(1), expression=exp.Literal.number(0))
+    scoped = parsed.where(condition)
+    return scoped.sql(dialect=dialect, pretty=True), canonicalize_sql(scoped, dialect)
@@ -0,0 +1,179 @@
+import os
+import pickle
+import queue
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+# Tmpfs is memory backed, so the cache file never touches disk where available
+SHARED_MEMORY_DIR = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+
+# Entries above the size limit are only pruned every few writes to keep writes cheap
+_PRUNE_INTERVAL = 64
+
+# Seconds a read waits for a lock held by another process, reads run on the event loop. Readers don't wait on writers in
+# WAL mode, so the wait only happens while the file is being opened or checkpointed
+_READ_TIMEOUT = 0.05
+# Seconds a write waits for the write lock held by another process, writes run on the writer thread
+_WRITE_TIMEOUT = 1.0
+
+_writers: dict[tuple[Path, int], "_Writer"] = {}
+_writers_lock = threading.Lock()
+
+
+def default_shared_cache_path(server_pid: int) -> Path:
+    """Returns the path of the shared cache file of a server, unique per server so cached values never outlive it."""
+    return SHARED_MEMORY_DIR / f"faq-bot-cache-{server_pid}.sqlite"
+
+
+def remove_shared_cache(path: str | Path) -> None:
+    """Removes a shared cache file along with its WAL files."""
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def _connect(path: Path, timeout: float) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")  # Entries can be recomputed, durability isn't needed
+    connection.execute("PRAGMA mmap_size=268435456")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS cache_entries ("
+        "namespace TEXT NOT NULL, key TEXT NOT NULL, generation INTEGER NOT NULL, value BLOB NOT NULL, "
+        "PRIMARY KEY (namespace, key))"
+    )
+    return connection
+
+
+class _Writer:
+    def __init__(self, path: Path) -> None:
+        """
+        Thread applying the writes of every namespace of a shared cache file in the current process, in order, so that
+        waiting on the write lock of another process never blocks the event loop.
+        """
+        self.path = path
+        self._queue: queue.SimpleQueue[Callable[[sqlite3.Connection], object]] = queue.SimpleQueue()
+        threading.Thread(target=self._run, name="shared-cache-writer", daemon=True).start()
+
+    @classmethod
+    def of(cls, path: Path) -> "_Writer":
+        """Returns the writer of the file in the current process, started after a fork as threads don't survive it."""
+        with _writers_lock:
+            writer = _writers.get((path, os.getpid()))
+            if writer is None:
+                writer = _writers[(path, os.getpid())] = cls(path)
+            return writer
+
+    def submit(self, write: Callable[[sqlite3.Connection], object]) -> None:
+        self._queue.put(write)
+
+    def _run(self) -> None:
+        connection: sqlite3.Connection | None = None
+        while True:
+            write = self._queue.get()
+            try:
+                if connection is None:
+                    connection = _connect(self.path, _WRITE_TIMEOUT)
+                write(connection)
+            except sqlite3.Error:
+                continue  # Dropped like a cache miss, e.g. if another process held the write lock for too long
+
+
+class SharedCacheBackend:
+    def __init__(self, path: str | Path, namespace: str, max_size: int) -> None:
+        """
+        Cache storage shared by every worker process on the host, kept in a memory mapped SQLite file (in /dev/shm where
+        available). A value cached by one worker is a cache hit in every other worker.
+
+        Values are pickled, so only trusted local processes should be able to write to the file. Connections are opened
+        lazily per process, so the backend can be created before the server forks its workers. Reads run on the calling
+        thread and wait at most 50 ms for a lock, while writes are queued to a writer thread per process so that
+        contention between workers never blocks the event loop. A value is thus visible to other workers shortly after
+        it was set rather than right away. Cache errors, e.g. a database locked by another worker for too long, are
+        treated as cache misses.
+
+        Args:
+            path: Path to the shared cache file, created if missing
+            namespace: Namespace of the entries, so multiple caches can share a file
+            max_size: Maximum number of entries kept in the namespace, the oldest writes are evicted first
+        """
+        self.path = Path(path)
+        self.namespace = namespace
+        self.max_size = max_size
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._writes = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connection of the current process, reopened after a fork as SQLite connections aren't shared by processes."""
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = _connect(self.path, _READ_TIMEOUT)
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str) -> Any | None:
+        try:
+            row = self.connection.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return pickle.loads(row[0]) if row is not None else None
+
+    def set(self, key: str, value: Any, generation: int) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)  # Pickled now, the value may change after
+        self._writes += 1
+        prune = self._writes % _PRUNE_INTERVAL == 0
+
+        def _write(connection: sqlite3.Connection) -> None:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                self._replace(connection, key, generation, data)
+            if prune:
+                self._prune(connection)
+
+        _Writer.of(self.path).submit(_write)
+
+    def add(self, key: str, amount: int, generation: int) -> None:
+        self._writes += 1
+        prune = self._writes % _PRUNE_INTERVAL == 0
+
+        def _write(connection: sqlite3.Connection) -> None:
+            # Read and written under the write lock, so concurrent additions of every worker add up
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute(
+                    "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+                ).fetchone()
+                total = (pickle.loads(row[0]) if row is not None else 0) + amount
+                self._replace(connection, key, generation, pickle.dumps(total, protocol=pickle.HIGHEST_PROTOCOL))
+            if prune:
+                self._prune(connection)
+
+        _Writer.of(self.path).submit(_write)
+
+    def drop_older_generations(self, generation: int) -> None:
+        _Writer.of(self.path).submit(
+            lambda connection: connection.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND generation < ?", (self.namespace, generation)
+            )
+        )
+
+    def _replace(self, connection: sqlite3.Connection, key: str, generation: int, data: bytes) -> None:
+        # Delete and insert rather than upsert, so the rowid reflects the write order used for eviction
+        connection.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+        connection.execute(
+            "INSERT INTO cache_entries (namespace, key, generation, value) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, generation, data),
+        )
+
+    def _prune(self, connection: sqlite3.Connection) -> None:
+        """Evicts the oldest writes above the size limit of the namespace."""
+        connection.execute(
+            "DELETE FROM cache_entries WHERE rowid IN ("
+            "SELECT rowid FROM cache_entries WHERE namespace = ? ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.max_size),
+        )
@@ -0,0 +1,130 @@
+import fcntl
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Iterator
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Published, immutable version of the database."""
+
+    generation: int
+    path: Path
+
+
+class SnapshotStore:
+    def __init__(self, data_dir: Path, name: str, retention: int = 3) -> None:
+        """
+        Versioned database files, each built offline and published atomically.
+
+        A snapshot is built in a new file under `snapshots/`, then published by atomically replacing the `<name>.current`
+        pointer file with one naming the new file. Readers follow the pointer, so they only ever see complete
+        snapshots, and a published snapshot is never written to again. Before the first snapshot is published, readers
+        fall back to the legacy `<name>.db` file.
+
+        Args:
+            data_dir: Directory holding the pointer file, the snapshots and the legacy database file
+            name: Name of the database, e.g. businesses
+            retention: Number of published snapshots kept on disk, older snapshots are deleted on publish
+        """
+        self.data_dir = data_dir
+        self.name = name
+        self.retention = retention
+        self.pointer_path = data_dir / f"{name}.current"
+        self.snapshot_dir = data_dir / "snapshots"
+        self.legacy_path = data_dir / f"{name}.db"
+        self._lock_path = data_dir / f".{name}.lock"
+
+    def pointer_signature(self) -> tuple[int, int] | None:
+        """Returns a cheap signature of the pointer file that changes on every publish, None if nothing is published."""
+        try:
+            stat = self.pointer_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def current(self) -> Snapshot | None:
+        """Returns the published snapshot, None if nothing was published yet."""
+        try:
+            pointer = json.loads(self.pointer_path.read_text())
+        except FileNotFoundError:
+            return None
+        return Snapshot(pointer["generation"], self.data_dir / pointer["path"])
+
+    def current_path(self) -> Path:
+        """Returns the path of the published snapshot, or of the legacy database file if nothing was published yet."""
+        snapshot = self.current()
+        return snapshot.path if snapshot is not None else self.legacy_path
+
+    @contextmanager
+    def build(self, copy_current: bool = False) -> Iterator[Path]:
+        """
+        Builds a new snapshot, publishing it if the block completes without raising. Builds are serialized across
+        processes with a file lock, readers are never blocked.
+
+        Args:
+            copy_current: Whether the new snapshot starts as a copy of the current one, instead of an empty file
+
+        Yields:
+            Path: Path of the new database file to write to
+        """
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        with open(self._lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            generation = self._current_generation() + 1
+            path = self.snapshot_dir / f"{self.name}-{generation:06d}.db"
+            path.unlink(missing_ok=True)  # Left over by a failed build
+            if copy_current and self.current_path().exists():
+                with sqlite3.connect(self.current_path()) as source, sqlite3.connect(path) as target:
+                    source.backup(target)
+                source.close()
+                target.close()
+            try:
+                yield path
+                self._publish(Snapshot(generation, path))
+            except BaseException:
+                path.unlink(missing_ok=True)
+                raise
+
+    def _current_generation(self) -> int:
+        snapshot = self.current()
+        if snapshot is not None:
+            return snapshot.generation
+        if not self.legacy_path.exists():
+            return 0
+        with sqlite3.connect(self.legacy_path) as connection:
+            generation = connection.execute("PRAGMA user_version").fetchone()[0]
+        connection.close()
+        return generation
+
+    def _publish(self, snapshot: Snapshot) -> None:
+        """Stamps the snapshot with its generation, flushes it to disk and atomically points readers to it."""
+        with sqlite3.connect(snapshot.path) as connection:
+            connection.execute(f"PRAGMA user_version = {snapshot.generation}")
+        connection.close()
+        with open(snapshot.path, "rb") as f:
+            os.fsync(f.fileno())
+
+        pointer = {
+            "generation": snapshot.generation,
+            "path": str(snapshot.path.relative_to(self.data_dir)),
+            "published_at": datetime.now(UTC).isoformat(),
+        }
+        tmp_path = self.pointer_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(pointer, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.pointer_path)
+        self._prune(snapshot)
+
+    def _prune(self, current: Snapshot) -> None:
+        """Deletes old snapshots beyond the retention. Readers still holding them open keep reading until they close."""
+        snapshots = sorted(path for path in self.snapshot_dir.glob(f"{self.name}-*.db") if path != current.path)
+        for path in snapshots[: max(0, len(snapshots) - (self.retention - 1))]:
+            path.unlink(missing_ok=True)
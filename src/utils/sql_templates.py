@@ -0,0 +1,199 @@
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import cast
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.utils.validate_sql import ProjectedColumn, SQLValidationResult, canonicalize_sql
+
+_IDENTIFIER = re.compile(r"^\w+$")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+# Shorter literals, e.g. 'a', would match inside words of the question rather than name an entity
+_MIN_ENTITY_LENGTH = 3
+
+
+@dataclass(frozen=True)
+class EntitySlot:
+    """An entity literal of a validated query, extracted into a bind parameter."""
+
+    param: str
+    table: str
+    column: str
+
+
+@dataclass(frozen=True)
+class SQLTemplate:
+    """A validated query with its entity literals replaced by bind parameters, and the question pattern it answers."""
+
+    question_pattern: re.Pattern[str]
+    query: str
+    canonical_query: str
+    slots: tuple[EntitySlot, ...]
+    projection: tuple[ProjectedColumn, ...]
+    limit_applied: bool = False  # Whether validation added or lowered the query's LIMIT
+    original_limit: int | None = None  # The query's own LIMIT when lowered by validation
+
+
+class SQLTemplateCache:
+    def __init__(self, max_size: int = 256) -> None:
+        """
+        LRU cache of SQL templates keyed on their question pattern.
+
+        Args:
+            max_size: Maximum number of templates kept, 0 disables the cache
+        """
+        self.max_size = max_size
+        self._templates: OrderedDict[str, SQLTemplate] = OrderedDict()
+
+    def add(self, template: SQLTemplate) -> None:
+        """Adds a template to the cache, evicting the least recently used template if full."""
+        if self.max_size <= 0:
+            return
+        self._templates[template.question_pattern.pattern] = template
+        self._templates.move_to_end(template.question_pattern.pattern)
+        if len(self._templates) > self.max_size:
+            self._templates.popitem(last=False)
+
+    def match(self, question: str) -> tuple[SQLTemplate, dict[str, str]] | None:
+        """
+        Finds a cached template whose question pattern matches the question.
+
+        Args:
+            question: The user question
+
+        Returns:
+            tuple[SQLTemplate, dict[str, str]] | None:
+            The matching template and the entity values captured from the question keyed on bind parameter name,
+            or None if no template matches.
+        """
+        normalized_question = _normalize_question(question)
+        for key in reversed(self._templates):
+            template = self._templates[key]
+            match = template.question_pattern.fullmatch(normalized_question)
+            if match:
+                self._templates.move_to_end(key)
+                return template, match.groupdict()
+        return None
+
+
+def build_sql_template(question: str, validation_result: SQLValidationResult, dialect: str) -> SQLTemplate | None:
+    """
+    Builds a reusable template from a validated query by extracting the string literals that were taken from the
+    question into bind parameters.
+
+    Only literals compared for equality against a column are extracted, as the entity has to be resolvable against the
+    database when the template is reused. Literals that don't appear in the question (e.g. tags) are kept as is.
+
+    Args:
+        question: The user question the query was generated for
+        validation_result: Result of validating the generated query
+        dialect: SQL dialect of the query
+
+    Returns:
+        SQLTemplate | None: The template, or None if the query has no entity taken from the question
+    """
+    if not validation_result.is_valid or validation_result.validated_query is None:
+        return None
+
+    import sqlglot  # Deferred to keep the app import fast
+    from sqlglot import expressions as exp
+
+    normalized_question = _normalize_question(question)
+    parsed = cast(exp.Expression, sqlglot.parse_one(validation_result.validated_query, dialect=dialect))
+    tables = {table.alias_or_name.lower(): table.name for table in parsed.find_all(exp.Table)}
+
+    slots: dict[str, EntitySlot] = {}  # Keyed on lowered literal value
+    spans: list[tuple[int, int, str]] = []
+    for literal in list(parsed.find_all(exp.Literal)):
+        if not literal.is_string or len(literal.this.strip()) < _MIN_ENTITY_LENGTH:
+            continue
+        value: str = literal.this
+        # Whole words only, so that a literal doesn't match inside a longer word of the question
+        found = re.search(rf"(?<!\w){re.escape(value)}(?!\w)", normalized_question, re.IGNORECASE)
+        if found is None:
+            continue  # Constant not taken from the question
+        start = found.start()
+
+        comparison = literal.parent
+        if not isinstance(comparison, exp.EQ):
+            return None
+        column = comparison.left if comparison.right is literal else comparison.right
+        if not isinstance(column, exp.Column):
+            return None
+        if column.table:
+            table = tables.get(column.table.lower())
+        elif len(set(tables.values())) == 1:
+            table = next(iter(tables.values()))
+        else:
+            return None  # Ambiguous unqualified column
+        if table is None or not _IDENTIFIER.match(table) or not _IDENTIFIER.match(column.name):
+            return None
+
+        slot = slots.get(value.lower())
+        if slot is None:
+            slot = EntitySlot(f"p{len(slots)}", table, column.name)
+            slots[value.lower()] = slot
+            spans.append((start, start + len(value), slot.param))
+        literal.replace(exp.Placeholder(this=slot.param))
+
+    if not slots:
+        return None
+
+    # Build the question pattern, replacing each entity with a named group
+    spans.sort()
+    pattern_parts: list[str] = []
+    position = 0
+    for start, end, param in spans:
+        if start < position:
+            return None  # Overlapping entities
+        pattern_parts.append(re.escape(normalized_question[position:start]))
+        pattern_parts.append(f"(?P<{param}>.+?)")
+        position = end
+    pattern_parts.append(re.escape(normalized_question[position:]))
+
+    return SQLTemplate(
+        question_pattern=re.compile("".join(pattern_parts), re.IGNORECASE),
+        query=parsed.sql(dialect=dialect, pretty=True),
+        canonical_query=canonicalize_sql(parsed, dialect),
+        slots=tuple(slots.values()),
+        projection=validation_result.projection,
+        limit_applied=validation_result.limit_applied,
+        original_limit=validation_result.original_limit,
+    )
+
+
+async def resolve_entities(
+    session: AsyncSession, template: SQLTemplate, values: dict[str, str]
+) -> dict[str, str] | None:
+    """
+    Resolves the entity values captured from a question against the database.
+
+    Args:
+        session: Database session
+        template: The matched template
+        values: Entity values captured from the question keyed on bind parameter name
+
+    Returns:
+        dict[str, str] | None:
+        Bind parameters with the entity values as stored in the database, or None if any entity doesn't exist.
+    """
+    params: dict[str, str] = {}
+    for slot in template.slots:
+        result = await session.execute(
+            text(f'SELECT "{slot.column}" FROM "{slot.table}" WHERE lower("{slot.column}") = lower(:value) LIMIT 1'),
+            {"value": values[slot.param].strip()},
+        )
+        resolved = result.scalar()
+        if resolved is None:
+            return None
+        params[slot.param] = resolved
+    return params
+
+
+def _normalize_question(question: str) -> str:
+    """Collapses whitespace and strips trailing punctuation so trivially different questions share a pattern."""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", question.strip()))
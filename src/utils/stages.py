@@ -0,0 +1,51 @@
+import time
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Iterator
+
+_stage_timings: ContextVar[dict[str, float] | None] = ContextVar("stage_timings", default=None)
+_NOT_TIMED: AbstractContextManager[None] = nullcontext()
+
+
+def stage(name: str) -> AbstractContextManager[None]:
+    """
+    Times a stage of the current request if its stages are timed, e.g. as it's profiled or traced, else does nothing.
+
+    Args:
+        name: Name of the stage, time spent in stages of the same name adds up
+    """
+    timings = _stage_timings.get()
+    if timings is None:
+        return _NOT_TIMED
+    return _timed(timings, name)
+
+
+@contextmanager
+def _timed(timings: dict[str, float], name: str) -> Iterator[None]:
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start_time
+
+
+@contextmanager
+def timing_stages() -> Iterator[dict[str, float]]:
+    """
+    Times the stages of the current request until exiting, yielding the seconds spent per stage. Nested calls, e.g.
+    when a request is both profiled and traced, share the timings of the outermost one.
+    """
+    timings = _stage_timings.get()
+    if timings is not None:
+        yield timings
+        return
+    timings = {}
+    token = _stage_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _stage_timings.reset(token)
+
+
+def stage_timings_ms(timings: dict[str, float]) -> dict[str, float]:
+    return {name: round(seconds * 1000, 3) for name, seconds in timings.items()}
@@ -1,14 +1,33 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from logging import Logger
-from typing import Any, Callable, TypeVar
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, TypeVar, cast
 
 from fastapi import Request
-from google.genai import Client as GoogleClient
-from httpx import AsyncClient, Limits
 
+from src.models.database.sqlite import Business, Location, Tag
 from src.settings import settings
+from src.utils.admission import AdmissionController
 from src.utils.database import db
+from src.utils.executors import StageExecutors
+from src.utils.jobs import JobManager
+from src.utils.loop_monitor import LoopMonitor
+from src.utils.metrics import Metrics
+from src.utils.model_router import ModelRouter
+from src.utils.pagination import CursorStore
+from src.utils.profiling import ProfileStore
+from src.utils.prompt_cache import PromptPrefixCache
+from src.utils.result_cache import AnswerCache, CacheBackend, ResultCache
+from src.utils.schema_pruning import SchemaIndex
+from src.utils.sessions import SessionStore
+from src.utils.shared_cache import SharedCacheBackend
+from src.utils.sql_templates import SQLTemplateCache
+from src.utils.tag_vocabulary import TagVocabulary
+from src.utils.tracing import TraceRecorder
+from src.utils.usage import SPEND_CACHE_SIZE, UsageAccounting
+
+if TYPE_CHECKING:
+    from google.genai import Client as GoogleClient
 
 T = TypeVar("T")
 
@@ -21,9 +40,41 @@ class State:
         # Settings
         self.settings = settings  # singleton
 
-        # Clients
-        self.google_client = GoogleClient(api_key=settings.google_ai_api_key)
-        self.yelp_client = AsyncClient(
+        # Metrics
+        self.metrics = Metrics()
+        self.loop_monitor = LoopMonitor(
+            settings.loop_monitor_interval_ms / 1000, settings.loop_stall_threshold_ms / 1000, self.metrics, logger
+        )
+
+        # Request profiles and traces
+        self.profiles = ProfileStore(Path(settings.profiling_dir), settings.profiling_retention)
+        self.traces = TraceRecorder(Path(settings.trace_path)) if settings.trace_path else None
+
+        # Admission control
+        self.admission = AdmissionController(
+            settings.admission_max_in_flight,
+            settings.admission_max_queue,
+            settings.admission_initial_service_time,
+            self.metrics,
+        )
+
+        # Model routing
+        self.model_router = ModelRouter(settings, self.metrics)
+        self.prompt_cache = PromptPrefixCache(settings.llm_prefix_cache_ttl, self.metrics, logger)
+        self.sql_candidate_slots = asyncio.Semaphore(settings.sql_candidate_max_in_flight)
+        self.usage = UsageAccounting(
+            settings.api_key_configs,
+            settings.llm_prices,
+            settings.token_budget_soft_share,
+            self.metrics,
+            self._cache_backend("usage", SPEND_CACHE_SIZE),
+        )
+
+        # Clients, imported here rather than at module level to keep the app import fast
+        from httpx import AsyncClient, Limits
+
+        self._google_client: GoogleClient | None = None
+        self.yelp_client: AsyncClient = AsyncClient(
             limits=Limits(
                 max_connections=10,
                 max_keepalive_connections=1,
@@ -37,15 +88,52 @@ class State:
 
         # Database
         self.db = db  # singleton
+        self.tag_vocabulary = TagVocabulary(db)
+        self.schema_index = SchemaIndex([Business, Location, Tag])
 
-        # Thread pool
-        self._thread_pool: ThreadPoolExecutor | None = None
+        # Background jobs
+        self.jobs = JobManager(settings, self.metrics, logger, db.snapshots)
+
+        # Caches
+        self.sql_template_cache = SQLTemplateCache(settings.sql_template_cache_size)
+        self.result_cache = ResultCache(
+            settings.result_cache_size, self._cache_backend("results", settings.result_cache_size)
+        )
+        self.answer_cache = AnswerCache(
+            settings.answer_cache_size, self._cache_backend("answers", settings.answer_cache_size)
+        )
+        self.sessions = SessionStore(
+            settings.session_store_size,
+            settings.session_ttl,
+            self._cache_backend("sessions", settings.session_store_size),
+        )
+        self.cursors = CursorStore(
+            settings.cursor_store_size,
+            settings.cursor_ttl,
+            self._cache_backend("cursors", settings.cursor_store_size),
+        )
+
+        # Executors of CPU-bound stages, including the thread pool
+        self.executors = StageExecutors(settings, self.metrics)
+
+    def _cache_backend(self, namespace: str, max_size: int) -> CacheBackend | None:
+        """Returns the cache backend shared by every worker process if SHARED_CACHE_PATH is set, else None."""
+        if self.settings.shared_cache_path is None:
+            return None
+        return SharedCacheBackend(self.settings.shared_cache_path, namespace, max_size)
 
     @property
-    def thread_pool(self) -> ThreadPoolExecutor:
-        if self._thread_pool is None:
-            self._thread_pool = ThreadPoolExecutor(max_workers=self.settings.thread_pool_size)
-        return self._thread_pool
+    def google_client(self) -> "GoogleClient":
+        """Google GenAI client, created on first use as importing google-genai is slow."""
+        if self._google_client is None and self.settings.llm_offline:
+            from src.utils.llm_stub import OfflineGoogleClient
+
+            self._google_client = cast("GoogleClient", OfflineGoogleClient())
+        elif self._google_client is None:
+            from google.genai import Client as GoogleClient
+
+            self._google_client = GoogleClient(api_key=self.settings.google_ai_api_key)
+        return self._google_client
 
     async def run_in_thread_pool(self, func: Callable[..., T], *args: Any) -> T:
         """
@@ -59,13 +147,12 @@ class State:
             The function's result
         """
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.thread_pool, func, *args)
+        return await loop.run_in_executor(self.executors.thread_pool, func, *args)
 
     def shutdown(self) -> None:
-        """Safely shutdown the thread pool if it exists."""
-        if self._thread_pool is not None:
-            self._thread_pool.shutdown(wait=True, cancel_futures=True)
-            self._thread_pool = None
+        """Cancels running jobs and safely shutdown the thread and process pools if they exist."""
+        self.jobs.shutdown()
+        self.executors.shutdown()
 
 
 def get_state(req: Request) -> State:
@@ -0,0 +1,262 @@
+import random
+import sqlite3
+from logging import Logger
+from pathlib import Path
+from typing import Iterator, TypeVar
+
+from sqlalchemy import create_engine
+
+from src.models.app.business_data import BusinessTags
+from src.models.database.sqlite import Base
+
+T = TypeVar("T")
+
+# Cities of the demo dataset with their zip codes and approximate center (latitude, longitude)
+CITIES: dict[str, tuple[list[str], tuple[float, float]]] = {
+    "San Francisco": (
+        [f"941{n:02d}" for n in (2, 3, 4, 5, 7, 8, 9, 10, 11, 12, 14, 15, 16, 17, 18, 21, 22, 23, 24, 33)],
+        (37.7749, -122.4194),
+    ),
+    "Oakland": ([f"946{n:02d}" for n in (1, 2, 3, 5, 6, 7, 8, 9, 10, 11, 12, 18, 19)], (37.8044, -122.2712)),
+    "Berkeley": ([f"947{n:02d}" for n in (2, 3, 4, 5, 7, 8, 9, 10)], (37.8715, -122.2730)),
+    "Alameda": (["94501", "94502"], (37.7652, -122.2416)),
+    "Mountain View": (["94040", "94041", "94043"], (37.3861, -122.0839)),
+    "Palo Alto": (["94301", "94303", "94304", "94306"], (37.4419, -122.1430)),
+    "Redwood City": (["94061", "94062", "94063", "94065"], (37.4852, -122.2364)),
+    "San Jose": (
+        [f"951{n:02d}" for n in (10, 12, 13, 16, 17, 18, 20, 22, 25, 26, 28, 29, 31, 36)],
+        (37.3382, -121.8863),
+    ),
+    "Walnut Creek": (["94595", "94596", "94597", "94598"], (37.9101, -122.0652)),
+    "San Leandro": (["94577", "94578", "94579"], (37.7249, -122.1561)),
+}
+
+# Share of businesses carrying each tag, in line with the Yelp data of the demo dataset
+TAG_RATES: dict[str, float] = {
+    "business_accepts_credit_cards": 0.55,
+    "bike_parking": 0.32,
+    "business_parking_street": 0.30,
+    "wi_fi": 0.22,
+    "business_accepts_apple_pay": 0.18,
+    "business_parking_lot": 0.14,
+    "good_for_kids": 0.14,
+    "alcohol": 0.11,
+    "ambience_casual": 0.10,
+    "restaurants_take_out": 0.10,
+    "business_accepts_android_pay": 0.08,
+    "dogs_allowed": 0.07,
+    "restaurants_good_for_groups": 0.07,
+    "ambience_classy": 0.05,
+    "caters": 0.05,
+    "has_tv": 0.05,
+    "outdoor_seating": 0.05,
+    "restaurants_delivery": 0.05,
+    "happy_hour": 0.04,
+}
+DEFAULT_TAG_RATE = 0.02
+
+NAME_WORDS: list[str] = [
+    "Golden",
+    "Bay",
+    "Sunset",
+    "Mission",
+    "Lucky",
+    "Green",
+    "Blue",
+    "Pacific",
+    "Harbor",
+    "Oak",
+    "Fog",
+    "Hill",
+    "Union",
+    "Market",
+    "Corner",
+    "Little",
+    "Grand",
+    "Old Town",
+    "Lakeside",
+    "Bridge",
+    "Redwood",
+    "Cable Car",
+    "Marina",
+    "Summit",
+]
+CATEGORIES: list[str] = [
+    "Bakery",
+    "Cafe",
+    "Coffee",
+    "Pizza",
+    "Taqueria",
+    "Sushi",
+    "Ramen",
+    "Bistro",
+    "Deli",
+    "Bar",
+    "Brewery",
+    "Diner",
+    "Auto Repair",
+    "Salon",
+    "Barbershop",
+    "Dental",
+    "Yoga",
+    "Fitness",
+    "Books",
+    "Florist",
+    "Cleaners",
+    "Hardware",
+]
+CHAINS: list[str] = [
+    "Peet's Coffee",
+    "Starbucks",
+    "Philz Coffee",
+    "Blue Bottle Coffee",
+    "Chipotle",
+    "Safeway",
+    "Walgreens",
+]
+STREETS: list[str] = [
+    "Main St",
+    "Broadway",
+    "Market St",
+    "College Ave",
+    "Telegraph Ave",
+    "Mission St",
+    "El Camino Real",
+]
+
+
+def _zipf_weights(count: int, exponent: float) -> list[float]:
+    return [1 / rank**exponent for rank in range(1, count + 1)]
+
+
+def _batched(items: Iterator[T], size: int) -> Iterator[list[T]]:
+    batch: list[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class SyntheticBusinessGenerator:
+    def __init__(self, seed: int = 0, zip_skew: float = 1.1, chain_share: float = 0.08) -> None:
+        """
+        Generates realistic business, location and tag rows.
+
+        Zip codes follow a Zipf distribution, so a few zips hold most businesses. A share of businesses belong to
+        chains and share their name. Each business gets tags at the rates of the demo dataset, scaled by a per business
+        richness factor so that, like on Yelp, some businesses carry many tags and most carry few.
+
+        Args:
+            seed: Seed of the random generator, the same seed generates the same data
+            zip_skew: Exponent of the Zipf distribution of zip codes
+            chain_share: Share of businesses belonging to a chain
+        """
+        self.random = random.Random(seed)
+        self.chain_share = chain_share
+        self.zips: list[tuple[str, str]] = [(zip_code, city) for city, (zips, _) in CITIES.items() for zip_code in zips]
+        self.random.shuffle(self.zips)
+        self.zip_weights = _zipf_weights(len(self.zips), zip_skew)
+        self.chain_weights = _zipf_weights(len(CHAINS), 1.0)
+        self.tags: list[tuple[str, float]] = [
+            (tag, TAG_RATES.get(tag, DEFAULT_TAG_RATE)) for tag in BusinessTags.model_fields
+        ]
+
+    def _name(self) -> str:
+        if self.random.random() < self.chain_share:
+            return self.random.choices(CHAINS, self.chain_weights)[0]
+        return f"{self.random.choice(NAME_WORDS)} {self.random.choice(NAME_WORDS)} {self.random.choice(CATEGORIES)}"
+
+    def rows(self, business_id: int) -> tuple[tuple, tuple, list[tuple]]:
+        """
+        Generates the rows of a single business.
+
+        Returns:
+            tuple[tuple, tuple, list[tuple]]: The business row, its location row and its tag rows
+        """
+        name = self._name()
+        slug = name.lower().replace(" ", "-").replace("'", "")
+        rating = min(5.0, max(1.0, round(self.random.gauss(4.0, 0.5) * 2) / 2))
+        phone = f"+1510{self.random.randrange(10**7):07d}" if self.random.random() < 0.85 else None
+        business = (
+            business_id,
+            name,
+            f"https://www.yelp.com/biz/{slug}-{business_id}",
+            "synthetic",
+            f"syn{business_id:010d}",
+            f"https://www.yelp.com/biz/{slug}-{business_id}",
+            rating,
+            phone,
+        )
+
+        zip_code, city = self.random.choices(self.zips, self.zip_weights)[0]
+        latitude, longitude = CITIES[city][1]
+        address = f"{self.random.randint(1, 9999)} {self.random.choice(STREETS)} {city}, CA {zip_code}"
+        location = (
+            business_id,
+            business_id,
+            longitude + self.random.uniform(-0.05, 0.05),
+            latitude + self.random.uniform(-0.05, 0.05),
+            address,
+            city,
+            zip_code,
+            "US",
+            "CA",
+            self.random.random() > 0.05,
+        )
+
+        richness = self.random.betavariate(2, 3) * 2
+        tags = [(business_id, tag) for tag, rate in self.tags if self.random.random() < rate * richness]
+        return business, location, tags
+
+
+def generate_dataset(
+    path: Path, businesses: int, seed: int = 0, batch_size: int = 10_000, logger: Logger | None = None
+) -> None:
+    """
+    Generates a database of synthetic businesses with the app's schema and indexes.
+
+    Rows are bulk inserted in batches with the stdlib sqlite3 driver, with journaling and syncing disabled, as the file
+    is only used once fully written.
+
+    Args:
+        path: Path of the database file to create, must not exist
+        businesses: Number of businesses to generate
+        seed: Seed of the random generator
+        batch_size: Number of businesses inserted per batch
+        logger: Logger to report progress to
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    generator = SyntheticBusinessGenerator(seed)
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA journal_mode=OFF")
+        connection.execute("PRAGMA synchronous=OFF")
+        inserted = 0
+        for batch in _batched((generator.rows(business_id) for business_id in range(1, businesses + 1)), batch_size):
+            with connection:
+                connection.executemany(
+                    "INSERT INTO businesses (id, name, url, source, source_id, source_url, source_rating, phone) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [business for business, _, _ in batch],
+                )
+                connection.executemany(
+                    "INSERT INTO locations "
+                    "(id, business_id, longitude, latitude, address, city, zip_code, country, state, active) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [location for _, location, _ in batch],
+                )
+                connection.executemany(
+                    "INSERT INTO tags (business_id, tag) VALUES (?, ?)", [tag for _, _, tags in batch for tag in tags]
+                )
+            inserted += len(batch)
+            if logger is not None and inserted % (batch_size * 10) == 0:
+                logger.info(f"Generated {inserted} out of {businesses} businesses")
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
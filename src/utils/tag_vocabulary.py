@@ -0,0 +1,32 @@
+import asyncio
+
+from sqlalchemy import text
+
+from src.utils.database import DatabaseUtilities
+
+
+class TagVocabulary:
+    def __init__(self, db: DatabaseUtilities) -> None:
+        """
+        Distinct tags of the database, listed as the valid tags of the SQL generation prompt. Fetched once per data
+        generation, so tags added by the ETL are picked up as soon as their snapshot is published.
+
+        Args:
+            db: Database to read the tags from
+        """
+        self.db = db
+        self._tags: tuple[int, list[str]] | None = None  # (generation, tags)
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> list[str]:
+        """Returns the sorted distinct tags of the current data generation."""
+        generation = await self.db.get_generation()
+        if self._tags is not None and self._tags[0] == generation:
+            return self._tags[1]
+
+        async with self._lock:
+            if self._tags is None or self._tags[0] != generation:
+                async with self.db.create_session() as session:
+                    result = await session.execute(text("SELECT DISTINCT tag FROM tags ORDER BY tag"))
+                    self._tags = (generation, [row[0] for row in result])
+            return self._tags[1]
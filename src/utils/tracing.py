@@ -0,0 +1,109 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Iterator, Literal
+
+from src.utils.serialization import JsonCodec
+from src.utils.stages import stage_timings_ms, timing_stages
+
+_current_trace: ContextVar["RequestTrace | None"] = ContextVar("current_trace", default=None)
+
+
+@dataclass
+class LLMCall:
+    """Raw response of an LLM call, before validation and repair, substituted for the call on replay."""
+
+    stage: str
+    model: str
+    schema: str  # Name of the response model
+    text: str
+
+
+@dataclass
+class RequestTrace:
+    """Record of an /answer request: its question, what the pipeline produced at each step and how long steps took."""
+
+    question: str | None = None
+    session_id: str | None = None
+    generation: int | None = None  # Data generation the request read from
+    sql_source: Literal["sql_template", "generated", "session", "cursor"] | None = None
+    validation_message: str | None = None
+    sql: str | None = None  # Validated SQL
+    rows_source: Literal["result_cache", "database", "session"] | None = None
+    rows: list[tuple[Any, ...]] | None = None
+    answer_source: Literal["answer_cache", "local_render", "llm", "refused"] | None = None
+    answer: str | None = None
+    llm_calls: list[LLMCall] = field(default_factory=list)
+    status: int | None = None
+    duration_ms: float = 0.0
+    stage_timings_ms: dict[str, float] = field(default_factory=dict)
+    recorded_at: str = field(default_factory=lambda: datetime.now(UTC).isoformat())
+
+
+trace_codec = JsonCodec(RequestTrace)
+
+
+def record(**fields: Any) -> None:
+    """Sets fields of the trace of the current request, if it's traced."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    for name, value in fields.items():
+        setattr(trace, name, value)
+
+
+def record_llm_call(stage: str, model: str, schema: str, text: str) -> None:
+    """Appends an LLM call to the trace of the current request, if it's traced."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.llm_calls.append(LLMCall(stage, model, schema, text))
+
+
+@contextmanager
+def tracing(trace: RequestTrace) -> Iterator[RequestTrace]:
+    """Makes the trace current, for the request's pipeline to record into, and times its stages until exiting."""
+    token = _current_trace.set(trace)
+    try:
+        with timing_stages() as timings:
+            try:
+                yield trace
+            finally:
+                trace.stage_timings_ms = stage_timings_ms(timings)
+    finally:
+        _current_trace.reset(token)
+
+
+class TraceRecorder:
+    def __init__(self, path: Path) -> None:
+        """
+        Appends request traces to an NDJSON file, the corpus replayed by run_replay.py. Every trace is written with a
+        single append-mode write, so every worker process can record to the same file.
+
+        Args:
+            path: Trace file, created if it doesn't exist
+        """
+        self.path = path
+
+    def append(self, trace: RequestTrace) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, trace_codec.encode(trace) + b"\n")
+        finally:
+            os.close(fd)
+
+
+def read_traces(path: Path) -> list[RequestTrace]:
+    """Returns the traces of a trace file, skipping a last line left incomplete by an interrupted write."""
+    traces = []
+    for line in path.read_bytes().splitlines():
+        if not line:
+            continue
+        try:
+            traces.append(trace_codec.decode(line))
+        except ValueError:
+            continue
+    return traces
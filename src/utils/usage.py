@@ -0,0 +1,209 @@
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime, timedelta
+from enum import Enum
+from typing import Any
+
+from src.settings import ApiKeyConfig, ModelPrice
+from src.utils.metrics import Metrics
+from src.utils.result_cache import CacheBackend, LocalCacheBackend
+
+# Buckets of LLM tokens per request
+REQUEST_TOKEN_BUCKETS: tuple[float, ...] = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+# Maximum number of (API key, UTC day) spend counts kept
+SPEND_CACHE_SIZE = 1024
+
+_current_usage: ContextVar["RequestUsage | None"] = ContextVar("current_usage", default=None)
+
+
+class BudgetState(str, Enum):
+    OK = "ok"
+    CONSTRAINED = "constrained"  # Over the soft share of the budget: no escalations, speculative calls or LLM repairs
+    EXHAUSTED = "exhausted"  # No LLM calls: answers come from the caches, SQL templates and local rendering only
+
+
+@dataclass
+class StageUsage:
+    calls: int = 0
+    input_tokens: int = 0
+    cached_input_tokens: int = 0  # Part of the input tokens, read from a cached prompt prefix
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    models: list[str] = field(default_factory=list)
+
+
+@dataclass
+class RequestUsage:
+    """LLM calls of a request and their token counts, by pipeline stage."""
+
+    api_key: str
+    stages: dict[str, StageUsage] = field(default_factory=dict)
+
+    def add(
+        self, stage: str, model: str, input_tokens: int, cached_tokens: int, output_tokens: int, cost: float
+    ) -> None:
+        usage = self.stages.setdefault(stage, StageUsage())
+        usage.calls += 1
+        usage.input_tokens += input_tokens
+        usage.cached_input_tokens += cached_tokens
+        usage.output_tokens += output_tokens
+        usage.cost_usd += cost
+        if model not in usage.models:
+            usage.models.append(model)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(usage.input_tokens + usage.output_tokens for usage in self.stages.values())
+
+    def summary(self) -> dict[str, Any]:
+        """Returns the token counts of the request in total and by stage, as written to the request log."""
+        return {
+            "llm_calls": sum(usage.calls for usage in self.stages.values()),
+            "input_tokens": sum(usage.input_tokens for usage in self.stages.values()),
+            "cached_input_tokens": sum(usage.cached_input_tokens for usage in self.stages.values()),
+            "output_tokens": sum(usage.output_tokens for usage in self.stages.values()),
+            "cost_usd": round(sum(usage.cost_usd for usage in self.stages.values()), 6),
+            "stages": {
+                stage: {**vars(usage), "cost_usd": round(usage.cost_usd, 6)} for stage, usage in self.stages.items()
+            },
+        }
+
+
+def current_usage() -> RequestUsage | None:
+    """Returns the usage of the current request, None outside of requests."""
+    return _current_usage.get()
+
+
+class UsageAccounting:
+    def __init__(
+        self,
+        api_keys: dict[str, ApiKeyConfig],
+        prices: dict[str, ModelPrice],
+        soft_share: float,
+        metrics: Metrics,
+        backend: CacheBackend | None = None,
+    ) -> None:
+        """
+        Accounts the tokens of LLM calls per request, pipeline stage, model and API key, and enforces the daily token
+        budgets of API keys.
+
+        Calls are accounted to the request they are made for, whose usage is written to the request log. The spending
+        of keys with a budget is counted per UTC day in the cache backend, shared by every worker process and kept
+        across worker restarts when SHARED_CACHE_PATH is set. Once a key has spent `soft_share` of its daily budget, its
+        requests are constrained to the cheapest LLM paths, and once the budget is spent they make no more LLM calls
+        until the next day.
+
+        Args:
+            api_keys: API keys to their config, holding their daily token budget
+            prices: Models to their price per million tokens, models without a price have no cost
+            soft_share: Share of a daily budget from which requests are constrained
+            metrics: Metrics registry to export token counts, costs and budgets to
+            backend: Storage of the spend counts, defaults to an in-process LRU
+        """
+        self.budgets: dict[str, int] = {
+            config.name: config.daily_token_budget
+            for config in api_keys.values()
+            if config.daily_token_budget is not None
+        }
+        self.prices = prices
+        self.soft_share = soft_share
+        self.metrics = metrics
+        self.backend: CacheBackend = backend if backend is not None else LocalCacheBackend(SPEND_CACHE_SIZE)
+        self._day: date | None = None
+
+    def start_request(self, api_key: str) -> Token["RequestUsage | None"]:
+        """Makes a new usage current for the request of the API key, returning the token to reset it with."""
+        return _current_usage.set(RequestUsage(api_key))
+
+    def finish_request(self, token: Token["RequestUsage | None"]) -> RequestUsage | None:
+        """Resets the usage of the request, recording its tokens if it made LLM calls, and returns it."""
+        usage = _current_usage.get()
+        _current_usage.reset(token)
+        if usage is not None and usage.stages:
+            self.metrics.observe("llm_request_tokens", usage.total_tokens, REQUEST_TOKEN_BUCKETS, key=usage.api_key)
+        return usage
+
+    def record(self, stage: str, model: str, usage_metadata: Any) -> None:
+        """
+        Accounts the tokens of an LLM call to the current request and its API key.
+
+        Args:
+            stage: Pipeline stage of the call
+            model: Model the call was made with
+            usage_metadata: Usage metadata of the response
+        """
+        if usage_metadata is None:
+            return
+        input_tokens = getattr(usage_metadata, "prompt_token_count", None) or 0
+        cached_tokens = getattr(usage_metadata, "cached_content_token_count", None) or 0
+        output_tokens = getattr(usage_metadata, "candidates_token_count", None) or 0
+        cost = self._cost(model, input_tokens, cached_tokens, output_tokens)
+
+        request_usage = _current_usage.get()
+        api_key = request_usage.api_key if request_usage is not None else "none"
+        if request_usage is not None:
+            request_usage.add(stage, model, input_tokens, cached_tokens, output_tokens, cost)
+
+        labels = {"key": api_key, "stage": stage, "model": model}
+        self.metrics.increment("llm_input_tokens_total", input_tokens, **labels)
+        self.metrics.increment("llm_cached_input_tokens_total", cached_tokens, **labels)
+        self.metrics.increment("llm_output_tokens_total", output_tokens, **labels)
+        if model in self.prices:
+            self.metrics.increment("llm_cost_usd_total", cost, **labels)
+
+        if api_key in self.budgets:
+            day = self._roll_over()
+            tokens = input_tokens + output_tokens
+            remaining = max(0, self.budgets[api_key] - self._spent(api_key, day) - tokens)
+            self.backend.add(self._spend_key(api_key, day), tokens, day.toordinal())
+            self.metrics.set_gauge("token_budget_remaining", remaining, key=api_key)
+
+    def budget_state(self) -> BudgetState:
+        """Returns the state of the daily token budget of the current request's API key."""
+        request_usage = _current_usage.get()
+        if request_usage is None or request_usage.api_key not in self.budgets:
+            return BudgetState.OK
+        budget = self.budgets[request_usage.api_key]
+        spent = self._spent(request_usage.api_key, self._roll_over())
+        if spent >= budget:
+            return BudgetState.EXHAUSTED
+        if spent >= budget * self.soft_share:
+            return BudgetState.CONSTRAINED
+        return BudgetState.OK
+
+    def record_downgrade(self, path: str) -> None:
+        """Records that the current request took a cheaper path as its key is over budget."""
+        request_usage = _current_usage.get()
+        api_key = request_usage.api_key if request_usage is not None else "none"
+        self.metrics.increment("token_budget_downgrades_total", key=api_key, path=path)
+
+    @staticmethod
+    def retry_after() -> int:
+        """Seconds until daily budgets reset, at midnight UTC."""
+        now = datetime.now(UTC)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), UTC)
+        return max(1, int((midnight - now).total_seconds()))
+
+    def _cost(self, model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+        price = self.prices.get(model)
+        if price is None:
+            return 0.0
+        cached_price = price.cached_input if price.cached_input is not None else price.input
+        return (
+            (input_tokens - cached_tokens) * price.input + cached_tokens * cached_price + output_tokens * price.output
+        ) / 1_000_000
+
+    def _spent(self, api_key: str, day: date) -> int:
+        return self.backend.get(self._spend_key(api_key, day)) or 0
+
+    @staticmethod
+    def _spend_key(api_key: str, day: date) -> str:
+        return f"spent\x00{api_key}\x00{day.isoformat()}"
+
+    def _roll_over(self) -> date:
+        """Returns the current UTC day, dropping the spend counts of previous days when it changes."""
+        today = datetime.now(UTC).date()
+        if today != self._day:
+            self._day = today
+            self.backend.drop_older_generations(today.toordinal())
+        return today
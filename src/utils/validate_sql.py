@@ -1,9 +1,21 @@
 from dataclasses import dataclass
 from logging import Logger
+from typing import TYPE_CHECKING, cast
 
-import sqlglot
-from sqlglot import expressions as exp
-from sqlglot.errors import ParseError
+# sqlglot is imported where used to keep the app import fast, it is loaded by the startup warm-up instead
+if TYPE_CHECKING:
+    from sqlglot import expressions as exp
+
+# Maximum number of rows a validated query returns
+MAX_LIMIT = 100
+
+
+@dataclass(frozen=True)
+class ProjectedColumn:
+    """A single column of a validated query's projection."""
+
+    name: str
+    aggregate: str | None = None  # Name of the aggregate function (e.g. "count") if the column is an aggregate
 
 
 @dataclass(frozen=True)
@@ -13,6 +25,10 @@ class SQLValidationResult:
     is_valid: bool
     message: str
     validated_query: str | None = None
+    projection: tuple[ProjectedColumn, ...] = ()
+    canonical_query: str | None = None  # Normalized form of validated_query, shared by equivalent queries
+    limit_applied: bool = False  # Whether the LIMIT was added or lowered by validation, possibly truncating the results
+    original_limit: int | None = None  # The query's own LIMIT when lowered by validation, None if added or kept
 
 
 def validate_and_limit_sql(
@@ -20,7 +36,7 @@ def validate_and_limit_sql(
     dialect: str,
     logger: Logger,
     allowed_tables: set[str] | None = None,
-    max_limit: int = 100,
+    max_limit: int = MAX_LIMIT,
 ) -> SQLValidationResult:
     """
     Validate SQL query to ensure it's a SELECT-only query with proper security constraints.
@@ -38,16 +54,24 @@ def validate_and_limit_sql(
         - is_valid: Boolean indicating if query passed validation
         - message: Description of validation result or specific error
         - validated_query: Query with LIMIT applied, or None if validation failed
+        - projection: Columns selected by the query, used to recognize the shape of its results
+        - canonical_query: Canonical form of the validated query, used as cache key
+        - limit_applied: Whether the LIMIT was added or lowered, the results then possibly being truncated
+        - original_limit: The query's own LIMIT if it was lowered, still capping the results when paginated
 
     Example:
         >>> result = validate_and_limit_sql("SELECT * FROM users WHERE age > 18")
         >>> if result.is_valid:
         ...     print(f"Safe query: {result.modified_query}")
     """
+    import sqlglot
+    from sqlglot import expressions as exp
+    from sqlglot.errors import ParseError
+
     try:
         # Parse the SQL query
         parsed = sqlglot.parse_one(query, dialect=dialect)
-        logger.debug(f"Parsed query: {parsed}")
+        logger.debug("Parsed query: %s", parsed)  # Regenerating the SQL is slow, only done if debug logging is on
 
         # Check if it's a SELECT statement
         if not isinstance(parsed, exp.Select):
@@ -60,9 +84,17 @@ def validate_and_limit_sql(
                 return SQLValidationResult(False, table_validation.message, None)
 
         # Check and enforce LIMIT constraint
-        validated_query = _add_limit(parsed, query, dialect, max_limit)
+        validated_query, limit_applied, original_limit = _add_limit(parsed, query, dialect, max_limit)
         logger.info(f"Validated query: {validated_query}")
-        return SQLValidationResult(True, "Query validation passed", validated_query)
+        return SQLValidationResult(
+            True,
+            "Query validation passed",
+            validated_query,
+            _get_projection(parsed, dialect),
+            canonicalize_sql(cast(exp.Expression, sqlglot.parse_one(validated_query, dialect=dialect)), dialect),
+            limit_applied,
+            original_limit,
+        )
 
     except ParseError as e:
         return SQLValidationResult(False, f"SQL parsing error: {str(e)}", None)
@@ -70,7 +102,25 @@ def validate_and_limit_sql(
         return SQLValidationResult(False, f"Validation error: {str(e)}", None)
 
 
-def _validate_table_access(node: exp.Expression, allowed_tables: set[str]) -> SQLValidationResult:
+def canonicalize_sql(parsed: "exp.Expression", dialect: str) -> str:
+    """
+    Renders a parsed query in a canonical form so that queries differing only in formatting, keyword casing or
+    identifier casing/quoting share the same string.
+
+    Args:
+        parsed: Parsed SQL expression, left unmodified
+        dialect: SQL dialect of the query
+
+    Returns:
+        Canonical query string
+    """
+    from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+
+    normalized = normalize_identifiers(parsed.copy(), dialect=dialect)
+    return normalized.sql(dialect=dialect, pretty=True, identify=True, normalize=True)
+
+
+def _validate_table_access(node: "exp.Expression", allowed_tables: set[str]) -> SQLValidationResult:
     """
     Validate that only whitelisted tables are being accessed.
 
@@ -84,6 +134,8 @@ def _validate_table_access(node: exp.Expression, allowed_tables: set[str]) -> SQ
     Returns:
         SQLValidationResult indicating if table access is valid
     """
+    from sqlglot import expressions as exp
+
     accessed_tables: set[str] = set()
 
     # Find all table references
@@ -101,7 +153,36 @@ def _validate_table_access(node: exp.Expression, allowed_tables: set[str]) -> SQ
     return SQLValidationResult(True, "Table access validation passed", None)
 
 
-def _add_limit(parsed: exp.Select, original_query: str, dialect: str, max_limit: int) -> str:
+def _get_projection(parsed: "exp.Select", dialect: str) -> tuple[ProjectedColumn, ...]:
+    """
+    Describes the columns selected by a parsed SELECT statement.
+
+    Args:
+        parsed: Parsed SELECT statement
+        dialect: SQL dialect used to render unaliased expressions
+
+    Returns:
+        Tuple of projected columns in select order
+    """
+    from sqlglot import expressions as exp
+
+    projection: list[ProjectedColumn] = []
+    for expression in parsed.expressions:
+        unaliased = expression.unalias()
+        if expression.alias:
+            name = expression.alias
+        elif isinstance(unaliased, (exp.Column, exp.Star)):
+            name = unaliased.name or "*"
+        else:
+            name = unaliased.sql(dialect=dialect)
+
+        aggregate = unaliased.find(exp.AggFunc)
+        projection.append(ProjectedColumn(name, aggregate.key if aggregate else None))
+
+    return tuple(projection)
+
+
+def _add_limit(parsed: "exp.Select", original_query: str, dialect: str, max_limit: int) -> tuple[str, bool, int | None]:
     """
     If no LIMIT exists, adds LIMIT with default value of 100.
     If LIMIT exists but exceeds 100, replaces it with LIMIT 100.
@@ -114,8 +195,10 @@ def _add_limit(parsed: exp.Select, original_query: str, dialect: str, max_limit:
         max_limit: maximum limit value
 
     Returns:
-        Modified query string with appropriate LIMIT clause
+        Modified query string with appropriate LIMIT clause, whether the LIMIT was added or lowered, and the LIMIT
+        it was lowered from if numeric
     """
+    from sqlglot import expressions as exp
 
     # Check if query already has a LIMIT clause
     existing_limit = parsed.args.get("limit")
@@ -127,21 +210,22 @@ def _add_limit(parsed: exp.Select, original_query: str, dialect: str, max_limit:
                 limit_value = int(existing_limit.expression.this)
                 if limit_value <= max_limit:
                     # Limit is acceptable, return original query
-                    return original_query
+                    return original_query, False, None
                 else:
                     # Replace with max_limit
-                    existing_limit.expression = exp.Literal.number(str(max_limit))
+                    existing_limit.set("expression", exp.Literal.number(str(max_limit)))
+                    return parsed.sql(dialect=dialect, pretty=True), True, limit_value
             except (ValueError, TypeError):
                 # Non-numeric limit, replace with max_limit
-                existing_limit.expression = exp.Literal.number(str(max_limit))
+                existing_limit.set("expression", exp.Literal.number(str(max_limit)))
         else:
             # Complex limit expression, replace with max_limit
-            existing_limit.expression = exp.Literal.number(str(max_limit))
+            existing_limit.set("expression", exp.Literal.number(str(max_limit)))
     else:
         # Add LIMIT clause
         parsed = parsed.limit(max_limit)
 
-    return parsed.sql(dialect=dialect, pretty=True)
+    return parsed.sql(dialect=dialect, pretty=True), True, None
 
 
 # TODO: Add complexity analysis and expensive operation detection to prevent resource-intensive queries
@@ -0,0 +1,74 @@
+import asyncio
+import importlib
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+
+from src.utils.executors import ExecutorStage
+from src.utils.prompt_registry import prompt_registry
+from src.utils.state import State
+from src.utils.validate_sql import validate_and_limit_sql
+
+
+async def warm_up(state: State) -> dict[str, float]:
+    """
+    Pays the one-off costs of the first request at startup instead: preloads prompts, opens a database connection,
+    starts the thread and process pools and primes sqlglot's dialect tables, and imports google-genai and pre-connects
+    the HTTP clients. Steps run concurrently. Invalid prompts fail the startup, any other failing step is only logged.
+
+    Args:
+        state: Application state
+
+    Returns:
+        dict[str, float]: Duration of each warm-up step in seconds
+    """
+
+    async def _prompts() -> None:
+        await asyncio.to_thread(prompt_registry.load)
+        state.logger.info(f"Loaded prompts: {prompt_registry.versions()}")
+
+    async def _database() -> None:
+        async with state.db.engine.connect() as connection:  # Connection is returned to the pool on exit
+            await connection.execute(text("SELECT 1"))
+        await state.db.get_generation()
+
+    async def _sqlglot() -> None:
+        await state.executors.run(
+            ExecutorStage.SQL_VALIDATION, validate_and_limit_sql, "SELECT 1", state.db.dialect, state.logger
+        )
+        await state.executors.warm_up()
+
+    async def _google_client() -> None:
+        client = await asyncio.to_thread(lambda: state.google_client)  # Imports google-genai off the event loop
+        # Request configs are built with google-genai types, also when calls are answered by an offline client
+        await asyncio.to_thread(importlib.import_module, "google.genai.types")
+        if state.settings.warm_up_connect_clients:
+            await client.aio.models.get(model=state.settings.chat_model)
+
+    async def _yelp_client() -> None:
+        if state.settings.warm_up_connect_clients:
+            await state.yelp_client.head(state.settings.yelp_base_url)
+
+    steps: dict[str, Callable[[], Awaitable[None]]] = {
+        "prompts": _prompts,
+        "database": _database,
+        "sqlglot": _sqlglot,
+        "google_client": _google_client,
+        "yelp_client": _yelp_client,
+    }
+    durations: dict[str, float] = {}
+
+    async def _run_step(name: str, step: Callable[[], Awaitable[None]]) -> None:
+        start_time = time.perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            if name == "prompts":
+                raise
+            state.logger.warning(f"Warm-up step {name} failed: {str(e)}")
+        durations[name] = round(time.perf_counter() - start_time, 4)
+        state.metrics.set_gauge("startup_warm_up_seconds", durations[name], step=name)
+
+    await asyncio.gather(*(_run_step(name, step) for name, step in steps.items()))
+    return durations
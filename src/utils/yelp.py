@@ -1,12 +1,15 @@
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from fastapi import HTTPException
-from httpx import AsyncClient
 from pydantic import BaseModel
 
 from src.models.app.business_data import BusinessBase, BusinessLocation, BusinessTags
 from src.settings import settings
+from src.utils.serialization import decode_json
+
+if TYPE_CHECKING:
+    from httpx import AsyncClient
 
 
 class YelpBusinessData(BaseModel):
@@ -38,19 +41,20 @@ class YelpBusinessSearchParams(BaseModel):
 
 
 class YelpBusinessSearch:
-    def __init__(self, client: AsyncClient, logger: logging.Logger):
+    def __init__(self, client: "AsyncClient", logger: logging.Logger):
         self.client = client
         self.base_url = f"{settings.yelp_base_url}/businesses/search"
         self.logger = logger
 
     async def _get_data(self, params: YelpBusinessSearchParams) -> dict[str, Any]:
-        self.logger.debug(f"Sending Yelp query with params: {params.params}")
+        self.logger.debug("Sending Yelp query with params: %s", params.params)
         response = await self.client.get(
             self.base_url, params=params.params, headers={"Authorization": f"Bearer {settings.yelp_api_key}"}
         )
-        self.logger.debug(f"Yelp response: {response.json()}")
+        data = decode_json(response.content)  # Decoded once, logged and returned
+        self.logger.debug("Yelp response: %s", data)  # Formatted only if debug logging is on
         response.raise_for_status()
-        return response.json()
+        return data
 
     async def _parse_to_response_model(self, data: dict[str, Any]) -> YelpBusinessData:
         # Get the first business from the response as we defaulted query limit to 1